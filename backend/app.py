@@ -1,4 +1,5 @@
 import os
+import click
 from app import create_app, db
 from app.models import User, Supplier, RequestOrder, PurchaseOrder, Storage
 from app.websocket import socketio
@@ -108,6 +109,67 @@ def seed_db():
     db.session.commit()
     print('Sample data created!')
 
+# Reconcile materialized storage balances with the ledger
+@app.cli.command('storage-balances')
+@click.option('--fix', is_flag=True, help='Rewrite drifted balance rows from the ledger.')
+def storage_balances(fix):
+    """Verify (or rebuild with --fix) storage_balances against storage_history."""
+    from app.models import StorageBalance
+    
+    report = StorageBalance.reconcile(fix=fix)
+    for entry in report['drift'][:50]:
+        print(f"  {entry['storage_id']} {entry['item_id']} {entry['source_no']}#{entry['source_line']}: "
+              f"ledger={entry['ledger_quantity']} balance={entry['balance_quantity']}")
+    
+    if fix:
+        db.session.commit()
+        print(f"Rebuilt {report['drift_count']} balance rows ({report['ledger_keys']} ledger keys)")
+    else:
+        print(f"Checked {report['ledger_keys']} ledger keys, {report['drift_count']} drifted")
+        if report['drift_count']:
+            raise SystemExit(1)
+
+# Verify the incrementally maintained project expenditure ledger
+@app.cli.command('project-expenditures')
+@click.option('--fix', is_flag=True, help='Rewrite drifted expenditure rows and project totals.')
+def project_expenditures(fix):
+    """Recompute project expenditures from purchased POs and report drift."""
+    from app.models import Project
+    
+    report = Project.verify_expenditures(fix=fix)
+    for entry in report['drift'][:50]:
+        supplier = entry['supplier_id'] or 'TOTAL'
+        print(f"  {entry['project_id']} {supplier}: "
+              f"expected={entry['expected_amount']} ledger={entry['ledger_amount']}")
+    
+    if fix:
+        db.session.commit()
+        print(f"Rewrote {report['drift_count']} drifted entries across {report['projects_checked']} projects")
+    else:
+        print(f"Checked {report['projects_checked']} projects, {report['drift_count']} drifted")
+        if report['drift_count']:
+            raise SystemExit(1)
+
+# Find (and with --fix, repair) requisitions stuck in 'submitted' after review
+@app.cli.command('requisition-status')
+@click.option('--fix', is_flag=True, help='Move every affected requisition to reviewed in one update.')
+def requisition_status(fix):
+    """Scan submitted requisitions whose items have all been reviewed."""
+    from app.services import status_consistency
+    
+    report = status_consistency.run_check(fix=fix)
+    for problem in report['problems'][:50]:
+        summary = problem['summary']
+        print(f"  {problem['request_order_no']}: {summary['total_items']} items, "
+              f"{summary['approved_items']} approved, {summary['rejected_items']} rejected")
+    
+    if fix:
+        print(f"Fixed {report['fixed']} of {report['problem_count']} requisitions in {report['duration_ms']} ms")
+    else:
+        print(f"Found {report['problem_count']} requisitions to fix in {report['duration_ms']} ms")
+        if report['problem_count']:
+            raise SystemExit(1)
+
 if __name__ == '__main__':
     # Use SocketIO.run instead of app.run for WebSocket support
     socketio.run(app, debug=True, host='0.0.0.0', port=5000, use_reloader=True)
\ No newline at end of file
@@ -29,8 +29,8 @@ def create_app(config_name=None):
     migrate.init_app(app, db)
     
     # Initialize WebSocket
-    from app.websocket import socketio
-    socketio.init_app(app)
+    from app.websocket import init_socketio
+    init_socketio(app)
     
     # EMERGENCY FIX COMPLETE: Re-enable CORS with proper configuration
     print(f"[CORS] Re-enabling CORS after 405 fix")
@@ -76,6 +76,21 @@ def create_app(config_name=None):
             }
         }), 401
     
+    @jwt.token_in_blocklist_loader
+    def check_token_revoked(jwt_header, jwt_payload):
+        from app.auth import is_token_revoked
+        return is_token_revoked(jwt_header, jwt_payload)
+    
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({
+            'error': {
+                'code': 'TOKEN_REVOKED',
+                'message': 'Token has been revoked',
+                'details': {}
+            }
+        }), 401
+    
     @jwt.unauthorized_loader
     def missing_token_callback(error):
         print(f"[AUTH] Missing token for endpoint: {request.endpoint}")
@@ -1,7 +1,9 @@
+import time
 from functools import wraps
 from flask import jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from app.models.user import User
+from app.utils import user_cache
 
 def require_roles(*roles):
     """Decorator to require specific roles for an endpoint"""
@@ -25,7 +27,8 @@ def require_roles(*roles):
                     }
                 }), 401
 
-            current_user = User.query.get(current_user_id)
+            # Resolved once per request and bound to flask.g
+            current_user = user_cache.get_user(current_user_id)
             
             if not current_user or not current_user.is_active:
                 return jsonify({
@@ -62,7 +65,7 @@ def get_current_user():
     try:
         current_user_id = get_jwt_identity()
         if current_user_id:
-            return User.query.get(current_user_id)
+            return user_cache.get_user(current_user_id)
         return None
     except:
         return None
@@ -85,27 +88,24 @@ def accountant_required(f):
 
 def authenticated_required(f):
     """Decorator that allows any authenticated user (Everyone role)"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        # Skip authentication for OPTIONS requests (CORS preflight)
-        from flask import request
-        if request.method == 'OPTIONS':
-            return '', 200
-        # For other methods, apply the role check
-        return require_roles('Admin', 'ProcurementMgr', 'Procurement', 'Accountant', 'Everyone', 'Engineer', 'Manager')(f)(*args, **kwargs)
-    return decorated_function
-
-# JWT Token blacklist (in production, use Redis or database)
-blacklisted_tokens = set()
+    # require_roles already answers OPTIONS preflights; build the chain once
+    return require_roles('Admin', 'ProcurementMgr', 'Procurement', 'Accountant', 'Everyone', 'Engineer', 'Manager')(f)
 
 def is_token_revoked(jwt_header, jwt_payload):
-    """Check if JWT token is revoked"""
-    jti = jwt_payload['jti']
-    return jti in blacklisted_tokens
+    """Check if JWT token is revoked (registered as the JWT blocklist loader)"""
+    from app.utils.security import security_manager
+    return security_manager.revoked_tokens.is_revoked(jwt_payload['jti'])
+
+def revoke_token(jti, expires_at=None):
+    """Revoke a token for every worker until it expires.
 
-def revoke_token(jti):
-    """Add token to blacklist"""
-    blacklisted_tokens.add(jti)
+    expires_at is the token's `exp` claim; without it the entry is kept for
+    the configured access token lifetime.
+    """
+    from app.utils.security import security_manager
+    if expires_at is None:
+        expires_at = time.time() + current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()
+    security_manager.revoked_tokens.revoke(jti, expires_at)
 
 def create_response(data=None, message=None, status_code=200):
     """Create standardized response"""
@@ -127,11 +127,31 @@ def create_error_response(code, message, details=None, status_code=400):
     }
     return jsonify(error), status_code
 
-def paginate_query(query, page, page_size, max_page_size=100):
-    """Paginate a SQLAlchemy query"""
+def paginate_query(query, page, page_size, max_page_size=100, cursor_params=None, keyset=None):
+    """Paginate a SQLAlchemy query
+    
+    Pass cursor_params (from app.utils.pagination.get_cursor_params) and the
+    keyset sort keys to page by cursor instead of OFFSET; the pagination block
+    then carries next_cursor and an optional total.
+    """
     if page_size > max_page_size:
         page_size = max_page_size
     
+    if cursor_params is not None and keyset:
+        from app.utils.pagination import paginate_keyset
+        result = paginate_keyset(query, keyset, cursor_params['cursor'], cursor_params['page_size'],
+                                 max_page_size, cursor_params['total'])
+        return {
+            'items': result['items'],
+            'pagination': {
+                'page_size': result['page_size'],
+                'total': result['total'],
+                'total_is_estimate': result['total_is_estimate'],
+                'has_more': result['has_more'],
+                'next_cursor': result['next_cursor']
+            }
+        }
+    
     total = query.count()
     items = query.offset((page - 1) * page_size).limit(page_size).all()
     
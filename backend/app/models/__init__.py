@@ -5,10 +5,11 @@ from .request_order import RequestOrder, RequestOrderItem
 from .purchase_order import PurchaseOrder, PurchaseOrderItem
 from .consolidation import ShipmentConsolidation, ConsolidationPO
 from .logistics import LogisticsEvent, RemarksHistory
-from .storage import Storage, StorageHistory
+from .storage import Storage, StorageHistory, StorageBalance
 from .receiving import ReceivingRecord, PendingStorageItem
 from .project import Project, ProjectSupplierExpenditure
 from .system_settings import SystemSettings
+from .document_sequence import DocumentSequence
 from .inventory import InventoryBatch, InventoryBatchStorage, InventoryMovement, InventoryItem
 
 __all__ = [
@@ -25,11 +26,13 @@ __all__ = [
     'RemarksHistory',
     'Storage',
     'StorageHistory',
+    'StorageBalance',
     'ReceivingRecord',
     'PendingStorageItem',
     'Project',
     'ProjectSupplierExpenditure',
     'SystemSettings',
+    'DocumentSequence',
     'InventoryBatch',
     'InventoryBatchStorage',
     'InventoryMovement',
@@ -35,15 +35,8 @@ class ShipmentConsolidation(db.Model):
     @staticmethod
     def generate_consolidation_id():
         """Generate a unique consolidation ID"""
-        today = date.today()
-        prefix = f"CONS{today.strftime('%Y%m%d')}"
-        
-        existing = db.session.query(ShipmentConsolidation).filter(
-            ShipmentConsolidation.consolidation_id.like(f"{prefix}%")
-        ).count()
-        
-        sequence = existing + 1
-        return f"{prefix}{sequence:03d}"
+        from app.models.document_sequence import DocumentSequence
+        return DocumentSequence.next_number('CONS')
     
     @staticmethod
     def generate_consolidation_name():
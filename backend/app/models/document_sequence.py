@@ -0,0 +1,87 @@
+from datetime import datetime, date
+from app import db
+
+
+class DocumentSequence(db.Model):
+    """Per-day counters for document numbers (REQ/PO/CONS...).
+
+    One row per prefix such as 'PO20261017'. Numbers are handed out with a
+    single atomic upsert on that row instead of counting existing documents,
+    so concurrent workers never receive the same number.
+    """
+    __tablename__ = 'document_sequences'
+
+    prefix = db.Column(db.String(30), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DocumentSequence {self.prefix}: {self.last_value}>'
+
+    @staticmethod
+    def make_prefix(code, on_date=None):
+        """Daily prefix for a document code, e.g. ('PO', 2026-10-17) -> 'PO20261017'"""
+        return f"{code}{(on_date or date.today()).strftime('%Y%m%d')}"
+
+    @staticmethod
+    def allocate(prefix, count=1):
+        """Reserve `count` consecutive values for prefix and return the last one.
+
+        The block is last - count + 1 .. last. Runs in the caller's transaction,
+        so the counter row stays locked until the caller commits and a rollback
+        releases the numbers again.
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+
+        table = DocumentSequence.__table__
+        now = datetime.utcnow()
+
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+
+            stmt = insert(table).values(prefix=prefix, last_value=count, updated_at=now)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.prefix],
+                set_={
+                    'last_value': table.c.last_value + stmt.excluded.last_value,
+                    'updated_at': stmt.excluded.updated_at
+                }
+            ).returning(table.c.last_value)
+            return db.session.execute(stmt).scalar()
+
+        # Generic fallback: the relative UPDATE locks the row before it is read back
+        result = db.session.execute(
+            table.update().where(table.c.prefix == prefix).values(
+                last_value=table.c.last_value + count, updated_at=now
+            )
+        )
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(prefix=prefix, last_value=count, updated_at=now))
+            return count
+        return db.session.execute(
+            db.select(table.c.last_value).where(table.c.prefix == prefix)
+        ).scalar()
+
+    @staticmethod
+    def next_numbers(code, count, on_date=None, width=3):
+        """Pre-allocate a block of document numbers, e.g. for bulk imports"""
+        prefix = DocumentSequence.make_prefix(code, on_date)
+        last = DocumentSequence.allocate(prefix, count)
+        return [f"{prefix}{value:0{width}d}" for value in range(last - count + 1, last + 1)]
+
+    @staticmethod
+    def next_number(code, on_date=None, width=3):
+        """Next document number for code, e.g. 'PO20261017001'"""
+        return DocumentSequence.next_numbers(code, 1, on_date, width)[0]
+
+    def to_dict(self):
+        return {
+            'prefix': self.prefix,
+            'last_value': self.last_value,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -1,7 +1,11 @@
 from datetime import datetime
 from app import db
 from decimal import Decimal
-from sqlalchemy import func
+from sqlalchemy import func, inspect, literal_column
+
+
+# Engine URL -> whether inventory_batches has the optional usage_type column
+_usage_type_column_cache = {}
 
 
 class InventoryBatch(db.Model):
@@ -56,6 +60,27 @@ class InventoryBatch(db.Model):
     def __repr__(self):
         return f'<InventoryBatch {self.batch_id}: {self.item_name} from {self.source_po_number}>'
     
+    @staticmethod
+    def usage_type_column():
+        """Return the optional usage_type column as a SQL expression, or None.
+        
+        usage_type is added by add_usage_type_to_inventory.py and is absent on
+        some databases, so it is not mapped on the model. The column check is
+        done once per engine through the pooled connection.
+        """
+        engine = db.engine
+        cache_key = str(engine.url)
+        if cache_key not in _usage_type_column_cache:
+            try:
+                columns = inspect(engine).get_columns(InventoryBatch.__tablename__)
+                _usage_type_column_cache[cache_key] = any(col['name'] == 'usage_type' for col in columns)
+            except Exception:
+                _usage_type_column_cache[cache_key] = False
+        
+        if not _usage_type_column_cache[cache_key]:
+            return None
+        return literal_column(f'{InventoryBatch.__tablename__}.usage_type')
+    
     @staticmethod
     def create_from_receiving(receiving_record):
         """Create inventory batch from receiving record"""
@@ -61,6 +61,91 @@ class Project(db.Model):
         # Recalculate total
         self.calculate_total_expenditure()
     
+    @staticmethod
+    def verify_expenditures(fix=False):
+        """Recompute supplier expenditures from scratch and report drift.
+
+        The ledger rows are normally maintained by deltas when POs are
+        confirmed or cancelled; this sums every purchased PO line per
+        (project, supplier) and compares. When fix is True drifted rows and
+        project totals are rewritten; the caller commits.
+        """
+        from app.models.purchase_order import PurchaseOrder, PurchaseOrderItem
+        from app.models.request_order import RequestOrder
+
+        expected_rows = db.session.query(
+            RequestOrder.project_id,
+            PurchaseOrder.supplier_id,
+            db.func.sum(PurchaseOrderItem.unit_price * PurchaseOrderItem.item_quantity)
+        ).join(
+            PurchaseOrderItem, PurchaseOrderItem.purchase_order_no == PurchaseOrder.purchase_order_no
+        ).join(
+            RequestOrder, PurchaseOrderItem.source_request_order_no == RequestOrder.request_order_no
+        ).filter(
+            RequestOrder.project_id.isnot(None),
+            PurchaseOrder.purchase_status == 'purchased'
+        ).group_by(RequestOrder.project_id, PurchaseOrder.supplier_id).all()
+
+        expected = {
+            (project_id, supplier_id): Decimal(str(total or 0))
+            for project_id, supplier_id, total in expected_rows
+        }
+        expenditures = {
+            (exp.project_id, exp.supplier_id): exp
+            for exp in ProjectSupplierExpenditure.query.all()
+        }
+
+        drift = []
+        for key in set(expected) | set(expenditures):
+            amount = expected.get(key, Decimal('0'))
+            expenditure = expenditures.get(key)
+            actual = Decimal(str(expenditure.expenditure_amount or 0)) if expenditure else None
+            if actual == amount or (actual is None and amount == 0):
+                continue
+            drift.append({
+                'project_id': key[0],
+                'supplier_id': key[1],
+                'expected_amount': float(amount),
+                'ledger_amount': float(actual) if actual is not None else None
+            })
+            if fix:
+                if expenditure:
+                    expenditure.expenditure_amount = amount
+                else:
+                    expenditures[key] = ProjectSupplierExpenditure(
+                        project_id=key[0],
+                        supplier_id=key[1],
+                        expenditure_amount=amount
+                    )
+                    db.session.add(expenditures[key])
+
+        expected_totals = {}
+        for (project_id, _), amount in expected.items():
+            expected_totals[project_id] = expected_totals.get(project_id, Decimal('0')) + amount
+
+        projects = Project.query.all()
+        for project in projects:
+            amount = expected_totals.get(project.project_id, Decimal('0'))
+            actual = Decimal(str(project.total_expenditure or 0))
+            if actual == amount:
+                continue
+            drift.append({
+                'project_id': project.project_id,
+                'supplier_id': None,
+                'expected_amount': float(amount),
+                'ledger_amount': float(actual)
+            })
+            if fix:
+                project.total_expenditure = amount
+
+        return {
+            'projects_checked': len(projects),
+            'ledger_keys': len(expected),
+            'drift_count': len(drift),
+            'drift': drift,
+            'fixed': fix
+        }
+
     def get_supplier_breakdown(self):
         """Get expenditure breakdown by supplier"""
         return [exp.to_dict() for exp in self.supplier_expenditures.all()]
@@ -111,6 +196,63 @@ class ProjectSupplierExpenditure(db.Model):
     def __repr__(self):
         return f'<ProjectSupplierExpenditure {self.project_id} - {self.supplier_id}: {self.expenditure_amount}>'
     
+    @staticmethod
+    def apply_delta(project_id, supplier_id, delta):
+        """Atomically add delta to a supplier expenditure row and the project total.
+        
+        Runs in the caller's transaction; the caller commits.
+        """
+        table = ProjectSupplierExpenditure.__table__
+        now = datetime.utcnow()
+        values = {
+            'project_id': project_id,
+            'supplier_id': supplier_id,
+            'expenditure_amount': delta,
+            'created_at': now,
+            'updated_at': now
+        }
+        
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            
+            stmt = insert(table).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.project_id, table.c.supplier_id],
+                set_={
+                    'expenditure_amount': table.c.expenditure_amount + stmt.excluded.expenditure_amount,
+                    'updated_at': stmt.excluded.updated_at
+                }
+            )
+            db.session.execute(stmt)
+        else:
+            # Generic fallback: relative UPDATE first, INSERT when no row exists yet
+            result = db.session.execute(
+                table.update().where(
+                    db.and_(table.c.project_id == project_id, table.c.supplier_id == supplier_id)
+                ).values(expenditure_amount=table.c.expenditure_amount + delta, updated_at=now)
+            )
+            if result.rowcount == 0:
+                db.session.execute(table.insert().values(**values))
+        
+        projects = Project.__table__
+        db.session.execute(
+            projects.update().where(projects.c.project_id == project_id).values(
+                total_expenditure=db.func.coalesce(projects.c.total_expenditure, 0) + delta
+            )
+        )
+        
+        # Loaded instances would otherwise keep their pre-delta amounts
+        for instance in list(db.session.identity_map.values()):
+            if isinstance(instance, Project) and instance.project_id == project_id:
+                db.session.expire(instance, ['total_expenditure'])
+            elif (isinstance(instance, ProjectSupplierExpenditure)
+                  and instance.project_id == project_id and instance.supplier_id == supplier_id):
+                db.session.expire(instance, ['expenditure_amount', 'updated_at'])
+    
     def to_dict(self):
         return {
             'record_id': self.record_id,
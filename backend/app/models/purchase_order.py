@@ -1,4 +1,5 @@
 from datetime import datetime, date
+from sqlalchemy.orm.attributes import set_committed_value
 from app import db
 from decimal import Decimal
 import uuid
@@ -82,16 +83,8 @@ class PurchaseOrder(db.Model):
     @staticmethod
     def generate_po_number():
         """Generate a unique PO number"""
-        today = date.today()
-        prefix = f"PO{today.strftime('%Y%m%d')}"
-        
-        # Find the next sequence number for today
-        existing = db.session.query(PurchaseOrder).filter(
-            PurchaseOrder.purchase_order_no.like(f"{prefix}%")
-        ).count()
-        
-        sequence = existing + 1
-        return f"{prefix}{sequence:03d}"
+        from app.models.document_sequence import DocumentSequence
+        return DocumentSequence.next_number('PO')
     
     def can_edit(self):
         """Check if the PO can be edited"""
@@ -106,6 +99,7 @@ class PurchaseOrder(db.Model):
         if not self.can_confirm():
             raise ValueError("Purchase order cannot be confirmed")
         
+        previous_costs = self.project_cost_breakdown()
         self.purchase_status = 'purchased'
         self.confirm_purchaser_id = confirmer_id
         self.status_update_required = True  # Require mandatory status update after purchase confirmation
@@ -115,14 +109,15 @@ class PurchaseOrder(db.Model):
             if item.line_status == 'order_created':
                 item.line_status = 'purchased'
         
-        # Update project costs when purchase is confirmed
-        self._update_project_costs()
+        # Add this PO's lines to the project expenditure ledger
+        self.apply_project_cost_change(previous_costs)
     
     def withdraw(self, reason, withdrawn_by_id):
         """Withdraw the purchase order"""
         if self.purchase_status == 'cancelled':
             raise ValueError("Purchase order is already cancelled")
         
+        previous_costs = self.project_cost_breakdown()
         self.purchase_status = 'cancelled'
         self.notes = f"CANCELLED: {reason}"
         
@@ -130,6 +125,50 @@ class PurchaseOrder(db.Model):
         for item in self.items:
             item.line_status = 'cancelled'
             item.updated_at = datetime.utcnow()
+        
+        # Take a cancelled purchase back out of the project expenditure ledger
+        self.apply_project_cost_change(previous_costs)
+    
+    def project_cost_breakdown(self):
+        """Amount this PO contributes to project expenditure, keyed by (project_id, supplier_id).
+        
+        Only purchased POs count; lines are summed per source project in one
+        grouped query.
+        """
+        if self.purchase_status != 'purchased':
+            return {}
+        
+        from app.models.request_order import RequestOrder
+        
+        rows = db.session.query(
+            RequestOrder.project_id,
+            db.func.sum(PurchaseOrderItem.unit_price * PurchaseOrderItem.item_quantity)
+        ).join(
+            RequestOrder, PurchaseOrderItem.source_request_order_no == RequestOrder.request_order_no
+        ).filter(
+            PurchaseOrderItem.purchase_order_no == self.purchase_order_no,
+            RequestOrder.project_id.isnot(None)
+        ).group_by(RequestOrder.project_id).all()
+        
+        return {
+            (project_id, self.supplier_id): Decimal(str(total or 0))
+            for project_id, total in rows
+        }
+    
+    def apply_project_cost_change(self, previous_costs):
+        """Apply the change from previous_costs to the current breakdown as ledger deltas.
+        
+        Capture previous_costs with project_cost_breakdown() before confirming,
+        cancelling or editing the PO. Runs in the caller's transaction.
+        """
+        from app.models.project import ProjectSupplierExpenditure
+        
+        current_costs = self.project_cost_breakdown()
+        for key in set(previous_costs) | set(current_costs):
+            delta = current_costs.get(key, Decimal('0')) - previous_costs.get(key, Decimal('0'))
+            if delta:
+                project_id, supplier_id = key
+                ProjectSupplierExpenditure.apply_delta(project_id, supplier_id, delta)
     
     def recalculate_totals(self, tax_rate=5.0):
         """Recalculate totals based on current line items"""
@@ -322,6 +361,30 @@ class PurchaseOrder(db.Model):
             'export_timestamp': datetime.utcnow().isoformat()
         }
     
+    @staticmethod
+    def billing_breakdown():
+        """PO counts and grand totals per billing status in one GROUP BY pass.
+
+        Rows are split by whether the PO is purchased and by payment method,
+        which is enough to build every accounting summary from them.
+        """
+        purchased = db.case((PurchaseOrder.purchase_status == 'purchased', 1), else_=0)
+        rows = db.session.query(
+            PurchaseOrder.billing_status,
+            purchased.label('purchased'),
+            PurchaseOrder.payment_method,
+            db.func.count(PurchaseOrder.purchase_order_no),
+            db.func.sum(PurchaseOrder.grand_total_int)
+        ).group_by(PurchaseOrder.billing_status, purchased, PurchaseOrder.payment_method).all()
+
+        return [{
+            'billing_status': billing_status,
+            'purchased': bool(is_purchased),
+            'payment_method': payment_method,
+            'count': count,
+            'amount': int(amount or 0)
+        } for billing_status, is_purchased, payment_method, count, amount in rows]
+    
     def to_dict(self, include_user_details=False):
         def safe_isoformat(value):
             """Safely convert datetime/date to ISO format string"""
@@ -453,6 +516,41 @@ class PurchaseOrderItem(db.Model):
         if self.line_status in ['purchased', 'shipped']:
             self.line_status = 'arrived'
     
+    @staticmethod
+    def bulk_to_dict(items):
+        """Serialize many PO lines exactly like to_dict().
+
+        The source requisition lines, their orders and requesters are loaded
+        with one IN query each instead of lazily per line.
+        """
+        from app.models.request_order import RequestOrder, RequestOrderItem
+        from app.models.user import User
+
+        items = list(items)
+        if not items:
+            return []
+
+        def load(model, key, values):
+            values = {value for value in values if value is not None}
+            if not values:
+                return {}
+            return {getattr(row, key): row for row in model.query.filter(getattr(model, key).in_(values))}
+
+        request_items = load(RequestOrderItem, 'detail_id', (item.source_detail_id for item in items))
+        orders = load(RequestOrder, 'request_order_no',
+                      (request_item.request_order_no for request_item in request_items.values()))
+        requesters = load(User, 'user_id', (order.requester_id for order in orders.values()))
+
+        # Populate the relationships as if eager-loaded
+        for item in items:
+            set_committed_value(item, 'source_request_item', request_items.get(item.source_detail_id))
+        for request_item in request_items.values():
+            set_committed_value(request_item, 'request_order', orders.get(request_item.request_order_no))
+        for order in orders.values():
+            set_committed_value(order, 'requester', requesters.get(order.requester_id))
+
+        return [item.to_dict() for item in items]
+
     def to_dict(self):
         result = {
             'detail_id': self.detail_id,
@@ -495,7 +593,7 @@ class PurchaseOrderItem(db.Model):
         result = self.to_dict(include_user_details=True)
 
         # Add detailed items information
-        result['items'] = [item.to_dict() for item in self.items]
+        result['items'] = PurchaseOrderItem.bulk_to_dict(self.items)
 
         # Calculate items summary
         result['item_count'] = self.items.count()
@@ -507,66 +605,3 @@ class PurchaseOrderItem(db.Model):
             result['supplier_region'] = self.supplier.supplier_region
 
         return result
-
-    def _update_project_costs(self):
-        """Update project costs when purchase order is confirmed"""
-        try:
-            from app.models.request_order import RequestOrder
-            from app.models.project import Project, ProjectSupplierExpenditure
-            
-            # Find all request orders linked to items in this purchase order
-            affected_projects = set()
-            
-            for item in self.items:
-                if item.source_request_order_no:
-                    request_order = RequestOrder.query.filter_by(
-                        request_order_no=item.source_request_order_no
-                    ).first()
-                    
-                    if request_order and request_order.project_id:
-                        affected_projects.add(request_order.project_id)
-            
-            # Update costs for each affected project
-            for project_id in affected_projects:
-                project = Project.query.get(project_id)
-                if project:
-                    # Calculate total expenditure for this supplier in this project
-                    total_amount = db.session.query(
-                        db.func.sum(PurchaseOrderItem.unit_price * PurchaseOrderItem.item_quantity)
-                    ).join(PurchaseOrder, PurchaseOrderItem.purchase_order_no == PurchaseOrder.purchase_order_no)\
-                     .join(RequestOrder, PurchaseOrderItem.source_request_order_no == RequestOrder.request_order_no)\
-                     .filter(
-                         RequestOrder.project_id == project_id,
-                         PurchaseOrder.supplier_id == self.supplier_id,
-                         PurchaseOrder.purchase_status == 'purchased'
-                     ).scalar() or 0
-                    
-                    # Update or create supplier expenditure record
-                    expenditure = ProjectSupplierExpenditure.query.filter_by(
-                        project_id=project_id,
-                        supplier_id=self.supplier_id
-                    ).first()
-                    
-                    if expenditure:
-                        expenditure.expenditure_amount = total_amount
-                        expenditure.updated_at = datetime.utcnow()
-                    else:
-                        expenditure = ProjectSupplierExpenditure(
-                            project_id=project_id,
-                            supplier_id=self.supplier_id,
-                            expenditure_amount=total_amount
-                        )
-                        db.session.add(expenditure)
-                    
-                    # Recalculate project total expenditure
-                    project.calculate_total_expenditure()
-                    db.session.commit()
-                    
-        except Exception as e:
-            # Log error but don't break the purchase confirmation
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Error updating project costs for PO {self.purchase_order_no}: {str(e)}")
-            # Re-raise in development, but catch in production
-            if db.app and db.app.config.get('DEBUG', False):
-                raise
\ No newline at end of file
@@ -161,6 +161,28 @@ class PendingStorageItem(db.Model):
         )
         return item
     
+    @staticmethod
+    def bulk_create_from_receiving_records(receiving_records):
+        """Insert pending storage items for flushed receiving records in one executemany"""
+        rows = [
+            {
+                'receiving_record_id': record.receiving_id,
+                'item_name': record.item_name,
+                'item_specification': record.item_specification,
+                'quantity': record.quantity_received,
+                'unit': record.unit,
+                'source_po_number': record.purchase_order_no,
+                'requisition_number': record.requisition_number,
+                'consolidation_number': record.consolidation_number,
+                'arrival_date': record.received_at.date() if record.received_at else None,
+                'receiver': record.receiver_name
+            }
+            for record in receiving_records
+        ]
+        if rows:
+            db.session.bulk_insert_mappings(PendingStorageItem, rows)
+        return len(rows)
+    
     def assign_storage(self, storage_id):
         """Assign storage location to pending item"""
         self.assigned_storage_id = storage_id
@@ -1,4 +1,5 @@
 from datetime import datetime, date
+from sqlalchemy.orm.attributes import set_committed_value
 from app import db
 from decimal import Decimal
 
@@ -9,6 +10,12 @@ class RequestOrder(db.Model):
     VALID_USAGE_TYPES = ['daily', 'project', '消耗品']
     VALID_ORDER_STATUSES = ['draft', 'submitted', 'reviewed', 'cancelled']
 
+    # Item statuses counted by get_summary()
+    # CRITICAL FIX: Count 'reviewed' items as approved items
+    APPROVED_ITEM_STATUSES = ('approved', 'reviewed')
+    # CRITICAL FIX: Include 'submitted' status as pending
+    PENDING_ITEM_STATUSES = ('pending_review', 'submitted')
+
     request_order_no = db.Column(db.String(50), primary_key=True)
     requester_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     requester_name = db.Column(db.String(100), nullable=False)
@@ -82,23 +89,116 @@ class RequestOrder(db.Model):
 
     def get_summary(self):
         """Get summary statistics of the request order"""
-        items = self.items.all()
-        total_items = len(items)
-        # CRITICAL FIX: Count 'reviewed' items as approved items
-        approved_items = len([i for i in items if i.item_status in ['approved', 'reviewed']])
-        rejected_items = len([i for i in items if i.item_status == 'rejected'])
-        questioned_items = len([i for i in items if i.item_status == 'questioned'])
-        # CRITICAL FIX: Include 'submitted' status as pending
-        pending_items = len([i for i in items if i.item_status in ['pending_review', 'submitted']])
+        status_counts = {}
+        for item in self.items.all():
+            status_counts[item.item_status] = status_counts.get(item.item_status, 0) + 1
+        return RequestOrder.summary_from_counts(status_counts)
+
+    @staticmethod
+    def summary_from_counts(status_counts):
+        """Build the get_summary() dict from {item_status: count}"""
+        def count(*statuses):
+            return sum(status_counts.get(status, 0) for status in statuses)
 
         return {
-            'total_items': total_items,
-            'approved_items': approved_items,
-            'rejected_items': rejected_items,
-            'questioned_items': questioned_items,
-            'pending_items': pending_items
+            'total_items': sum(status_counts.values()),
+            'approved_items': count(*RequestOrder.APPROVED_ITEM_STATUSES),
+            'rejected_items': count('rejected'),
+            'questioned_items': count('questioned'),
+            'pending_items': count(*RequestOrder.PENDING_ITEM_STATUSES)
         }
 
+    @staticmethod
+    def get_summaries(request_order_nos):
+        """get_summary() for many orders with one grouped count query"""
+        status_counts = {order_no: {} for order_no in request_order_nos}
+        if status_counts:
+            rows = db.session.query(
+                RequestOrderItem.request_order_no,
+                RequestOrderItem.item_status,
+                db.func.count(RequestOrderItem.detail_id)
+            ).filter(
+                RequestOrderItem.request_order_no.in_(list(status_counts))
+            ).group_by(
+                RequestOrderItem.request_order_no, RequestOrderItem.item_status
+            ).all()
+            for order_no, item_status, count in rows:
+                status_counts[order_no][item_status] = count
+
+        return {order_no: RequestOrder.summary_from_counts(counts) for order_no, counts in status_counts.items()}
+
+    @staticmethod
+    def scan_status_problems():
+        """Submitted orders whose items are all reviewed, found with one aggregate query.
+
+        These are the orders update_status_after_review() would move to
+        'reviewed'. Each row carries the order's get_summary() counts.
+        """
+        item = RequestOrderItem
+
+        def count_in(*statuses):
+            return db.func.sum(db.case((item.item_status.in_(statuses), 1), else_=0))
+
+        pending_items = count_in(*RequestOrder.PENDING_ITEM_STATUSES)
+        rows = db.session.query(
+            RequestOrder.request_order_no,
+            RequestOrder.requester_name,
+            RequestOrder.order_status,
+            RequestOrder.created_at,
+            RequestOrder.updated_at,
+            db.func.count(item.detail_id).label('total_items'),
+            count_in(*RequestOrder.APPROVED_ITEM_STATUSES).label('approved_items'),
+            count_in('rejected').label('rejected_items'),
+            count_in('questioned').label('questioned_items'),
+            pending_items.label('pending_items')
+        ).join(
+            item, item.request_order_no == RequestOrder.request_order_no
+        ).filter(
+            RequestOrder.order_status == 'submitted'
+        ).group_by(
+            RequestOrder.request_order_no, RequestOrder.requester_name, RequestOrder.order_status,
+            RequestOrder.created_at, RequestOrder.updated_at
+        ).having(
+            pending_items == 0
+        ).order_by(RequestOrder.request_order_no).all()
+
+        return [{
+            'request_order_no': row.request_order_no,
+            'requester_name': row.requester_name,
+            'order_status': row.order_status,
+            'created_at': row.created_at,
+            'updated_at': row.updated_at,
+            'summary': {
+                'total_items': row.total_items,
+                'approved_items': int(row.approved_items),
+                'rejected_items': int(row.rejected_items),
+                'questioned_items': int(row.questioned_items),
+                'pending_items': int(row.pending_items)
+            }
+        } for row in rows]
+
+    @staticmethod
+    def fix_status_problems():
+        """Move every order found by scan_status_problems() to 'reviewed' in one UPDATE.
+
+        The conditions are re-checked inside the statement, so an item sent
+        back to review in the meantime keeps its order submitted. Runs in the
+        caller's transaction and returns the number of orders updated.
+        """
+        item = RequestOrderItem
+        # Orders that have items and none pending, aggregated once rather than per order
+        fully_reviewed = db.select(item.request_order_no).group_by(item.request_order_no).having(
+            db.func.sum(db.case((item.item_status.in_(RequestOrder.PENDING_ITEM_STATUSES), 1), else_=0)) == 0
+        )
+
+        result = db.session.execute(
+            RequestOrder.__table__.update().where(
+                RequestOrder.order_status == 'submitted',
+                RequestOrder.request_order_no.in_(fully_reviewed)
+            ).values(order_status='reviewed', updated_at=datetime.utcnow())
+        )
+        return result.rowcount
+
     def update_status_after_review(self):
         """Update order status based on item review status - CRITICAL FIX VERSION"""
         print(f"[STATUS_UPDATE] Checking status for {self.request_order_no}")
@@ -149,7 +249,7 @@ class RequestOrder(db.Model):
             item.status_note = f"CANCELLED: {reason}"
             item.updated_at = datetime.utcnow()
 
-    def to_dict(self):
+    def to_dict(self, summary=None):
         # Get the latest chinese_name from the user relationship if available
         display_name = self.requester_name  # Fallback to stored name
         if self.requester:
@@ -169,9 +269,33 @@ class RequestOrder(db.Model):
             'is_urgent': self.is_urgent,
             'expected_delivery_date': self.expected_delivery_date.isoformat() if self.expected_delivery_date else None,
             'urgent_reason': self.urgent_reason,
-            'summary': self.get_summary()
+            'summary': summary if summary is not None else self.get_summary()
         }
 
+    @staticmethod
+    def bulk_to_dict(orders):
+        """Serialize a list of orders exactly like to_dict().
+
+        Item summaries come from one grouped query and requesters from one IN
+        query, instead of two queries per order.
+        """
+        from app.models.user import User
+
+        orders = list(orders)
+        if not orders:
+            return []
+
+        summaries = RequestOrder.get_summaries([order.request_order_no for order in orders])
+        requesters = {
+            user.user_id: user
+            for user in User.query.filter(User.user_id.in_({order.requester_id for order in orders}))
+        }
+        for order in orders:
+            # Populate the relationship as if eager-loaded, so to_dict() issues no SQL
+            set_committed_value(order, 'requester', requesters.get(order.requester_id))
+
+        return [order.to_dict(summary=summaries[order.request_order_no]) for order in orders]
+
 class RequestOrderItem(db.Model):
     __tablename__ = 'request_order_items'
 
@@ -292,12 +416,90 @@ class RequestOrderItem(db.Model):
         """Check if the item has been warehoused (has storage location)"""
         return self.get_storage_location() is not None
 
-    def to_dict(self):
+    @staticmethod
+    def get_storage_locations(detail_ids):
+        """get_storage_location() for many items: {detail_id: storage_id or None}"""
+        from app.models.storage import Storage, StorageHistory
+
+        locations = {detail_id: None for detail_id in detail_ids}
+        if not locations:
+            return locations
+
+        rows = db.session.query(
+            StorageHistory.request_item_id, Storage.storage_id
+        ).outerjoin(
+            Storage, Storage.storage_id == StorageHistory.storage_id
+        ).filter(
+            StorageHistory.request_item_id.in_(list(locations)),
+            StorageHistory.operation_type == 'in'
+        ).order_by(
+            StorageHistory.request_item_id, StorageHistory.operation_date, StorageHistory.history_id
+        ).all()
+
+        # Rows are oldest first per item, so the latest storage-in record wins
+        for detail_id, storage_id in rows:
+            locations[detail_id] = storage_id
+        return locations
+
+    @staticmethod
+    def preload_related(items):
+        """Load what to_dict() needs for many items in one query per relation.
+
+        Suppliers and categories are set on the relationships as if
+        eager-loaded; reviewers and storage locations are returned as lookups
+        to pass to to_dict(related=...).
+        """
+        from app.models.user import User
+        from app.models.supplier import Supplier
+        from app.models.item_category import ItemCategory
+
+        supplier_ids = {item.supplier_id for item in items if item.supplier_id}
+        suppliers = {
+            supplier.supplier_id: supplier
+            for supplier in Supplier.query.filter(Supplier.supplier_id.in_(supplier_ids))
+        } if supplier_ids else {}
+
+        category_codes = {item.item_category for item in items if item.item_category}
+        categories = {
+            category.category_code: category
+            for category in ItemCategory.query.filter(ItemCategory.category_code.in_(category_codes))
+        } if category_codes else {}
+
+        for item in items:
+            set_committed_value(item, 'supplier', suppliers.get(item.supplier_id))
+            set_committed_value(item, 'category', categories.get(item.item_category))
+
+        reviewer_ids = {item.reviewer_id for item in items if item.reviewer_id}
+        reviewers = {
+            user.user_id: user
+            for user in User.query.filter(User.user_id.in_(reviewer_ids))
+        } if reviewer_ids else {}
+
+        return {
+            'reviewers': reviewers,
+            'storage_locations': RequestOrderItem.get_storage_locations([item.detail_id for item in items])
+        }
+
+    @staticmethod
+    def bulk_to_dict(items):
+        """Serialize many items exactly like to_dict(), with a fixed number of queries"""
+        items = list(items)
+        if not items:
+            return []
+
+        related = RequestOrderItem.preload_related(items)
+        return [item.to_dict(related=related) for item in items]
+
+    def to_dict(self, related=None):
+        """Serialize the item; related comes from preload_related() when serializing in bulk"""
         # Get reviewer info if available
         reviewer_info = None
         if self.reviewer_id:
-            from app.models.user import User
-            reviewer = User.query.get(self.reviewer_id)
+            if related is not None:
+                reviewer = related['reviewers'].get(self.reviewer_id)
+            else:
+                from app.models.user import User
+                reviewer = db.session.get(User, self.reviewer_id)
             if reviewer:
                 reviewer_info = {
                     'user_id': reviewer.user_id,
@@ -305,6 +507,11 @@ class RequestOrderItem(db.Model):
                     'chinese_name': reviewer.chinese_name
                 }
 
+        if related is not None:
+            storage_location = related['storage_locations'].get(self.detail_id)
+        else:
+            storage_location = self.get_storage_location()
+
         return {
             'detail_id': self.detail_id,
             'request_order_no': self.request_order_no,
@@ -329,6 +536,6 @@ class RequestOrderItem(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'supplier': self.supplier.to_summary_dict() if self.supplier else None,
             'category_info': self.category.to_dict() if self.category else None,
-            'storage_location': self.get_storage_location(),
-            'is_warehoused': self.is_warehoused()
+            'storage_location': storage_location,
+            'is_warehoused': storage_location is not None
         }
\ No newline at end of file
@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy import event
 from app import db
 from decimal import Decimal
 
@@ -53,35 +54,77 @@ class Storage(db.Model):
     
     def get_current_inventory(self):
         """Get current inventory at this storage location"""
-        # Calculate in - out for each item
+        # Read from the maintained balance table instead of re-aggregating the ledger
         inventory = db.session.query(
-            StorageHistory.item_id,
-            StorageHistory.source_no,
-            StorageHistory.source_line,
-            db.func.sum(
-                db.case(
-                    (StorageHistory.operation_type == 'in', StorageHistory.quantity),
-                    else_=-StorageHistory.quantity
-                )
-            ).label('current_quantity')
+            StorageBalance.item_id,
+            StorageBalance.source_no,
+            StorageBalance.source_line,
+            StorageBalance.quantity.label('current_quantity')
         ).filter(
-            StorageHistory.storage_id == self.storage_id
-        ).group_by(
-            StorageHistory.item_id,
-            StorageHistory.source_no,
-            StorageHistory.source_line
-        ).having(
-            db.func.sum(
-                db.case(
-                    (StorageHistory.operation_type == 'in', StorageHistory.quantity),
-                    else_=-StorageHistory.quantity
-                )
-            ) > 0
+            StorageBalance.storage_id == self.storage_id,
+            StorageBalance.quantity > 0
         ).all()
         
         return inventory
     
-    def to_dict(self):
+    @staticmethod
+    def get_inventory_counts(storage_ids=None):
+        """Count in-stock balance lines per location in one grouped query.
+        
+        Returns {storage_id: count}; locations without stock are omitted.
+        """
+        query = db.session.query(
+            StorageBalance.storage_id,
+            db.func.count().label('line_count')
+        ).filter(
+            StorageBalance.quantity > 0
+        ).group_by(StorageBalance.storage_id)
+        
+        if storage_ids is None:
+            return {row.storage_id: row.line_count for row in query.all()}
+        
+        counts = {}
+        storage_ids = list(storage_ids)
+        # Chunk IN lists to stay under SQLite's bound-parameter limit
+        for i in range(0, len(storage_ids), 500):
+            chunk = storage_ids[i:i + 500]
+            for row in query.filter(StorageBalance.storage_id.in_(chunk)).all():
+                counts[row.storage_id] = row.line_count
+        return counts
+    
+    @staticmethod
+    def get_many(storage_ids):
+        """Batch-load storages by id, returns {storage_id: Storage}"""
+        storage_ids = list({sid for sid in storage_ids if sid})
+        storages = {}
+        for i in range(0, len(storage_ids), 500):
+            chunk = storage_ids[i:i + 500]
+            for storage in Storage.query.filter(Storage.storage_id.in_(chunk)).all():
+                storages[storage.storage_id] = storage
+        return storages
+    
+    @staticmethod
+    def serialize_many(storages, all_locations=False):
+        """Serialize storages with inventory counts from a single grouped query.
+        
+        Pass all_locations=True when serializing (nearly) every location, which
+        skips the IN list and counts across the whole balance table.
+        """
+        storages = list(storages)
+        if not storages:
+            return []
+        
+        if all_locations:
+            counts = Storage.get_inventory_counts()
+        else:
+            counts = Storage.get_inventory_counts(s.storage_id for s in storages)
+        
+        return [s.to_dict(inventory_count=counts.get(s.storage_id, 0)) for s in storages]
+    
+    def to_dict(self, inventory_count=None):
+        if inventory_count is None:
+            inventory_count = len(self.get_current_inventory())
+        
         return {
             'storage_id': self.storage_id,
             'area_code': self.area_code,
@@ -91,7 +134,7 @@ class Storage(db.Model):
             'left_middle_right_position': self.left_middle_right_position,
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'current_inventory': len(self.get_current_inventory())
+            'current_inventory': inventory_count
         }
 
 class StorageHistory(db.Model):
@@ -161,22 +204,19 @@ class StorageHistory(db.Model):
     @staticmethod
     def get_current_quantity(storage_id, item_id, source_no=None, source_line=None):
         """Get current quantity for a specific item at a storage location"""
+        # Balance rows are keyed by (storage_id, item_id, source_no, source_line), so a
+        # fully specified lookup is a primary key hit instead of a ledger scan
         query = db.session.query(
-            db.func.sum(
-                db.case(
-                    (StorageHistory.operation_type == 'in', StorageHistory.quantity),
-                    else_=-StorageHistory.quantity
-                )
-            )
+            db.func.sum(StorageBalance.quantity)
         ).filter(
-            StorageHistory.storage_id == storage_id,
-            StorageHistory.item_id == item_id
+            StorageBalance.storage_id == storage_id,
+            StorageBalance.item_id == item_id
         )
         
         if source_no:
-            query = query.filter(StorageHistory.source_no == source_no)
+            query = query.filter(StorageBalance.source_no == source_no)
         if source_line is not None:
-            query = query.filter(StorageHistory.source_line == source_line)
+            query = query.filter(StorageBalance.source_line == source_line)
         
         result = query.scalar()
         return float(result) if result else 0.0
@@ -198,4 +238,201 @@ class StorageHistory(db.Model):
             'storage': self.storage.to_dict() if self.storage else None,
             'operator': self.operator.to_dict() if self.operator else None,
             'request_item': self.request_item.to_dict() if self.request_item else None
-        }
\ No newline at end of file
+        }
+
+# Sentinels used for balance keys when the ledger row has no source document.
+# Primary key columns cannot be NULL, so missing values are normalised here.
+NO_SOURCE_NO = ''
+NO_SOURCE_LINE = -1
+
+
+class StorageBalance(db.Model):
+    """Materialized on-hand quantity per (storage, item, source document line).
+
+    Maintained in the same transaction as every StorageHistory insert, so stock
+    checks never have to re-aggregate the whole ledger.
+    """
+    __tablename__ = 'storage_balances'
+    
+    storage_id = db.Column(db.String(20), db.ForeignKey('storages.storage_id'), primary_key=True)
+    item_id = db.Column(db.String(50), primary_key=True)
+    source_no = db.Column(db.String(50), primary_key=True, default=NO_SOURCE_NO)
+    source_line = db.Column(db.Integer, primary_key=True, default=NO_SOURCE_LINE)
+    quantity = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('idx_storage_balances_storage_qty', 'storage_id', 'quantity'),
+        db.Index('idx_storage_balances_item', 'item_id'),
+    )
+    
+    def __repr__(self):
+        return f'<StorageBalance {self.storage_id}: {self.item_id} {self.quantity}>'
+    
+    @staticmethod
+    def normalize_key(source_no, source_line):
+        """Map ledger source fields onto non-null balance key values"""
+        return (
+            source_no if source_no is not None else NO_SOURCE_NO,
+            source_line if source_line is not None else NO_SOURCE_LINE
+        )
+    
+    @staticmethod
+    def denormalize_key(source_no, source_line):
+        """Map balance key values back to the ledger representation"""
+        return (
+            source_no if source_no != NO_SOURCE_NO else None,
+            source_line if source_line != NO_SOURCE_LINE else None
+        )
+    
+    @staticmethod
+    def apply_delta(connection, storage_id, item_id, source_no, source_line, delta):
+        """Atomically add delta to a balance row, creating it when missing"""
+        source_no, source_line = StorageBalance.normalize_key(source_no, source_line)
+        table = StorageBalance.__table__
+        now = datetime.utcnow()
+        values = {
+            'storage_id': storage_id,
+            'item_id': item_id,
+            'source_no': source_no,
+            'source_line': source_line,
+            'quantity': delta,
+            'updated_at': now
+        }
+        
+        dialect = connection.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            
+            stmt = insert(table).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.storage_id, table.c.item_id, table.c.source_no, table.c.source_line],
+                set_={
+                    'quantity': table.c.quantity + stmt.excluded.quantity,
+                    'updated_at': stmt.excluded.updated_at
+                }
+            )
+            connection.execute(stmt)
+            return
+        
+        # Generic fallback: relative UPDATE first, INSERT when no row exists yet
+        result = connection.execute(
+            table.update().where(
+                db.and_(
+                    table.c.storage_id == storage_id,
+                    table.c.item_id == item_id,
+                    table.c.source_no == source_no,
+                    table.c.source_line == source_line
+                )
+            ).values(quantity=table.c.quantity + delta, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**values))
+    
+    @staticmethod
+    def reconcile(fix=False):
+        """Compare balances against the StorageHistory ledger.
+        
+        Returns a report with every drifted key. When fix is True the balance
+        table is rewritten to match the ledger; the caller commits.
+        """
+        signed_quantity = db.func.sum(
+            db.case(
+                (StorageHistory.operation_type == 'in', StorageHistory.quantity),
+                else_=-StorageHistory.quantity
+            )
+        )
+        source_no = db.func.coalesce(StorageHistory.source_no, NO_SOURCE_NO)
+        source_line = db.func.coalesce(StorageHistory.source_line, NO_SOURCE_LINE)
+        
+        ledger_rows = db.session.query(
+            StorageHistory.storage_id,
+            StorageHistory.item_id,
+            source_no,
+            source_line,
+            signed_quantity
+        ).group_by(
+            StorageHistory.storage_id,
+            StorageHistory.item_id,
+            source_no,
+            source_line
+        ).all()
+        
+        ledger = {
+            (row[0], row[1], row[2], row[3]): Decimal(str(row[4] or 0))
+            for row in ledger_rows
+        }
+        balances = {
+            (b.storage_id, b.item_id, b.source_no, b.source_line): Decimal(str(b.quantity or 0))
+            for b in StorageBalance.query.all()
+        }
+        
+        drift = []
+        for key in set(ledger) | set(balances):
+            expected = ledger.get(key, Decimal('0'))
+            actual = balances.get(key)
+            if actual is None or actual != expected:
+                drift.append({
+                    'storage_id': key[0],
+                    'item_id': key[1],
+                    'source_no': key[2],
+                    'source_line': key[3],
+                    'ledger_quantity': float(expected),
+                    'balance_quantity': float(actual) if actual is not None else None
+                })
+        
+        if fix:
+            for entry in drift:
+                key = (entry['storage_id'], entry['item_id'], entry['source_no'], entry['source_line'])
+                if key in ledger:
+                    db.session.merge(StorageBalance(
+                        storage_id=key[0],
+                        item_id=key[1],
+                        source_no=key[2],
+                        source_line=key[3],
+                        quantity=ledger[key]
+                    ))
+                else:
+                    StorageBalance.query.filter_by(
+                        storage_id=key[0],
+                        item_id=key[1],
+                        source_no=key[2],
+                        source_line=key[3]
+                    ).delete()
+        
+        return {
+            'ledger_keys': len(ledger),
+            'balance_keys': len(balances),
+            'drift_count': len(drift),
+            'drift': drift,
+            'fixed': bool(fix and drift)
+        }
+    
+    def to_dict(self):
+        source_no, source_line = StorageBalance.denormalize_key(self.source_no, self.source_line)
+        return {
+            'storage_id': self.storage_id,
+            'item_id': self.item_id,
+            'source_no': source_no,
+            'source_line': source_line,
+            'quantity': float(self.quantity),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+@event.listens_for(StorageHistory, 'after_insert')
+def _update_storage_balance(mapper, connection, target):
+    """Keep storage_balances in step with each ledger row, inside the same transaction"""
+    quantity = Decimal(str(target.quantity))
+    delta = quantity if target.operation_type == 'in' else -quantity
+    StorageBalance.apply_delta(
+        connection,
+        target.storage_id,
+        target.item_id,
+        target.source_no,
+        target.source_line,
+        delta
+    )
@@ -1,7 +1,16 @@
+import time
 from datetime import datetime
+from flask import current_app
 from app import db
 from decimal import Decimal
 
+# set_setting bumps this row; workers reload their snapshot when it changes
+VERSION_TYPE = '_meta'
+VERSION_KEY = 'settings_version'
+
+# Process-local snapshot of every setting: (version, {(type, key): value}, checked_at)
+_snapshot = (None, {}, 0.0)
+
 class SystemSettings(db.Model):
     __tablename__ = 'system_settings'
     
@@ -19,9 +28,47 @@ class SystemSettings(db.Model):
     def __repr__(self):
         return f'<SystemSettings {self.setting_type}.{self.setting_key}: {self.setting_value}>'
     
+    @staticmethod
+    def _current_version():
+        return db.session.query(SystemSettings.setting_value).filter_by(
+            setting_type=VERSION_TYPE,
+            setting_key=VERSION_KEY
+        ).scalar()
+
+    @staticmethod
+    def snapshot():
+        """All settings as {(type, key): value}, loaded once per worker
+
+        The version row is re-read at most every SETTINGS_CACHE_CHECK_SECONDS;
+        the snapshot is reloaded only when another worker changed a setting.
+        """
+        global _snapshot
+        version, values, checked_at = _snapshot
+        now = time.monotonic()
+        if version is not None and now - checked_at < current_app.config.get('SETTINGS_CACHE_CHECK_SECONDS', 5):
+            return values
+
+        current_version = SystemSettings._current_version() or '0'
+        if current_version != version:
+            values = {
+                (setting.setting_type, setting.setting_key): setting.setting_value
+                for setting in SystemSettings.query.all()
+            }
+        _snapshot = (current_version, values, now)
+        return values
+
+    @staticmethod
+    def invalidate_snapshot():
+        """Reload this worker's snapshot on the next read"""
+        global _snapshot
+        _snapshot = (None, {}, 0.0)
+
     @staticmethod
     def get_setting(setting_type, setting_key, default=None):
         """Get a system setting value"""
+        if current_app.config.get('SETTINGS_CACHE_ENABLED', True):
+            return SystemSettings.snapshot().get((setting_type, setting_key), default)
+
         setting = SystemSettings.query.filter_by(
             setting_type=setting_type,
             setting_key=setting_key
@@ -84,8 +131,29 @@ class SystemSettings(db.Model):
                 setting_description=description
             )
             db.session.add(setting)
-        
+
+        SystemSettings._bump_version()
         return setting
+
+    @staticmethod
+    def _bump_version():
+        """Advance the version row in the caller's transaction so every worker reloads"""
+        bumped = SystemSettings.query.filter_by(
+            setting_type=VERSION_TYPE,
+            setting_key=VERSION_KEY
+        ).update({
+            'setting_value': db.cast(db.cast(SystemSettings.setting_value, db.Integer) + 1, db.Text),
+            'updated_at': datetime.utcnow()
+        }, synchronize_session=False)
+        if not bumped:
+            db.session.add(SystemSettings(
+                setting_type=VERSION_TYPE,
+                setting_key=VERSION_KEY,
+                setting_value='1',
+                setting_description='Settings cache version'
+            ))
+        # This worker reloads immediately; a rolled back change is picked up by the version check
+        SystemSettings.invalidate_snapshot()
     
     @staticmethod
     def get_tax_rate():
@@ -100,12 +168,14 @@ class SystemSettings(db.Model):
     @staticmethod
     def get_company_settings():
         """Get all company-related settings"""
-        settings = SystemSettings.query.filter_by(setting_type='system').all()
-        return {s.setting_key: s.setting_value for s in settings}
+        return SystemSettings.get_all_settings_by_type('system')
     
     @staticmethod
     def get_all_settings_by_type(setting_type):
         """Get all settings of a specific type"""
+        if current_app.config.get('SETTINGS_CACHE_ENABLED', True):
+            return {key: value for (type_, key), value in SystemSettings.snapshot().items() if type_ == setting_type}
+
         settings = SystemSettings.query.filter_by(setting_type=setting_type).all()
         return {s.setting_key: s.setting_value for s in settings}
     
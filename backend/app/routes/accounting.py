@@ -3,6 +3,8 @@ from app import db
 from app.models.purchase_order import PurchaseOrder
 from app.models.supplier import Supplier
 from app.auth import accountant_required, authenticated_required, create_response, create_error_response, paginate_query
+from app.utils import user_cache
+from app.services import billing_engine, billing_summary, invoice_export
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal
@@ -63,13 +65,12 @@ def search_purchase_orders_for_invoice():
 
     # For GET requests, manually handle authentication
     from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-    from app.models.user import User
 
     try:
         # This will validate the JWT token
         verify_jwt_in_request()
         current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        current_user = user_cache.get_user(current_user_id)
 
         if not current_user or not current_user.is_active:
             return create_error_response(
@@ -92,10 +93,9 @@ def authenticate_and_process():
     """Process the actual request after authentication"""
     # Authentication is already verified above
     from flask_jwt_extended import get_jwt_identity
-    from app.models.user import User
 
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = user_cache.get_user(current_user_id)
 
     try:
         # Support both supplier_id and supplier_name for backward compatibility
@@ -195,15 +195,20 @@ def authenticate_and_process():
             status_code=500
         )
 
+def _export_format(data, default):
+    """Requested export format: 'json' (legacy payload), 'csv' or 'xlsx'"""
+    return (data.get('format') or request.args.get('format') or default).lower()
+
+
 @bp.route('/invoice-management/export', methods=['POST'])
 @authenticated_required
 def export_invoice_data(current_user):
-    """Export invoice data to Excel format"""
+    """Export invoice data as a streamed CSV/xlsx file, or as JSON rows"""
     try:
         data = request.get_json()
 
-        # Get the purchase order IDs to export
-        po_ids = data.get('purchase_order_ids', [])
+        # Get the purchase order IDs to export (the dashboard sends its search results)
+        po_ids = data.get('purchase_order_ids') or data.get('search_results') or []
 
         if not po_ids:
             return create_error_response(
@@ -212,30 +217,21 @@ def export_invoice_data(current_user):
                 status_code=400
             )
 
-        # Query purchase orders
-        purchase_orders = PurchaseOrder.query.filter(
-            PurchaseOrder.purchase_order_no.in_(po_ids)
-        ).all()
+        # Callers passing purchase_order_ids get the original JSON payload by default
+        export_format = _export_format(data, 'json' if 'purchase_order_ids' in data else 'xlsx')
+        if export_format not in ('json',) + tuple(invoice_export.FORMATS):
+            return create_error_response(
+                'INVALID_FORMAT',
+                'format must be one of json, csv, xlsx',
+                status_code=400
+            )
 
-        # Prepare export data
-        export_data = []
-        for po in purchase_orders:
-            for item in po.items:
-                export_data.append({
-                    '採購單號': po.purchase_order_no,
-                    '供應商': po.supplier.supplier_name_zh if po.supplier else '',
-                    '項目名稱': item.item_name,
-                    '規格': item.item_specification,
-                    '數量': item.item_quantity,
-                    '單位': item.item_unit,
-                    '單價': item.unit_price,
-                    '小計': item.line_subtotal,
-                    '狀態': po.purchase_status,
-                    '建立日期': po.created_at.strftime('%Y-%m-%d'),
-                    '確認日期': po.confirm_purchase_date.strftime('%Y-%m-%d') if po.confirm_purchase_date else ''
-                })
-
-        return create_response({'export_data': export_data})
+        lines = invoice_export.iter_lines(po_ids)
+        if export_format == 'json':
+            return create_response({'export_data': list(lines)})
+
+        filename = f"invoice_{data.get('supplier_id') or 'export'}_{data.get('invoice_month') or date.today().strftime('%Y-%m')}"
+        return invoice_export.export_response(lines, export_format, filename)
 
     except Exception as e:
         return create_error_response(
@@ -350,69 +346,52 @@ def generate_billing(current_user):
         other_deduction = Decimal(str(data.get('other_deduction', 0)))
         invoice_or_receipt = data.get('invoice_or_receipt', '')
         
-        # Validate and get POs
-        pos = []
-        for po_no in po_numbers:
-            po = PurchaseOrder.query.filter_by(
-                purchase_order_no=po_no,
-                supplier_id=supplier_id,
-                billing_status='none'
-            ).first()
-            
-            if not po:
-                return create_error_response(
-                    'INVALID_PO',
-                    f'PO {po_no} not found or already billed',
-                    status_code=400
-                )
-            pos.append(po)
-        
-        # Calculate billing amounts
-        total_subtotal = sum(po.subtotal_int for po in pos)
-        total_tax = sum(po.tax_decimal1 for po in pos)
-        total_grand = sum(po.grand_total_int for po in pos)
-        
+        idempotency_key = request.headers.get('Idempotency-Key')
+        replayed = billing_engine.reserve(idempotency_key, 'generate_billing', current_user.user_id, data)
+        if replayed:
+            return create_response(replayed[0], status_code=replayed[1])
+
+        # Validate the whole PO set and bill it in one UPDATE
+        result = billing_engine.generate_billing(supplier_id, month_str, term, po_numbers)
+
         # Apply adjustments
-        billed_amount = Decimal(total_grand) - discount - other_deduction
-        
-        # Calculate due date (end of month + payment term)
-        month_date = datetime.strptime(month_str, '%Y-%m').date()
-        month_end = (month_date + relativedelta(months=1) - relativedelta(days=1))
-        due_date = month_end + relativedelta(days=term)
-        
-        # Update POs
-        for po in pos:
-            po.billing_status = 'billed'
-            po.billed_month = month_str
-            po.due_date = due_date
-        
+        billed_amount = Decimal(result['grand_total']) - discount - other_deduction
+
         db.session.commit()
-        
+        billing_summary.invalidate()
+
         # Return billing summary
-        billing_summary = {
+        billing = {
             'supplier_id': supplier_id,
             'month': month_str,
             'term': term,
-            'due_date': due_date.isoformat(),
-            'po_count': len(pos),
+            'due_date': result['due_date'].isoformat(),
+            'po_count': len(result['outcomes']),
             'po_numbers': po_numbers,
             'amounts': {
-                'subtotal': total_subtotal,
-                'tax': float(total_tax),
-                'grand_total': total_grand,
+                'subtotal': result['subtotal'],
+                'tax': float(result['tax']),
+                'grand_total': result['grand_total'],
                 'discount': float(discount),
                 'other_deduction': float(other_deduction),
                 'billed_amount': float(billed_amount)
             },
             'invoice_or_receipt': invoice_or_receipt,
+            'outcomes': result['outcomes'],
             'created_by': current_user.chinese_name,
             'created_at': datetime.utcnow().isoformat()
         }
-        
-        return create_response(billing_summary, status_code=201)
-        
+        billing_engine.remember(idempotency_key, 'generate_billing', current_user.user_id, data, billing, 201)
+
+        return create_response(billing, status_code=201)
+
+    except billing_engine.BillingError as e:
+        db.session.rollback()
+        billing_engine.release()
+        return create_error_response(e.code, e.message, e.details, status_code=e.status_code)
     except Exception as e:
         db.session.rollback()
+        billing_engine.release()
         return create_error_response(
             'BILLING_GENERATE_ERROR',
             'Failed to generate billing',
@@ -468,46 +447,47 @@ def mark_batch_paid(current_user, billing_id):
                 status_code=400
             )
         
-        # Find all billed POs for this supplier and month
-        pos = PurchaseOrder.query.filter(
-            PurchaseOrder.supplier_id == supplier_id,
-            PurchaseOrder.billed_month == month,
-            PurchaseOrder.billing_status == 'billed'
-        ).all()
-        
-        if not pos:
-            return create_error_response(
-                'BILLING_NOT_FOUND',
-                'Billing batch not found',
-                status_code=404
-            )
-        
-        # Check idempotency - if already paid, return success
-        already_paid = all(po.billing_status == 'paid' for po in pos)
-        if already_paid:
-            return create_response({
+        idempotency_key = request.headers.get('Idempotency-Key')
+        replayed = billing_engine.reserve(idempotency_key, f'mark_batch_paid:{billing_id}', current_user.user_id, data)
+        if replayed:
+            return create_response(replayed[0], status_code=replayed[1])
+
+        # Pay all billed POs for this supplier and month in one UPDATE
+        result = billing_engine.mark_batch_paid(supplier_id, month, method, pay_date)
+
+        # Idempotent: a batch with nothing left to pay reports success
+        if not result['paid']:
+            payload = {
                 'message': 'Billing batch already marked as paid',
-                'po_count': len(pos)
-            })
-        
-        # Mark all POs as paid
-        for po in pos:
-            po.billing_status = 'paid'
-            po.payment_method = method
-        
+                'po_count': len(result['outcomes']),
+                'outcomes': result['outcomes']
+            }
+            billing_engine.remember(idempotency_key, f'mark_batch_paid:{billing_id}', current_user.user_id, data, payload)
+            return create_response(payload)
+
         db.session.commit()
-        
-        return create_response({
+        billing_summary.invalidate()
+
+        payload = {
             'message': 'Billing batch marked as paid',
             'supplier_id': supplier_id,
             'month': month,
-            'po_count': len(pos),
+            'po_count': len(result['paid']),
             'payment_method': method,
-            'pay_date': pay_date.isoformat()
-        })
-        
+            'pay_date': pay_date.isoformat(),
+            'outcomes': result['outcomes']
+        }
+        billing_engine.remember(idempotency_key, f'mark_batch_paid:{billing_id}', current_user.user_id, data, payload)
+
+        return create_response(payload)
+
+    except billing_engine.BillingError as e:
+        db.session.rollback()
+        billing_engine.release()
+        return create_error_response(e.code, e.message, e.details, status_code=e.status_code)
     except Exception as e:
         db.session.rollback()
+        billing_engine.release()
         return create_error_response(
             'MARK_PAID_ERROR',
             'Failed to mark batch as paid',
@@ -565,6 +545,7 @@ def mark_po_paid(current_user, po_no):
         po.payment_method = method
         
         db.session.commit()
+        billing_summary.invalidate()
         
         return create_response({
             'message': 'PO marked as paid',
@@ -627,42 +608,8 @@ def get_payment_history(current_user):
 def get_accounting_summary(current_user):
     """Get accounting summary for dashboard"""
     try:
-        # Get counts and amounts
-        unpaid_count = PurchaseOrder.query.filter_by(billing_status='none', purchase_status='purchased').count()
-        billed_count = PurchaseOrder.query.filter_by(billing_status='billed').count()
-        paid_count = PurchaseOrder.query.filter_by(billing_status='paid').count()
-
-        # Get amounts
-        unpaid_amount = db.session.query(
-            db.func.sum(PurchaseOrder.grand_total_int)
-        ).filter_by(billing_status='none', purchase_status='purchased').scalar() or 0
-
-        billed_amount = db.session.query(
-            db.func.sum(PurchaseOrder.grand_total_int)
-        ).filter_by(billing_status='billed').scalar() or 0
-
-        paid_amount = db.session.query(
-            db.func.sum(PurchaseOrder.grand_total_int)
-        ).filter_by(billing_status='paid').scalar() or 0
-
-        return create_response({
-            'unpaid': {
-                'count': unpaid_count,
-                'amount': unpaid_amount
-            },
-            'billed': {
-                'count': billed_count,
-                'amount': billed_amount
-            },
-            'paid': {
-                'count': paid_count,
-                'amount': paid_amount
-            },
-            'total': {
-                'count': unpaid_count + billed_count + paid_count,
-                'amount': unpaid_amount + billed_amount + paid_amount
-            }
-        })
+        # One cached GROUP BY billing_status pass shared with the payment summary
+        return create_response(billing_summary.accounting_summary())
 
     except Exception as e:
         return create_error_response(
@@ -752,7 +699,7 @@ def search_purchase_orders_for_invoice_old(current_user):
 def export_invoice_excel_old(current_user):
     """
     Export invoice verification data to Excel
-    匯出請款單查核資料為Excel格式
+    匯出請款單查核資料為Excel格式 (format=csv/xlsx streams the PO lines as a file)
     """
     try:
         data = request.get_json()
@@ -770,14 +717,30 @@ def export_invoice_excel_old(current_user):
         month_str = data['month']
         po_numbers = data['po_numbers']
 
+        export_format = _export_format(data, 'json')
+        if export_format not in ('json',) + tuple(invoice_export.FORMATS):
+            return create_error_response(
+                'INVALID_FORMAT',
+                'format must be one of json, csv, xlsx',
+                status_code=400
+            )
+
         # Get supplier and POs
         supplier = Supplier.query.get_or_404(supplier_id)
 
-        pos = []
-        for po_no in po_numbers:
-            po = PurchaseOrder.query.get(po_no)
-            if po and po.supplier_id == supplier_id:
-                pos.append(po)
+        if export_format != 'json':
+            return invoice_export.export_response(
+                invoice_export.iter_lines(po_numbers, supplier_id=supplier_id),
+                export_format,
+                f'invoice_verification_{supplier_id}_{month_str}'
+            )
+
+        pos = PurchaseOrder.query.filter(
+            PurchaseOrder.purchase_order_no.in_(po_numbers),
+            PurchaseOrder.supplier_id == supplier_id
+        ).all() if po_numbers else []
+        order = {po_no: index for index, po_no in enumerate(po_numbers)}
+        pos.sort(key=lambda po: order[po.purchase_order_no])
 
         if not pos:
             return create_error_response(
@@ -894,13 +857,12 @@ def list_purchase_orders_for_payment():
 
     # For GET requests, manually handle authentication
     from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-    from app.models.user import User
 
     try:
         # This will validate the JWT token
         verify_jwt_in_request()
         current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        current_user = user_cache.get_user(current_user_id)
 
         if not current_user or not current_user.is_active:
             return create_error_response(
@@ -986,12 +948,11 @@ def update_payment_status():
 
     # Authentication
     from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-    from app.models.user import User
 
     try:
         verify_jwt_in_request()
         current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        current_user = user_cache.get_user(current_user_id)
 
         if not current_user or not current_user.is_active:
             return create_error_response(
@@ -1041,37 +1002,38 @@ def update_payment_status():
 
         mapped_method = method_mapping[payment_method]
 
-        # Update each purchase order
-        updated_pos = []
-        for po_no in po_nos:
-            po = PurchaseOrder.query.get(po_no)
-            if not po:
-                continue
+        idempotency_key = request.headers.get('Idempotency-Key')
+        replayed = billing_engine.reserve(idempotency_key, 'update_payment', current_user.user_id, data)
+        if replayed:
+            return create_response(replayed[0], status_code=replayed[1])
 
-            # Check if already paid
-            if po.billing_status == 'paid':
-                continue
-
-            # Update payment status
-            po.billing_status = 'paid'
-            po.payment_method = mapped_method
-            po.payment_date = date.today()
-            po.payment_note = payment_note
-
-            updated_pos.append(po_no)
+        # Pay every PO that exists and is not paid yet in one UPDATE
+        result = billing_engine.mark_paid(po_nos, mapped_method, date.today(), payment_note)
+        updated_pos = result['paid']
 
         db.session.commit()
+        if updated_pos:
+            billing_summary.invalidate()
 
-        return create_response({
+        payload = {
             'message': 'Payment status updated successfully',
             'updated_count': len(updated_pos),
             'updated_pos': updated_pos,
+            'outcomes': result['outcomes'],
             'payment_method': payment_method,
             'payment_date': date.today().isoformat()
-        })
+        }
+        billing_engine.remember(idempotency_key, 'update_payment', current_user.user_id, data, payload)
+
+        return create_response(payload)
 
+    except billing_engine.BillingError as e:
+        db.session.rollback()
+        billing_engine.release()
+        return create_error_response(e.code, e.message, e.details, status_code=e.status_code)
     except Exception as e:
         db.session.rollback()
+        billing_engine.release()
         return create_error_response(
             'UPDATE_ERROR',
             'Failed to update payment status',
@@ -1087,12 +1049,11 @@ def get_payment_summary():
 
     # Authentication
     from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
-    from app.models.user import User
 
     try:
         verify_jwt_in_request()
         current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        current_user = user_cache.get_user(current_user_id)
 
         if not current_user or not current_user.is_active:
             return create_error_response(
@@ -1109,62 +1070,8 @@ def get_payment_summary():
         )
 
     try:
-        # Get counts and amounts for different statuses
-        unpaid_query = PurchaseOrder.query.filter(
-            PurchaseOrder.purchase_status == 'purchased',
-            PurchaseOrder.billing_status != 'paid'
-        )
-        unpaid_count = unpaid_query.count()
-        unpaid_amount = db.session.query(
-            db.func.sum(PurchaseOrder.grand_total_int)
-        ).filter(
-            PurchaseOrder.purchase_status == 'purchased',
-            PurchaseOrder.billing_status != 'paid'
-        ).scalar() or 0
-
-        paid_query = PurchaseOrder.query.filter(
-            PurchaseOrder.billing_status == 'paid'
-        )
-        paid_count = paid_query.count()
-        paid_amount = db.session.query(
-            db.func.sum(PurchaseOrder.grand_total_int)
-        ).filter(
-            PurchaseOrder.billing_status == 'paid'
-        ).scalar() or 0
-
-        # Get payment method breakdown
-        remittance_amount = db.session.query(
-            db.func.sum(PurchaseOrder.grand_total_int)
-        ).filter(
-            PurchaseOrder.billing_status == 'paid',
-            PurchaseOrder.payment_method == 'remittance'
-        ).scalar() or 0
-
-        check_amount = db.session.query(
-            db.func.sum(PurchaseOrder.grand_total_int)
-        ).filter(
-            PurchaseOrder.billing_status == 'paid',
-            PurchaseOrder.payment_method == 'check'
-        ).scalar() or 0
-
-        return create_response({
-            'unpaid': {
-                'count': unpaid_count,
-                'amount': unpaid_amount
-            },
-            'paid': {
-                'count': paid_count,
-                'amount': paid_amount,
-                'by_method': {
-                    'remittance': remittance_amount,
-                    'check': check_amount
-                }
-            },
-            'total': {
-                'count': unpaid_count + paid_count,
-                'amount': unpaid_amount + paid_amount
-            }
-        })
+        # Served from the same cached aggregate as /reports/summary
+        return create_response(billing_summary.payment_summary())
 
     except Exception as e:
         return create_error_response(
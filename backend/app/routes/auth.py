@@ -3,6 +3,7 @@ from flask_jwt_extended import create_access_token, create_refresh_token, jwt_re
 from app import db
 from app.models.user import User
 from app.auth import revoke_token, create_response, create_error_response
+from app.utils import user_cache
 from datetime import timedelta
 from functools import wraps
 
@@ -108,8 +109,7 @@ def refresh():
     """Refresh JWT token"""
     try:
         current_user_id = get_jwt_identity()
-        # Convert string back to int for database query
-        user = User.query.get(int(current_user_id))
+        user = user_cache.get_user(current_user_id)
 
         if not user or not user.is_active:
             return create_error_response(
@@ -143,8 +143,8 @@ def refresh():
 def logout():
     """User logout and token invalidation"""
     try:
-        jti = get_jwt()['jti']
-        revoke_token(jti)
+        claims = get_jwt()
+        revoke_token(claims['jti'], claims.get('exp'))
         
         return create_response(message='Successfully logged out')
         
@@ -162,7 +162,7 @@ def get_current_user():
     """Get current user profile"""
     try:
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = user_cache.get_user(current_user_id)
         
         if not user or not user.is_active:
             return create_error_response(
@@ -218,6 +218,7 @@ def change_password():
         # Update password
         user.set_password(new_password)
         db.session.commit()
+        user_cache.invalidate_user(user.user_id)
         
         return create_response(message='Password changed successfully')
         
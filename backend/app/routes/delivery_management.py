@@ -10,11 +10,34 @@ import logging
 import math
 
 from app import db
+from app.models.document_sequence import DocumentSequence
+from app.utils.pagination import (
+    get_cursor_params, decode_cursor, keyset_sql, order_by_sql, keyset_columns_sql, row_cursor, count_rows,
+    InvalidCursorError
+)
 
 # Create blueprint
 delivery_bp = Blueprint('delivery_management', __name__, url_prefix='/api/v1/delivery')
 logger = logging.getLogger(__name__)
 
+# Sort keys of the maintenance list (flagged POs first, newest first). NULLs are
+# folded so the order and the ?cursor= seek agree on every database.
+MAINTENANCE_KEYSET = [
+    ("COALESCE(po.status_update_required, FALSE)", True),
+    ("COALESCE(po.created_at, '1970-01-01 00:00:00')", True),
+    ("po.purchase_order_no", True)
+]
+
+def _item_counts_cte(po_numbers_sql):
+    """Line count per PO, aggregated in one grouped pass over the POs selected
+    by po_numbers_sql instead of a correlated COUNT(*) per row"""
+    return f"""item_counts AS (
+            SELECT poi.purchase_order_no, COUNT(*) AS item_count
+            FROM purchase_order_items poi
+            WHERE poi.purchase_order_no IN ({po_numbers_sql})
+            GROUP BY poi.purchase_order_no
+        )"""
+
 @delivery_bp.route('/maintenance-list', methods=['GET'])
 @jwt_required()
 def get_delivery_maintenance_list():
@@ -29,6 +52,7 @@ def get_delivery_maintenance_list():
         po_number = request.args.get('po_number', '').strip()
         page = request.args.get('page', 1, type=int)
         page_size = min(request.args.get('page_size', 50, type=int), 100)
+        cursor_params = get_cursor_params(request.args, default_page_size=50)
 
         # Build WHERE conditions
         where_conditions = ["po.purchase_status = 'purchased'"]
@@ -64,42 +88,77 @@ def get_delivery_maintenance_list():
             {where_clause}
         """)
 
-        total_count = db.session.execute(count_query, params).scalar()
-
-        # Calculate pagination
-        offset = (page - 1) * page_size
-        total_pages = math.ceil(total_count / page_size) if page_size > 0 else 1
-        has_more = page < total_pages
-
-        # Get maintenance list data with raw SQL
+        if cursor_params is None:
+            total_count = db.session.execute(count_query, params).scalar()
+
+            # Calculate pagination
+            offset = (page - 1) * page_size
+            total_pages = math.ceil(total_count / page_size) if page_size > 0 else 1
+            has_more = page < total_pages
+            page_clause = "LIMIT :limit OFFSET :offset"
+        else:
+            # Cursor mode: the total is optional and the page seeks past the cursor
+            page_size = cursor_params['page_size']
+            total_count, total_is_estimate = count_rows(
+                db.session, count_query, cursor_params['total'], params,
+                estimate_statement=text(f"""
+                    SELECT 1 FROM purchase_orders po
+                    JOIN suppliers s ON po.supplier_id = s.supplier_id
+                    {where_clause}
+                """)
+            )
+            if cursor_params['cursor']:
+                seek_sql, seek_params = keyset_sql(
+                    MAINTENANCE_KEYSET, decode_cursor(cursor_params['cursor'], len(MAINTENANCE_KEYSET))
+                )
+                where_clause += " AND " + seek_sql
+                params.update(seek_params)
+            offset = 0
+            page_clause = "LIMIT :limit"
+
+        # Get maintenance list data with raw SQL; line counts are aggregated for the page only
+        page_order = order_by_sql([
+            (f'page.cursor_{index}', descending) for index, (_, descending) in enumerate(MAINTENANCE_KEYSET)
+        ])
         query = text(f"""
-            SELECT
-                po.purchase_order_no,
-                po.supplier_id,
-                po.supplier_name,
-                po.purchase_status,
-                po.delivery_status,
-                po.expected_delivery_date,
-                po.actual_delivery_date,
-                po.remarks,
-                po.status_update_required,
-                po.consolidation_id,
-                po.subtotal_int,
-                po.created_at,
-                po.updated_at,
-                s.supplier_region,
-                (SELECT COUNT(*) FROM purchase_order_items poi WHERE poi.purchase_order_no = po.purchase_order_no) as item_count
-            FROM purchase_orders po
-            JOIN suppliers s ON po.supplier_id = s.supplier_id
-            {where_clause}
-            ORDER BY po.status_update_required DESC, po.created_at DESC
-            LIMIT :limit OFFSET :offset
+            WITH page AS (
+                SELECT
+                    po.purchase_order_no,
+                    po.supplier_id,
+                    po.supplier_name,
+                    po.purchase_status,
+                    po.delivery_status,
+                    po.expected_delivery_date,
+                    po.actual_delivery_date,
+                    po.remarks,
+                    po.status_update_required,
+                    po.consolidation_id,
+                    po.subtotal_int,
+                    po.created_at,
+                    po.updated_at,
+                    s.supplier_region,
+                    {keyset_columns_sql(MAINTENANCE_KEYSET)}
+                FROM purchase_orders po
+                JOIN suppliers s ON po.supplier_id = s.supplier_id
+                {where_clause}
+                ORDER BY {order_by_sql(MAINTENANCE_KEYSET)}
+                {page_clause}
+            ),
+            {_item_counts_cte('SELECT purchase_order_no FROM page')}
+            SELECT page.*, COALESCE(ic.item_count, 0) AS item_count
+            FROM page
+            LEFT JOIN item_counts ic ON ic.purchase_order_no = page.purchase_order_no
+            ORDER BY {page_order}
         """)
 
-        params['limit'] = page_size
+        # Cursor mode fetches one extra row to tell whether another page follows
+        params['limit'] = page_size if cursor_params is None else page_size + 1
         params['offset'] = offset
 
         results = db.session.execute(query, params).fetchall()
+        if cursor_params is not None:
+            has_more = len(results) > page_size
+            results = results[:page_size]
 
         # Format maintenance list data
         maintenance_data = []
@@ -140,6 +199,12 @@ def get_delivery_maintenance_list():
                 'page_size': page_size,
                 'total': total_count,
                 'has_more': has_more
+            } if cursor_params is None else {
+                'page_size': page_size,
+                'total': total_count,
+                'total_is_estimate': total_is_estimate,
+                'has_more': has_more,
+                'next_cursor': row_cursor(results[-1], len(MAINTENANCE_KEYSET)) if has_more else None
             },
             'summary': {
                 'total_pos': total_count,
@@ -151,6 +216,16 @@ def get_delivery_maintenance_list():
             'timestamp': datetime.utcnow().isoformat()
         }), 200
 
+    except InvalidCursorError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_CURSOR',
+                'message': str(e),
+                'details': {}
+            },
+            'timestamp': datetime.utcnow().isoformat()
+        }), 400
     except Exception as e:
         logger.error(f"Error getting delivery maintenance list: {str(e)}")
         import traceback
@@ -207,33 +282,49 @@ def get_consolidation_list():
         total_pages = math.ceil(total_count / page_size) if page_size > 0 else 1
         has_more = page < total_pages
 
-        # Get consolidations with raw SQL
+        # Get the page of consolidations with their POs and line counts in one query
         query = text(f"""
+            WITH page AS (
+                SELECT
+                    sc.consolidation_id,
+                    sc.consolidation_name,
+                    sc.logistics_status,
+                    sc.expected_delivery_date,
+                    sc.actual_delivery_date,
+                    sc.total_weight,
+                    sc.total_volume,
+                    sc.carrier,
+                    sc.tracking_number,
+                    sc.customs_declaration_no,
+                    sc.logistics_notes,
+                    sc.remarks,
+                    sc.created_by,
+                    sc.created_at,
+                    sc.updated_at
+                FROM shipment_consolidations sc
+                {where_clause}
+                ORDER BY sc.created_at DESC, sc.consolidation_id
+                LIMIT :limit OFFSET :offset
+            ),
+            page_pos AS (
+                SELECT cp.consolidation_id, cp.purchase_order_no
+                FROM consolidation_pos cp
+                JOIN page ON page.consolidation_id = cp.consolidation_id
+            ),
+            {_item_counts_cte('SELECT purchase_order_no FROM page_pos')}
             SELECT
-                sc.consolidation_id,
-                sc.consolidation_name,
-                sc.logistics_status,
-                sc.expected_delivery_date,
-                sc.actual_delivery_date,
-                sc.total_weight,
-                sc.total_volume,
-                sc.carrier,
-                sc.tracking_number,
-                sc.customs_declaration_no,
-                sc.logistics_notes,
-                sc.remarks,
-                sc.created_by,
-                sc.created_at,
-                sc.updated_at,
-                (SELECT COUNT(*) FROM consolidation_pos cp WHERE cp.consolidation_id = sc.consolidation_id) as po_count,
-                (SELECT SUM(po.grand_total_int)
-                 FROM purchase_orders po
-                 JOIN consolidation_pos cp ON po.purchase_order_no = cp.purchase_order_no
-                 WHERE cp.consolidation_id = sc.consolidation_id) as total_value
-            FROM shipment_consolidations sc
-            {where_clause}
-            ORDER BY sc.created_at DESC
-            LIMIT :limit OFFSET :offset
+                page.*,
+                po.purchase_order_no AS po_purchase_order_no,
+                po.supplier_name AS po_supplier_name,
+                po.delivery_status AS po_delivery_status,
+                po.subtotal_int AS po_subtotal_int,
+                po.grand_total_int AS po_grand_total_int,
+                COALESCE(ic.item_count, 0) AS po_item_count
+            FROM page
+            LEFT JOIN page_pos pp ON pp.consolidation_id = page.consolidation_id
+            LEFT JOIN purchase_orders po ON po.purchase_order_no = pp.purchase_order_no
+            LEFT JOIN item_counts ic ON ic.purchase_order_no = po.purchase_order_no
+            ORDER BY page.created_at DESC, page.consolidation_id, po.purchase_order_no
         """)
 
         params['limit'] = page_size
@@ -241,35 +332,26 @@ def get_consolidation_list():
 
         results = db.session.execute(query, params).fetchall()
 
-        # Format consolidation data
-        consolidations_data = []
+        # Group the joined rows into one entry per consolidation, keeping the page order
+        grouped = {}
         for row in results:
-            # Get POs in this consolidation with item count
-            po_query = text("""
-                SELECT
-                    po.purchase_order_no,
-                    po.supplier_name,
-                    po.delivery_status,
-                    po.subtotal_int,
-                    (SELECT COUNT(*) FROM purchase_order_items poi WHERE poi.purchase_order_no = po.purchase_order_no) as item_count
-                FROM purchase_orders po
-                JOIN consolidation_pos cp ON po.purchase_order_no = cp.purchase_order_no
-                WHERE cp.consolidation_id = :consolidation_id
-                ORDER BY po.purchase_order_no
-            """)
-
-            po_results = db.session.execute(po_query, {'consolidation_id': row.consolidation_id}).fetchall()
+            consolidation_rows = grouped.setdefault(row.consolidation_id, (row, []))[1]
+            if row.po_purchase_order_no is not None:
+                consolidation_rows.append(row)
 
+        # Format consolidation data
+        consolidations_data = []
+        for row, po_rows in grouped.values():
             pos_data = []
             total_items_in_consolidation = 0
-            for po_row in po_results:
-                item_count = po_row.item_count or 0
+            for po_row in po_rows:
+                item_count = po_row.po_item_count
                 total_items_in_consolidation += item_count
                 pos_data.append({
-                    'purchase_order_no': po_row.purchase_order_no,
-                    'supplier_name': po_row.supplier_name,
-                    'delivery_status': po_row.delivery_status,
-                    'subtotal': po_row.subtotal_int,
+                    'purchase_order_no': po_row.po_purchase_order_no,
+                    'supplier_name': po_row.po_supplier_name,
+                    'delivery_status': po_row.po_delivery_status,
+                    'subtotal': po_row.po_subtotal_int,
                     'item_count': item_count,
                     'items_count': item_count  # Include both for compatibility
                 })
@@ -287,8 +369,8 @@ def get_consolidation_list():
                 'customs_declaration_no': row.customs_declaration_no,
                 'logistics_notes': row.logistics_notes,
                 'remarks': row.remarks,
-                'po_count': row.po_count,
-                'total_value': row.total_value or 0,
+                'po_count': len(po_rows),
+                'total_value': sum(po_row.po_grand_total_int or 0 for po_row in po_rows),
                 'total_items': total_items_in_consolidation,  # Add total items count
                 'purchase_orders': pos_data,
                 'created_at': str(row.created_at) if row.created_at else None,
@@ -669,9 +751,7 @@ def create_consolidation():
         user_id = get_jwt_identity()
 
         # Generate consolidation ID
-        count_query = text("SELECT COUNT(*) FROM shipment_consolidations")
-        count = db.session.execute(count_query).scalar()
-        consolidation_id = f"CONSOL{datetime.now().strftime('%Y%m%d')}{str(count + 1).zfill(3)}"
+        consolidation_id = DocumentSequence.next_number('CONSOL')
 
         # Insert consolidation
         insert_query = text("""
@@ -792,57 +872,68 @@ def get_consolidation_details(consolidation_id):
     Get single consolidation details
     """
     try:
-        # Get consolidation info
-        consol_query = text("""
+        # Get the consolidation with its POs, suppliers and line counts in one query
+        item_counts = _item_counts_cte(
+            'SELECT purchase_order_no FROM consolidation_pos WHERE consolidation_id = :consolidation_id'
+        )
+        query = text(f"""
+            WITH {item_counts}
             SELECT
-                sc.*,
-                (SELECT COUNT(*) FROM consolidation_pos cp WHERE cp.consolidation_id = sc.consolidation_id) as po_count,
-                (SELECT COUNT(*)
-                 FROM purchase_order_items poi
-                 JOIN consolidation_pos cp ON poi.purchase_order_no = cp.purchase_order_no
-                 WHERE cp.consolidation_id = sc.consolidation_id) as total_items
+                sc.consolidation_id,
+                sc.consolidation_name,
+                sc.logistics_status,
+                sc.expected_delivery_date,
+                sc.actual_delivery_date,
+                sc.carrier,
+                sc.tracking_number,
+                sc.total_weight,
+                sc.total_volume,
+                sc.remarks,
+                sc.created_at,
+                sc.updated_at,
+                po.purchase_order_no AS po_purchase_order_no,
+                po.supplier_name AS po_supplier_name,
+                po.delivery_status AS po_delivery_status,
+                po.expected_delivery_date AS po_expected_delivery_date,
+                po.actual_delivery_date AS po_actual_delivery_date,
+                po.remarks AS po_remarks,
+                po.tracking_no AS po_tracking_no,
+                s.supplier_name_en,
+                COALESCE(ic.item_count, 0) AS po_item_count
             FROM shipment_consolidations sc
+            LEFT JOIN consolidation_pos cp ON cp.consolidation_id = sc.consolidation_id
+            LEFT JOIN purchase_orders po ON po.purchase_order_no = cp.purchase_order_no
+            LEFT JOIN suppliers s ON po.supplier_id = s.supplier_id
+            LEFT JOIN item_counts ic ON ic.purchase_order_no = po.purchase_order_no
             WHERE sc.consolidation_id = :consolidation_id
+            ORDER BY po.purchase_order_no
         """)
 
-        consol_result = db.session.execute(consol_query, {'consolidation_id': consolidation_id}).fetchone()
+        results = db.session.execute(query, {'consolidation_id': consolidation_id}).fetchall()
 
-        if not consol_result:
+        if not results:
             return jsonify({
                 'success': False,
                 'error': 'Consolidation not found'
             }), 404
 
-        # Get POs in this consolidation
-        po_query = text("""
-            SELECT
-                po.*,
-                s.supplier_name_en,
-                s.supplier_region,
-                (SELECT COUNT(*) FROM purchase_order_items poi WHERE poi.purchase_order_no = po.purchase_order_no) as item_count
-            FROM purchase_orders po
-            JOIN consolidation_pos cp ON po.purchase_order_no = cp.purchase_order_no
-            LEFT JOIN suppliers s ON po.supplier_id = s.supplier_id
-            WHERE cp.consolidation_id = :consolidation_id
-            ORDER BY po.purchase_order_no
-        """)
-
-        po_results = db.session.execute(po_query, {'consolidation_id': consolidation_id}).fetchall()
+        consol_result = results[0]
+        po_rows = [row for row in results if row.po_purchase_order_no is not None]
 
         pos_data = []
-        for po_row in po_results:
+        for po_row in po_rows:
             # The supplier_name is already in the PO record, use that
             pos_data.append({
-                'purchase_order_no': po_row.purchase_order_no,
-                'supplier_name': po_row.supplier_name,  # This is from purchase_orders table
-                'supplier_name_en': po_row.supplier_name_en if hasattr(po_row, 'supplier_name_en') else po_row.supplier_name,
-                'delivery_status': po_row.delivery_status,
-                'logistics_status': po_row.delivery_status,  # Use delivery_status as logistics_status
-                'expected_delivery_date': str(po_row.expected_delivery_date) if po_row.expected_delivery_date else None,
-                'actual_delivery_date': str(po_row.actual_delivery_date) if po_row.actual_delivery_date else None,
-                'remarks': po_row.remarks,
-                'tracking_number': po_row.tracking_no if hasattr(po_row, 'tracking_no') else None,
-                'item_count': po_row.item_count
+                'purchase_order_no': po_row.po_purchase_order_no,
+                'supplier_name': po_row.po_supplier_name,  # This is from purchase_orders table
+                'supplier_name_en': po_row.supplier_name_en,
+                'delivery_status': po_row.po_delivery_status,
+                'logistics_status': po_row.po_delivery_status,  # Use delivery_status as logistics_status
+                'expected_delivery_date': str(po_row.po_expected_delivery_date) if po_row.po_expected_delivery_date else None,
+                'actual_delivery_date': str(po_row.po_actual_delivery_date) if po_row.po_actual_delivery_date else None,
+                'remarks': po_row.po_remarks,
+                'tracking_number': po_row.po_tracking_no,
+                'item_count': po_row.po_item_count
             })
 
         return jsonify({
@@ -858,8 +949,8 @@ def get_consolidation_details(consolidation_id):
                 'total_weight': float(consol_result.total_weight) if consol_result.total_weight else 0,
                 'total_volume': float(consol_result.total_volume) if consol_result.total_volume else 0,
                 'remarks': consol_result.remarks,
-                'po_count': consol_result.po_count,
-                'total_items': consol_result.total_items,
+                'po_count': len(po_rows),
+                'total_items': sum(po_row.po_item_count for po_row in po_rows),
                 'purchase_orders': pos_data,
                 'created_at': str(consol_result.created_at) if consol_result.created_at else None,
                 'updated_at': str(consol_result.updated_at) if consol_result.updated_at else None
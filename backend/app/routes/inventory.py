@@ -1,6 +1,6 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response
 from app import db
-from app.models.storage import Storage, StorageHistory
+from app.models.storage import Storage, StorageHistory, StorageBalance
 from app.models.purchase_order import PurchaseOrder, PurchaseOrderItem
 from app.models.request_order import RequestOrderItem
 from app.models.supplier import Supplier
@@ -8,8 +8,10 @@ from app.models.receiving import ReceivingRecord, PendingStorageItem
 from app.models.user import User
 from app.models.inventory import InventoryBatch, InventoryBatchStorage, InventoryMovement, InventoryItem
 from app.auth import authenticated_required, create_response, create_error_response, paginate_query
+from app.services import storage_tree
 from sqlalchemy import and_, or_, func
 from datetime import datetime
+import time
 
 bp = Blueprint('inventory', __name__, url_prefix='/api/v1')
 
@@ -19,52 +21,17 @@ bp = Blueprint('inventory', __name__, url_prefix='/api/v1')
 def get_storage_tree(current_user):
     """Get storage hierarchy (Zone->Shelf->Floor structure)"""
     try:
-        storages = Storage.query.filter_by(is_active=True).order_by(
-            Storage.area_code, Storage.shelf_code, Storage.floor_level,
-            Storage.front_back_position, Storage.left_middle_right_position
-        ).all()
+        # Zone subtrees are cached and rebuilt only when a write touches them
+        areas, etag = storage_tree.get_storage_tree()
         
-        # Build hierarchical structure
-        tree = {}
-        for storage in storages:
-            area = storage.area_code
-            shelf = storage.shelf_code
-            floor = storage.floor_level
-            
-            if area not in tree:
-                tree[area] = {
-                    'area_code': area,
-                    'shelves': {}
-                }
-            
-            if shelf not in tree[area]['shelves']:
-                tree[area]['shelves'][shelf] = {
-                    'shelf_code': shelf,
-                    'floors': {}
-                }
-            
-            if floor not in tree[area]['shelves'][shelf]['floors']:
-                tree[area]['shelves'][shelf]['floors'][floor] = {
-                    'floor_level': floor,
-                    'positions': []
-                }
-            
-            tree[area]['shelves'][shelf]['floors'][floor]['positions'].append(storage.to_dict())
-        
-        # Convert to list format
-        areas = []
-        for area_code, area_data in tree.items():
-            shelves = []
-            for shelf_code, shelf_data in area_data['shelves'].items():
-                floors = []
-                for floor_level, floor_data in shelf_data['floors'].items():
-                    floors.append(floor_data)
-                shelf_data['floors'] = sorted(floors, key=lambda x: x['floor_level'])
-                shelves.append(shelf_data)
-            area_data['shelves'] = sorted(shelves, key=lambda x: x['shelf_code'])
-            areas.append(area_data)
-        
-        return create_response(sorted(areas, key=lambda x: x['area_code']))
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+        
+        response = jsonify(areas)
+        response.set_etag(etag)
+        return response
         
     except Exception as e:
         return create_error_response(
@@ -109,8 +76,9 @@ def create_zone(current_user):
                         created_storages.append(storage)
         
         db.session.commit()
+        storage_tree.invalidate_zone(area_code)
         
-        return create_response([s.to_dict() for s in created_storages], status_code=201)
+        return create_response(Storage.serialize_many(created_storages), status_code=201)
         
     except Exception as e:
         db.session.rollback()
@@ -396,22 +364,62 @@ def batch_confirm_received(current_user):
             received_at = datetime.utcnow()
         notes = data.get('notes', '')
 
-        confirmed_items = []
-
+        debug = str(request.args.get('debug', data.get('debug', ''))).lower() in ('1', 'true', 'yes')
+        timings = {}
+        phase_start = time.perf_counter()
+
+        def end_phase(name):
+            nonlocal phase_start
+            now = time.perf_counter()
+            timings[name] = round((now - phase_start) * 1000, 2)
+            phase_start = now
+
+        # Prefetch every line of the affected POs (and the POs) in IN-queries
+        po_numbers = list({item_data['purchase_order_number'] for item_data in items})
+        purchase_orders = {
+            po.purchase_order_no: po
+            for po in PurchaseOrder.query.filter(PurchaseOrder.purchase_order_no.in_(po_numbers)).all()
+        } if po_numbers else {}
+
+        po_lines = {}
+        po_items_by_key = {}
+        if po_numbers:
+            for po_item in PurchaseOrderItem.query.filter(
+                PurchaseOrderItem.purchase_order_no.in_(po_numbers)
+            ).all():
+                po_lines.setdefault(po_item.purchase_order_no, []).append(po_item)
+                po_items_by_key[(po_item.purchase_order_no, po_item.detail_id)] = po_item
+
+        # Request order items for the source requisitions
+        request_order_nos = list({
+            po_item.source_request_order_no
+            for po_item in po_items_by_key.values()
+            if po_item.source_request_order_no
+        })
+        request_items = {}
+        if request_order_nos:
+            for req_item in RequestOrderItem.query.filter(
+                RequestOrderItem.request_order_no.in_(request_order_nos)
+            ).order_by(RequestOrderItem.detail_id).all():
+                # Keep the first matching line, as the per-item lookup did
+                request_items.setdefault((req_item.request_order_no, req_item.item_name), req_item)
+        end_phase('prefetch')
+
+        # Create all receiving records with one flush, then their pending items
+        receiving_records = []
         for item_data in items:
-            # Find the purchase order item
-            po_item = PurchaseOrderItem.query.filter_by(
-                detail_id=item_data['item_id'],
-                purchase_order_no=item_data['purchase_order_number']
-            ).first()
+            try:
+                key = (item_data['purchase_order_number'], int(item_data['item_id']))
+            except (TypeError, ValueError):
+                continue
+            po_item = po_items_by_key.get(key)
 
             if not po_item:
                 continue  # Skip items that can't be found
 
-            # Create receiving record
-            receiving_record = ReceivingRecord.create_receiving_record(
+            receiving_records.append(ReceivingRecord.create_receiving_record(
                 po_no=item_data['purchase_order_number'],
-                po_item_detail_id=item_data['item_id'],
+                po_item_detail_id=po_item.detail_id,
                 requisition_number=item_data.get('requisition_number', ''),  # Handle missing requisition_number
                 item_name=po_item.item_name,
                 quantity_received=po_item.item_quantity,
@@ -422,107 +430,48 @@ def batch_confirm_received(current_user):
                 notes=notes,
                 item_specification=po_item.item_specification,
                 received_at=received_at
-            )
-            
-            db.session.add(receiving_record)
-            db.session.flush()  # Get the receiving_id
-            
-            # Create pending storage item
-            pending_item = PendingStorageItem.create_from_receiving_record(receiving_record)
-            db.session.add(pending_item)
-            
+            ))
+
             # Update the delivery status of the PO item to 'delivered'
             po_item.delivery_status = 'delivered'
 
             # Update the corresponding request order item status to 'arrived'
             if po_item.source_request_order_no:
-                req_item = RequestOrderItem.query.filter_by(
-                    request_order_no=po_item.source_request_order_no,
-                    item_name=po_item.item_name
-                ).first()
+                req_item = request_items.get((po_item.source_request_order_no, po_item.item_name))
                 if req_item:
                     req_item.item_status = 'arrived'
 
-            confirmed_items.append(receiving_record.to_dict())
-        
-        # After all items processed, check and update PO delivery statuses
-        processed_pos = {}
-        affected_projects = set()  # Track projects that need cost updates
+        db.session.add_all(receiving_records)
+        db.session.flush()  # Assign receiving_ids (batched with RETURNING where supported)
 
-        for item_data in items:
-            po_no = item_data['purchase_order_number']
-            if po_no not in processed_pos:
-                po = PurchaseOrder.query.filter_by(purchase_order_no=po_no).first()
-                if po:
-                    # Check if all items in this PO are delivered
-                    all_items_delivered = all(
-                        item.delivery_status == 'delivered'
-                        for item in po.items
-                    )
-                    if all_items_delivered:
-                        po.delivery_status = 'delivered'
-                        po.actual_delivery_date = received_at
-
-                    # Track affected projects for cost update
-                    from app.models.request_order import RequestOrder
-                    for item in po.items:
-                        if item.source_request_order_no:
-                            request_order = RequestOrder.query.filter_by(
-                                request_order_no=item.source_request_order_no
-                            ).first()
-                            if request_order and request_order.project_id:
-                                affected_projects.add(request_order.project_id)
-
-                    processed_pos[po_no] = po
-
-        # Update project costs for all affected projects
-        from app.models.project import Project
-        for project_id in affected_projects:
-            project = Project.query.get(project_id)
-            if project:
-                # Recalculate total expenditure from all related purchase orders
-                from app.models.request_order import RequestOrder
-
-                # Get all unique supplier expenditures for this project
-                supplier_costs = db.session.query(
-                    PurchaseOrder.supplier_id,
-                    db.func.sum(PurchaseOrderItem.unit_price * PurchaseOrderItem.item_quantity).label('total')
-                ).join(
-                    PurchaseOrderItem, PurchaseOrderItem.purchase_order_no == PurchaseOrder.purchase_order_no
-                ).join(
-                    RequestOrder, PurchaseOrderItem.source_request_order_no == RequestOrder.request_order_no
-                ).filter(
-                    RequestOrder.project_id == project_id,
-                    PurchaseOrder.purchase_status == 'purchased'
-                ).group_by(PurchaseOrder.supplier_id).all()
-
-                # Update or create supplier expenditure records
-                from app.models.project import ProjectSupplierExpenditure
-                for supplier_id, total_amount in supplier_costs:
-                    expenditure = ProjectSupplierExpenditure.query.filter_by(
-                        project_id=project_id,
-                        supplier_id=supplier_id
-                    ).first()
-
-                    if expenditure:
-                        expenditure.expenditure_amount = total_amount or 0
-                    else:
-                        expenditure = ProjectSupplierExpenditure(
-                            project_id=project_id,
-                            supplier_id=supplier_id,
-                            expenditure_amount=total_amount or 0
-                        )
-                        db.session.add(expenditure)
+        PendingStorageItem.bulk_create_from_receiving_records(receiving_records)
+        confirmed_items = [record.to_dict() for record in receiving_records]
+        end_phase('insert')
 
-                # Update project total expenditure
-                project.calculate_total_expenditure()
+        # Update PO delivery statuses. Receiving does not change purchase
+        # amounts, so the project expenditure ledger is left alone here.
+        for po_no in po_numbers:
+            po = purchase_orders.get(po_no)
+            if not po:
+                continue
+
+            lines = po_lines.get(po_no, [])
+            if all(line.delivery_status == 'delivered' for line in lines):
+                po.delivery_status = 'delivered'
+                po.actual_delivery_date = received_at
+        end_phase('po_status')
 
         db.session.commit()
+        end_phase('commit')
         
-        return create_response({
+        response_data = {
             'confirmed_count': len(confirmed_items),
             'items': confirmed_items
-        })
+        }
+        if debug:
+            timings['total'] = round(sum(timings.values()), 2)
+            response_data['timings_ms'] = timings
+        return create_response(response_data)
         
     except Exception as e:
         db.session.rollback()
@@ -753,6 +702,7 @@ def assign_storage_location(current_user):
             db.session.add(history)
         
         db.session.commit()
+        storage_tree.invalidate_zone(storage.area_code)
         
         # Return response with batch_id if created
         return create_response({
@@ -813,6 +763,7 @@ def create_manual_inventory_entry(current_user):
         db.session.add(history)
         
         db.session.commit()
+        storage_tree.invalidate_zone(storage.area_code)
         
         return create_response({
             'storage': storage.to_dict(),
@@ -845,34 +796,19 @@ def search_inventory(current_user):
         shelf = request.args.get('shelf')
         floor = request.args.get('floor')
         
-        # Build inventory query with current quantities
+        # Build inventory query from the maintained on-hand balances
         query = db.session.query(
-            StorageHistory.storage_id,
-            StorageHistory.item_id,
-            StorageHistory.source_no,
-            StorageHistory.source_line,
-            db.func.sum(
-                db.case(
-                    (StorageHistory.operation_type == 'in', StorageHistory.quantity),
-                    else_=-StorageHistory.quantity
-                )
-            ).label('current_quantity')
-        ).group_by(
-            StorageHistory.storage_id,
-            StorageHistory.item_id,
-            StorageHistory.source_no,
-            StorageHistory.source_line
-        ).having(
-            db.func.sum(
-                db.case(
-                    (StorageHistory.operation_type == 'in', StorageHistory.quantity),
-                    else_=-StorageHistory.quantity
-                )
-            ) > 0
+            StorageBalance.storage_id,
+            StorageBalance.item_id,
+            StorageBalance.source_no,
+            StorageBalance.source_line,
+            StorageBalance.quantity.label('current_quantity')
+        ).filter(
+            StorageBalance.quantity > 0
         )
         
         # Join with storage for location filtering
-        query = query.join(Storage)
+        query = query.join(Storage, Storage.storage_id == StorageBalance.storage_id)
         
         if zone:
             query = query.filter(Storage.area_code == zone)
@@ -882,21 +818,28 @@ def search_inventory(current_user):
             query = query.filter(Storage.floor_level == int(floor))
         
         if name_like:
-            query = query.filter(StorageHistory.item_id.ilike(f'%{name_like}%'))
+            query = query.filter(StorageBalance.item_id.ilike(f'%{name_like}%'))
         if po_no:
-            query = query.filter(StorageHistory.source_no == po_no)
+            query = query.filter(StorageBalance.source_no == po_no)
         
         results = query.all()
         
+        # Batch-load and serialize the matched locations instead of one lookup per row
+        storages = Storage.get_many(result.storage_id for result in results)
+        storage_dicts = {
+            data['storage_id']: data
+            for data in Storage.serialize_many(storages.values())
+        }
+        
         inventory_items = []
         for result in results:
-            storage = Storage.query.get(result.storage_id)
+            source_no, source_line = StorageBalance.denormalize_key(result.source_no, result.source_line)
             inventory_items.append({
                 'storage_id': result.storage_id,
-                'storage': storage.to_dict() if storage else None,
+                'storage': storage_dicts.get(result.storage_id),
                 'item_id': result.item_id,
-                'source_no': result.source_no,
-                'source_line': result.source_line,
+                'source_no': source_no,
+                'source_line': source_line,
                 'current_quantity': float(result.current_quantity)
             })
         
@@ -971,6 +914,7 @@ def issue_inventory(current_user):
                     po_item.source_request_item.item_status = 'issued'
         
         db.session.commit()
+        storage_tree.invalidate_location(storage_id)
         
         return create_response(history.to_dict())
         
@@ -1142,7 +1086,7 @@ def get_inventory_items_grouped(current_user):
         # Build base query for inventory summary
         # Use SQLite compatible concatenation (|| operator instead of concat function)
         # Note: MAX() is used for usage_type to get the most common/latest one for grouped items
-        query = db.session.query(
+        columns = [
             (InventoryBatch.item_name + '|' + func.coalesce(InventoryBatch.item_specification, '')).label('item_key'),
             InventoryBatch.item_name,
             InventoryBatch.item_specification,
@@ -1151,7 +1095,14 @@ def get_inventory_items_grouped(current_user):
             func.count(InventoryBatch.batch_id).label('batch_count'),
             func.count(func.distinct(InventoryBatchStorage.storage_id)).label('storage_location_count'),
             func.max(InventoryBatch.created_at).label('last_received_date')
-        ).outerjoin(InventoryBatchStorage).filter(
+        ]
+        
+        # Resolve usage_type in the same grouped query (column is optional per database)
+        usage_type_column = InventoryBatch.usage_type_column()
+        if usage_type_column is not None:
+            columns.append(func.max(usage_type_column).label('usage_type'))
+        
+        query = db.session.query(*columns).outerjoin(InventoryBatchStorage).filter(
             InventoryBatch.current_quantity > 0
         )
         
@@ -1176,17 +1127,7 @@ def get_inventory_items_grouped(current_user):
         # Format results
         inventory_items = []
         for result in results:
-            # Get usage_type directly from database to avoid ORM caching issues
-            import sqlite3
-            conn = sqlite3.connect('erp_development.db')
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT usage_type FROM inventory_batches WHERE item_name = ? AND item_specification = ? LIMIT 1",
-                (result.item_name, result.item_specification)
-            )
-            usage_result = cursor.fetchone()
-            conn.close()
-            usage_type = usage_result[0] if usage_result and usage_result[0] else 'general'
+            usage_type = getattr(result, 'usage_type', None) or 'general'
             
             item_data = {
                 'item_key': result.item_key,
@@ -25,6 +25,39 @@ from app.utils.cache import cache_result, invalidate_cache
 logistics_bp = Blueprint('logistics', __name__, url_prefix='/api/v1/logistics')
 logger = logging.getLogger(__name__)
 
+def _item_count_column():
+    """Line count of the row's PO as a correlated subquery, so it is only
+    evaluated for the rows on the page"""
+    return db.session.query(func.count(PurchaseOrderItem.detail_id))\
+             .filter(PurchaseOrderItem.purchase_order_no == PurchaseOrder.purchase_order_no)\
+             .correlate(PurchaseOrder)\
+             .scalar_subquery()\
+             .label('items_count')
+
+def _events_by_po(po_numbers, ascending=False):
+    """Logistics events of every PO on a page in one IN query, grouped by PO"""
+    grouped = {po_no: [] for po_no in po_numbers}
+    if not grouped:
+        return grouped
+    happened_at = LogisticsEvent.happened_at if ascending else desc(LogisticsEvent.happened_at)
+    events = LogisticsEvent.query\
+             .filter(LogisticsEvent.purchase_order_no.in_(list(grouped)))\
+             .order_by(happened_at, LogisticsEvent.event_id)\
+             .all()
+    for event in events:
+        grouped[event.purchase_order_no].append(event)
+    return grouped
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def _supplier_data(supplier):
+    return {
+        'id': supplier.supplier_id,
+        'name': supplier.supplier_name_zh,
+        'contact': supplier.supplier_contact_person
+    }
+
 @logistics_bp.route('/shipping', methods=['GET'])
 @jwt_required()
 def list_shipping():
@@ -47,20 +80,20 @@ def list_shipping():
         page = request.args.get('page', 1, type=int)
         page_size = min(request.args.get('page_size', 50, type=int), 100)
         
-        # Build query for purchase orders with shipping information
-        query = db.session.query(PurchaseOrder)\
-                .join(Supplier, PurchaseOrder.supplier_id == Supplier.id)\
+        # Build query for purchase orders with shipping information and supplier
+        query = db.session.query(PurchaseOrder, Supplier, _item_count_column())\
+                .join(Supplier, PurchaseOrder.supplier_id == Supplier.supplier_id)\
                 .filter(PurchaseOrder.shipping_status.isnot(None))
         
         # Apply filters
         if status:
             query = query.filter(PurchaseOrder.shipping_status == status)
         if po_no:
-            query = query.filter(PurchaseOrder.po_no.ilike(f'%{po_no}%'))
+            query = query.filter(PurchaseOrder.purchase_order_no.ilike(f'%{po_no}%'))
         if date_from:
             try:
                 from_date = datetime.strptime(date_from, '%Y-%m-%d').date()
-                query = query.filter(PurchaseOrder.po_date >= from_date)
+                query = query.filter(PurchaseOrder.order_date >= from_date)
             except ValueError:
                 return jsonify({
                     'success': False,
@@ -74,7 +107,7 @@ def list_shipping():
         if date_to:
             try:
                 to_date = datetime.strptime(date_to, '%Y-%m-%d').date()
-                query = query.filter(PurchaseOrder.po_date <= to_date)
+                query = query.filter(PurchaseOrder.order_date <= to_date)
             except ValueError:
                 return jsonify({
                     'success': False,
@@ -87,46 +120,41 @@ def list_shipping():
                 }), 422
         
         # Order by most recent
-        query = query.order_by(desc(PurchaseOrder.po_date))
+        query = query.order_by(desc(PurchaseOrder.order_date), desc(PurchaseOrder.purchase_order_no))
         
         # Paginate
         paginated_result = paginate_query(query, page, page_size)
+        rows = paginated_result['items']
+        
+        # Logistics events for the whole page, newest first
+        page_po_numbers = [po.purchase_order_no for po, _, _ in rows]
+        events_by_po = _events_by_po(page_po_numbers)
         
         # Format shipping data
         shipping_data = []
-        for po in paginated_result['items']:
-            # Get logistics events for this PO
-            logistics_events = LogisticsEvent.query\
-                             .filter(LogisticsEvent.purchase_order_no == po.po_no)\
-                             .order_by(desc(LogisticsEvent.happened_at))\
-                             .all()
-            
+        for po, supplier, items_count in rows:
             events_data = [
                 {
                     'event_id': event.event_id,
                     'status': event.status,
                     'happened_at': event.happened_at.isoformat(),
                     'note': event.note,
-                    'created_at': event.created_at.isoformat()
+                    'created_at': _isoformat(event.created_at)
                 }
-                for event in logistics_events
+                for event in events_by_po[po.purchase_order_no]
             ]
             
             po_data = {
-                'id': po.id,
-                'po_no': po.po_no,
-                'po_date': po.po_date.isoformat(),
-                'supplier': {
-                    'id': po.supplier.id,
-                    'name': po.supplier.supplier_name_zh,
-                    'contact': po.supplier.contact_name
-                },
-                'total_amount': float(po.total_amount) if po.total_amount else 0,
+                'id': po.purchase_order_no,
+                'po_no': po.purchase_order_no,
+                'po_date': _isoformat(po.order_date),
+                'supplier': _supplier_data(supplier),
+                'total_amount': float(po.grand_total_int) if po.grand_total_int else 0,
                 'shipping_status': po.shipping_status,
-                'expected_delivery_date': po.expected_delivery_date.isoformat() if po.expected_delivery_date else None,
+                'expected_delivery_date': _isoformat(po.expected_delivery_date),
                 'logistics_events': events_data,
-                'items_count': len(po.items),
-                'created_at': po.created_at.isoformat()
+                'items_count': items_count,
+                'created_at': _isoformat(po.created_at)
             }
             shipping_data.append(po_data)
         
@@ -292,10 +320,10 @@ def track_deliveries():
         page = request.args.get('page', 1, type=int)
         page_size = min(request.args.get('page_size', 50, type=int), 100)
         
-        # Query logistics events
-        query = db.session.query(LogisticsEvent)\
-                .join(PurchaseOrder, LogisticsEvent.purchase_order_no == PurchaseOrder.po_no)\
-                .join(Supplier, PurchaseOrder.supplier_id == Supplier.id)
+        # Query logistics events with their PO and supplier
+        query = db.session.query(LogisticsEvent, PurchaseOrder, Supplier, _item_count_column())\
+                .join(PurchaseOrder, LogisticsEvent.purchase_order_no == PurchaseOrder.purchase_order_no)\
+                .join(Supplier, PurchaseOrder.supplier_id == Supplier.supplier_id)
         
         # Apply filters
         if po_no:
@@ -307,57 +335,49 @@ def track_deliveries():
             query = query.filter(LogisticsEvent.status.notin_(['arrived', 'delivered']))
         
         # Order by most recent events
-        query = query.order_by(desc(LogisticsEvent.happened_at))
+        query = query.order_by(desc(LogisticsEvent.happened_at), desc(LogisticsEvent.event_id))
         
         # Paginate
         paginated_result = paginate_query(query, page, page_size)
+        rows = paginated_result['items']
+        
+        # Full timelines of every PO on the page, oldest first
+        page_po_numbers = {event.purchase_order_no for event, _, _, _ in rows}
+        timelines = _events_by_po(page_po_numbers, ascending=True)
         
         # Format tracking data
+        status_order = ['shipped', 'in_transit', 'customs_clearance', 'expected_arrival', 'arrived']
         tracking_data = []
-        for event in paginated_result['items']:
-            po = event.purchase_order if hasattr(event, 'purchase_order') else PurchaseOrder.query.filter_by(po_no=event.purchase_order_no).first()
-            
-            if po:
-                # Get all events for this PO for timeline
-                all_events = LogisticsEvent.query\
-                           .filter(LogisticsEvent.purchase_order_no == event.purchase_order_no)\
-                           .order_by(LogisticsEvent.happened_at)\
-                           .all()
-                
-                timeline = [
-                    {
-                        'status': e.status,
-                        'happened_at': e.happened_at.isoformat(),
-                        'note': e.note,
-                        'is_current': e.event_id == event.event_id
-                    }
-                    for e in all_events
-                ]
-                
-                # Estimate delivery progress
-                status_order = ['shipped', 'in_transit', 'customs_clearance', 'expected_arrival', 'arrived']
-                current_index = status_order.index(event.status) if event.status in status_order else 0
-                progress_percent = ((current_index + 1) / len(status_order)) * 100
-                
-                event_data = {
-                    'event_id': event.event_id,
-                    'po_no': event.purchase_order_no,
-                    'current_status': event.status,
-                    'happened_at': event.happened_at.isoformat(),
-                    'note': event.note,
-                    'supplier': {
-                        'id': po.supplier.id,
-                        'name': po.supplier.supplier_name_zh,
-                        'contact': po.supplier.contact_name
-                    },
-                    'expected_delivery_date': po.expected_delivery_date.isoformat() if po.expected_delivery_date else None,
-                    'total_amount': float(po.total_amount) if po.total_amount else 0,
-                    'progress_percent': round(progress_percent, 1),
-                    'is_active': event.status not in ['arrived', 'delivered'],
-                    'timeline': timeline,
-                    'items_count': len(po.items) if po.items else 0
+        for event, po, supplier, items_count in rows:
+            timeline = [
+                {
+                    'status': e.status,
+                    'happened_at': e.happened_at.isoformat(),
+                    'note': e.note,
+                    'is_current': e.event_id == event.event_id
                 }
-                tracking_data.append(event_data)
+                for e in timelines[event.purchase_order_no]
+            ]
+            
+            # Estimate delivery progress
+            current_index = status_order.index(event.status) if event.status in status_order else 0
+            progress_percent = ((current_index + 1) / len(status_order)) * 100
+            
+            event_data = {
+                'event_id': event.event_id,
+                'po_no': event.purchase_order_no,
+                'current_status': event.status,
+                'happened_at': event.happened_at.isoformat(),
+                'note': event.note,
+                'supplier': _supplier_data(supplier),
+                'expected_delivery_date': _isoformat(po.expected_delivery_date),
+                'total_amount': float(po.grand_total_int) if po.grand_total_int else 0,
+                'progress_percent': round(progress_percent, 1),
+                'is_active': event.status not in ['arrived', 'delivered'],
+                'timeline': timeline,
+                'items_count': items_count
+            }
+            tracking_data.append(event_data)
         
         return jsonify({
             'success': True,
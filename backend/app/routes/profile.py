@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models.user import User
 from app.auth import authenticated_required, create_response, create_error_response
+from app.utils import user_cache
 from datetime import datetime
 
 bp = Blueprint('profile', __name__, url_prefix='/api/v1/profile')
@@ -46,6 +47,7 @@ def update_profile(current_user):
         
         current_user.updated_at = datetime.utcnow()
         db.session.commit()
+        user_cache.invalidate_user(current_user.user_id)
         
         return create_response({
             'message': '個人資料更新成功',
@@ -104,6 +106,7 @@ def change_password(current_user):
         current_user.set_password(new_password)
         current_user.updated_at = datetime.utcnow()
         db.session.commit()
+        user_cache.invalidate_user(current_user.user_id)
         
         return create_response({
             'message': '密碼更新成功'
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify, send_file, Response
+from flask import Blueprint, request, jsonify, send_file, Response, current_app, stream_with_context
 from app import db
 from sqlalchemy import text
 from app.models.purchase_order import PurchaseOrder, PurchaseOrderItem
@@ -7,6 +7,11 @@ from app.models.supplier import Supplier
 from app.models.system_settings import SystemSettings
 from app.auth import procurement_required, authenticated_required, create_response, create_error_response, paginate_query
 from app.utils.security import require_permission
+from app.utils.pagination import (
+    get_cursor_params, decode_cursor, keyset_sql, order_by_sql, keyset_columns_sql, row_cursor, count_rows,
+    InvalidCursorError
+)
+from app.services import billing_summary, export_cache, po_batch_export
 from app.services.po_generator import POGenerator
 from app.services.po_generator_enhanced import EnhancedPOGenerator
 from app.services.po_html_generator import POHTMLGenerator
@@ -21,6 +26,9 @@ logger = logging.getLogger(__name__)
 
 bp = Blueprint('purchase_orders', __name__, url_prefix='/api/v1/po')
 
+# Sort keys of the PO list; ?cursor= seeks past the last PO number instead of OFFSET
+PO_LIST_KEYSET = [('po.purchase_order_no', True)]
+
 @bp.before_request
 def log_request():
     """Log all incoming requests for debugging"""
@@ -37,6 +45,7 @@ def get_purchase_orders(current_user):
         page_size = int(request.args.get('page_size', 20))
         supplier = request.args.get('supplier', '')
         status = request.args.get('status', '')
+        cursor_params = get_cursor_params(request.args)
 
         # Build WHERE clause
         where_conditions = []
@@ -58,11 +67,28 @@ def get_purchase_orders(current_user):
             {where_clause}
         """)
 
-        total_count = db.session.execute(count_query, params).scalar()
+        if cursor_params is None:
+            total_count = db.session.execute(count_query, params).scalar()
 
-        # Calculate offset and pages
-        offset = (page - 1) * page_size
-        total_pages = math.ceil(total_count / page_size) if page_size > 0 else 1
+            # Calculate offset and pages
+            offset = (page - 1) * page_size
+            total_pages = math.ceil(total_count / page_size) if page_size > 0 else 1
+            page_clause = "LIMIT :limit OFFSET :offset"
+        else:
+            # Cursor mode: the total is optional and the page seeks past the cursor
+            page_size = cursor_params['page_size']
+            total_count, total_is_estimate = count_rows(
+                db.session, count_query, cursor_params['total'], params,
+                estimate_statement=text(f"SELECT 1 FROM purchase_orders po {where_clause}")
+            )
+            if cursor_params['cursor']:
+                seek_sql, seek_params = keyset_sql(
+                    PO_LIST_KEYSET, decode_cursor(cursor_params['cursor'], len(PO_LIST_KEYSET))
+                )
+                where_clause += (" AND " if where_clause else " WHERE ") + seek_sql
+                params.update(seek_params)
+            offset = 0
+            page_clause = "LIMIT :limit"
 
         # Get purchase orders with raw SQL
         query = text(f"""
@@ -117,21 +143,25 @@ def get_purchase_orders(current_user):
                 s.supplier_name_en,
                 s.supplier_email,
                 s.supplier_region,
-                s.payment_terms
+                s.payment_terms,
+                {keyset_columns_sql(PO_LIST_KEYSET)}
             FROM purchase_orders po
             LEFT JOIN users u1 ON po.creator_id = u1.user_id
             LEFT JOIN users u2 ON po.output_person_id = u2.user_id
             LEFT JOIN users u3 ON po.confirm_purchaser_id = u3.user_id
             LEFT JOIN suppliers s ON po.supplier_id = s.supplier_id
             {where_clause}
-            ORDER BY po.purchase_order_no DESC
-            LIMIT :limit OFFSET :offset
+            ORDER BY {order_by_sql(PO_LIST_KEYSET)}
+            {page_clause}
         """)
 
-        params['limit'] = page_size
+        # Cursor mode fetches one extra row to tell whether another page follows
+        params['limit'] = page_size if cursor_params is None else page_size + 1
         params['offset'] = offset
 
         results = db.session.execute(query, params).fetchall()
+        has_more = cursor_params is not None and len(results) > page_size
+        results = results[:page_size]
 
         # Convert results to dictionaries
         purchase_orders = []
@@ -198,6 +228,18 @@ def get_purchase_orders(current_user):
 
             purchase_orders.append(po_dict)
 
+        if cursor_params is not None:
+            return create_response({
+                'items': purchase_orders,
+                'pagination': {
+                    'page_size': page_size,
+                    'total': total_count,
+                    'total_is_estimate': total_is_estimate,
+                    'has_more': has_more,
+                    'next_cursor': row_cursor(results[-1], len(PO_LIST_KEYSET)) if has_more else None
+                }
+            }, message='Purchase orders fetched successfully')
+
         return create_response({
             'items': purchase_orders,
             'pagination': {
@@ -207,6 +249,12 @@ def get_purchase_orders(current_user):
                 'pages': total_pages
             }
         }, message='Purchase orders fetched successfully')
+    except InvalidCursorError as e:
+        return create_error_response(
+            'INVALID_CURSOR',
+            str(e),
+            status_code=400
+        )
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -244,15 +292,7 @@ def create_purchase_order(current_user):
             )
 
         # Generate PO number
-        now = datetime.now()
-        po_no = f"PO{now.strftime('%Y%m%d')}"
-
-        # Find existing POs for today
-        existing = PurchaseOrder.query.filter(
-            PurchaseOrder.purchase_order_no.like(f"{po_no}%")
-        ).count()
-
-        po_no = f"{po_no}{str(existing + 1).zfill(3)}"
+        po_no = PurchaseOrder.generate_po_number()
 
         # Get supplier information
         supplier = Supplier.query.get(data['supplier_id'])
@@ -370,7 +410,7 @@ def create_purchase_order(current_user):
 
         # Set totals
         po.subtotal_int = subtotal
-        po.tax_decimal1 = subtotal * 0.05  # 5% tax
+        po.tax_decimal1 = subtotal * SystemSettings.get_tax_rate() / 100
         po.grand_total_int = subtotal + po.tax_decimal1
 
         logger.info(f"[CREATE_PO] Successfully created PO {po_no} with {items_added} items")
@@ -403,10 +443,11 @@ def get_build_candidates(current_user):
             query = query.filter(RequestOrderItem.supplier_id == supplier_id)
 
         results = query.all()
+        item_dicts = RequestOrderItem.bulk_to_dict(item for item, _ in results)
 
         # Group by supplier
         suppliers = {}
-        for item, is_urgent in results:
+        for (item, is_urgent), item_dict in zip(results, item_dicts):
             if item.supplier_id not in suppliers:
                 suppliers[item.supplier_id] = {
                     'supplier_id': item.supplier_id,
@@ -419,7 +460,6 @@ def get_build_candidates(current_user):
             if is_urgent:
                 suppliers[item.supplier_id]['has_urgent_items'] = True
 
-            item_dict = item.to_dict()
             item_dict['is_urgent'] = is_urgent
             suppliers[item.supplier_id]['items'].append(item_dict)
 
@@ -453,7 +493,7 @@ def get_purchase_order(current_user, po_no):
             po_dict['supplier'] = po.supplier.to_summary_dict()
 
         # Add items info
-        po_dict['items'] = [item.to_dict() for item in po.items]
+        po_dict['items'] = PurchaseOrderItem.bulk_to_dict(po.items)
 
         return create_response(
             data={'data': po_dict},
@@ -485,6 +525,16 @@ def preview_purchase_order(current_user, po_no):
             status_code=500
         )
 
+def _export_response(response, etag):
+    """Tag an export with the content hash of its cached artifact
+
+    Exports are POSTs that also record the export on the PO, so every call
+    returns the document; browsers never revalidate a POST.
+    """
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @bp.route('/<po_no>/export', methods=['POST'])
 @procurement_required
 def export_purchase_order(current_user, po_no):
@@ -509,69 +559,73 @@ def export_purchase_order(current_user, po_no):
         # Record export operation and handle status transitions
         export_info = po.record_export(current_user.user_id)
         
-        # Handle different export formats
+        # Handle different export formats; documents are cached by PO content hash
         if format_type == 'html':
-            html_generator = POHTMLGenerator()
-            html_content = html_generator.generate_html(po)
+            html_content, etag, _ = export_cache.get_or_render(
+                po, 'html', lambda: POHTMLGenerator().generate_html(po)
+            )
             
             db.session.commit()
             
             # Return HTML response
-            return Response(
+            return _export_response(Response(
                 html_content,
                 mimetype='text/html',
                 headers={
                     'Content-Type': 'text/html; charset=utf-8',
                 }
-            )
+            ), etag)
             
         elif format_type == 'pdf':
             # For now, return HTML that can be printed to PDF
-            pdf_generator = POPDFGenerator()
-            html_content = pdf_generator.generate_pdf(po)
+            html_content, etag, _ = export_cache.get_or_render(
+                po, 'html', lambda: POPDFGenerator().generate_pdf(po)
+            )
             
             db.session.commit()
             
             # Return HTML response with print-friendly format
-            return Response(
+            return _export_response(Response(
                 html_content,
                 mimetype='text/html',
                 headers={
                     'Content-Type': 'text/html; charset=utf-8',
                 }
-            )
+            ), etag)
             
         elif format_type == 'excel':
-            excel_generator = POExcelGenerator()
-            file_data = excel_generator.generate_excel(po)
+            file_data, etag, _ = export_cache.get_or_render(
+                po, 'excel', lambda: POExcelGenerator().generate_excel(po)
+            )
             filename = f"PO_{po_no}.xlsx"
             mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             
             db.session.commit()
             
             # Send file
-            return send_file(
+            return _export_response(send_file(
                 io.BytesIO(file_data),
                 mimetype=mimetype,
                 as_attachment=True,
                 download_name=filename
-            )
+            ), etag)
         
         else:  # print format - return HTML for printing
             print(f"[EXPORT_API] Using HTML generator for print format")
-            html_generator = POHTMLGenerator()
-            html_content = html_generator.generate_html(po)
+            html_content, etag, _ = export_cache.get_or_render(
+                po, 'html', lambda: POHTMLGenerator().generate_html(po)
+            )
 
             db.session.commit()
 
             # Return HTML response optimized for printing
-            return Response(
+            return _export_response(Response(
                 html_content,
                 mimetype='text/html',
                 headers={
                     'Content-Type': 'text/html; charset=utf-8',
                 }
-            )
+            ), etag)
         
     except ValueError as e:
         db.session.rollback()
@@ -590,6 +644,71 @@ def export_purchase_order(current_user, po_no):
             status_code=500
         )
 
+@bp.route('/export/batch', methods=['POST'])
+@procurement_required
+def export_purchase_orders_batch(current_user):
+    """Export many purchase orders as one zip, rendered in a worker pool
+
+    Body: format (excel, html or pdf) and either purchase_order_nos or the
+    list filters supplier / status. Every export is recorded in a single
+    transaction before the zip is streamed.
+    """
+    try:
+        data = request.get_json() or {}
+        format_type = (data.get('format') or 'excel').lower()
+        if format_type not in po_batch_export.FORMATS:
+            return create_error_response(
+                'INVALID_FORMAT',
+                f'format must be one of {sorted(po_batch_export.FORMATS)}',
+                status_code=400
+            )
+
+        po_numbers = data.get('purchase_order_nos')
+        if po_numbers is not None and not isinstance(po_numbers, list):
+            return create_error_response('VALIDATION_ERROR', 'purchase_order_nos must be a list', status_code=400)
+        if po_numbers is None and not (data.get('supplier') or data.get('status')):
+            return create_error_response(
+                'VALIDATION_ERROR',
+                'purchase_order_nos or a supplier / status filter is required',
+                status_code=400
+            )
+
+        po_numbers = po_batch_export.select_po_numbers(po_numbers, data.get('supplier'), data.get('status'))
+        if not po_numbers:
+            return create_error_response('NO_PURCHASE_ORDERS', 'No purchase orders to export', status_code=404)
+
+        max_pos = current_app.config.get('EXPORT_BATCH_MAX_POS', po_batch_export.DEFAULT_MAX_POS)
+        if len(po_numbers) > max_pos:
+            return create_error_response(
+                'TOO_MANY_PURCHASE_ORDERS',
+                f'At most {max_pos} purchase orders can be exported at once',
+                {'count': len(po_numbers)},
+                status_code=400
+            )
+
+        transitions = po_batch_export.record_exports(po_numbers, current_user.user_id)
+
+        filename = f"PO_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        return Response(
+            stream_with_context(po_batch_export.stream_zip(po_numbers, format_type, transitions)),
+            mimetype='application/zip',
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'X-Export-Count': str(len(po_numbers))
+            }
+        )
+
+    except ValueError as e:
+        return create_error_response('EXPORT_VALIDATION_ERROR', str(e), status_code=400)
+    except Exception as e:
+        db.session.rollback()
+        return create_error_response(
+            'PO_BATCH_EXPORT_ERROR',
+            'Failed to export purchase orders',
+            {'error': str(e)},
+            status_code=500
+        )
+
 @bp.route('/pending-confirmation', methods=['GET'])
 @authenticated_required
 def get_pending_confirmation(current_user):
@@ -642,6 +761,7 @@ def confirm_purchase_status(current_user, po_no):
             )
         
         # Update PO status to purchased
+        previous_costs = po.project_cost_breakdown()
         po.purchase_status = 'purchased'
         po.confirm_purchaser_id = current_user.user_id
 
@@ -661,7 +781,12 @@ def confirm_purchase_status(current_user, po_no):
                     req_item.item_status = 'purchased'
                     req_item.updated_at = datetime.utcnow()
 
+        # Add the purchase to the project expenditure ledger in this transaction
+        po.apply_project_cost_change(previous_costs)
+
         db.session.commit()
+        # The PO now counts as unpaid on the accounting dashboards
+        billing_summary.invalidate()
 
         po_dict = po.to_dict()
         po_dict['confirmed_by'] = current_user.chinese_name
@@ -738,6 +863,7 @@ def cancel_purchase_order(current_user, po_no):
         
         # Commit the changes
         db.session.commit()
+        billing_summary.invalidate()
         
         # Return updated PO data
         po_dict = po.to_dict(include_user_details=True)
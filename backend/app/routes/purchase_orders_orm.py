@@ -6,6 +6,7 @@ from app.models.supplier import Supplier
 from app.models.system_settings import SystemSettings
 from app.auth import procurement_required, authenticated_required, create_response, create_error_response, paginate_query
 from app.utils.security import require_permission
+from app.services import export_cache
 from app.services.po_generator import POGenerator
 from app.services.po_generator_enhanced import EnhancedPOGenerator
 from app.services.po_html_generator import POHTMLGenerator
@@ -193,7 +194,7 @@ def create_purchase_order(current_user):
 
         # Set totals
         po.subtotal_int = subtotal
-        po.tax_decimal1 = subtotal * 0.05  # 5% tax
+        po.tax_decimal1 = subtotal * SystemSettings.get_tax_rate() / 100
         po.grand_total_int = subtotal + po.tax_decimal1
 
         db.session.add(po)
@@ -224,10 +225,11 @@ def get_build_candidates(current_user):
             query = query.filter(RequestOrderItem.supplier_id == supplier_id)
 
         results = query.all()
+        item_dicts = RequestOrderItem.bulk_to_dict(item for item, _ in results)
 
         # Group by supplier
         suppliers = {}
-        for item, is_urgent in results:
+        for (item, is_urgent), item_dict in zip(results, item_dicts):
             if item.supplier_id not in suppliers:
                 suppliers[item.supplier_id] = {
                     'supplier_id': item.supplier_id,
@@ -240,7 +242,6 @@ def get_build_candidates(current_user):
             if is_urgent:
                 suppliers[item.supplier_id]['has_urgent_items'] = True
 
-            item_dict = item.to_dict()
             item_dict['is_urgent'] = is_urgent
             suppliers[item.supplier_id]['items'].append(item_dict)
 
@@ -274,7 +275,7 @@ def get_purchase_order(current_user, po_no):
             po_dict['supplier'] = po.supplier.to_summary_dict()
 
         # Add items info
-        po_dict['items'] = [item.to_dict() for item in po.items]
+        po_dict['items'] = PurchaseOrderItem.bulk_to_dict(po.items)
 
         return create_response(
             data={'data': po_dict},
@@ -306,6 +307,16 @@ def preview_purchase_order(current_user, po_no):
             status_code=500
         )
 
+def _export_response(response, etag):
+    """Tag an export with the content hash of its cached artifact
+
+    Exports are POSTs that also record the export on the PO, so every call
+    returns the document; browsers never revalidate a POST.
+    """
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @bp.route('/<po_no>/export', methods=['POST'])
 @procurement_required
 def export_purchase_order(current_user, po_no):
@@ -330,69 +341,73 @@ def export_purchase_order(current_user, po_no):
         # Record export operation and handle status transitions
         export_info = po.record_export(current_user.user_id)
         
-        # Handle different export formats
+        # Handle different export formats; documents are cached by PO content hash
         if format_type == 'html':
-            html_generator = POHTMLGenerator()
-            html_content = html_generator.generate_html(po)
+            html_content, etag, _ = export_cache.get_or_render(
+                po, 'html', lambda: POHTMLGenerator().generate_html(po)
+            )
             
             db.session.commit()
             
             # Return HTML response
-            return Response(
+            return _export_response(Response(
                 html_content,
                 mimetype='text/html',
                 headers={
                     'Content-Type': 'text/html; charset=utf-8',
                 }
-            )
+            ), etag)
             
         elif format_type == 'pdf':
             # For now, return HTML that can be printed to PDF
-            pdf_generator = POPDFGenerator()
-            html_content = pdf_generator.generate_pdf(po)
+            html_content, etag, _ = export_cache.get_or_render(
+                po, 'html', lambda: POPDFGenerator().generate_pdf(po)
+            )
             
             db.session.commit()
             
             # Return HTML response with print-friendly format
-            return Response(
+            return _export_response(Response(
                 html_content,
                 mimetype='text/html',
                 headers={
                     'Content-Type': 'text/html; charset=utf-8',
                 }
-            )
+            ), etag)
             
         elif format_type == 'excel':
-            excel_generator = POExcelGenerator()
-            file_data = excel_generator.generate_excel(po)
+            file_data, etag, _ = export_cache.get_or_render(
+                po, 'excel', lambda: POExcelGenerator().generate_excel(po)
+            )
             filename = f"PO_{po_no}.xlsx"
             mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             
             db.session.commit()
             
             # Send file
-            return send_file(
+            return _export_response(send_file(
                 io.BytesIO(file_data),
                 mimetype=mimetype,
                 as_attachment=True,
                 download_name=filename
-            )
+            ), etag)
         
         else:  # print format - return HTML for printing
             print(f"[EXPORT_API] Using HTML generator for print format")
-            html_generator = POHTMLGenerator()
-            html_content = html_generator.generate_html(po)
+            html_content, etag, _ = export_cache.get_or_render(
+                po, 'html', lambda: POHTMLGenerator().generate_html(po)
+            )
 
             db.session.commit()
 
             # Return HTML response optimized for printing
-            return Response(
+            return _export_response(Response(
                 html_content,
                 mimetype='text/html',
                 headers={
                     'Content-Type': 'text/html; charset=utf-8',
                 }
-            )
+            ), etag)
         
     except ValueError as e:
         db.session.rollback()
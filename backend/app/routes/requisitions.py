@@ -3,12 +3,21 @@ from sqlalchemy.orm import joinedload
 from app import db
 from app.models.request_order import RequestOrder, RequestOrderItem
 from app.models.item_category import ItemCategory
+from app.models.document_sequence import DocumentSequence
 from app.auth import authenticated_required, procurement_required, create_response, create_error_response, paginate_query
 from app.utils.security import require_permission
+from app.utils.pagination import get_cursor_params, InvalidCursorError
+from app.services import status_consistency
 from datetime import date, datetime
 
 bp = Blueprint('requisitions', __name__, url_prefix='/api/v1/requisitions')
 
+# Keyset sort keys for cursor pagination of the list (newest first)
+REQUISITION_KEYSET = [
+    (db.func.coalesce(RequestOrder.created_at, datetime(1970, 1, 1)), True),
+    (RequestOrder.request_order_no, True)
+]
+
 @bp.route('/test-permissions-update', methods=['GET'])
 def test_permissions_update():
     """Test endpoint to verify our code is loaded"""
@@ -248,7 +257,10 @@ def list_requisitions(current_user):
             )
         
         query = query.order_by(RequestOrder.created_at.desc())
-        result = paginate_query(query, page, page_size)
+        # ?cursor= pages by (created_at, request_order_no) instead of OFFSET
+        result = paginate_query(query, page, page_size,
+                                cursor_params=get_cursor_params(request.args),
+                                keyset=REQUISITION_KEYSET)
         
         # Add permission context to response
         permissions_data = {
@@ -259,7 +271,7 @@ def list_requisitions(current_user):
         print(f"[DEBUG] Permissions data: {permissions_data}")
         
         response_data = {
-            'items': [order.to_dict() for order in result['items']],
+            'items': RequestOrder.bulk_to_dict(result['items']),
             'pagination': result['pagination'],
             'permissions': permissions_data
         }
@@ -267,6 +279,12 @@ def list_requisitions(current_user):
         
         return jsonify(response_data), 200
         
+    except InvalidCursorError as e:
+        return create_error_response(
+            'INVALID_CURSOR',
+            str(e),
+            status_code=400
+        )
     except Exception as e:
         return create_error_response(
             'REQUISITION_LIST_ERROR',
@@ -299,12 +317,7 @@ def create_requisition(current_user):
             )
         
         # Generate request order number
-        today = date.today()
-        prefix = f"REQ{today.strftime('%Y%m%d')}"
-        existing_count = RequestOrder.query.filter(
-            RequestOrder.request_order_no.like(f"{prefix}%")
-        ).count()
-        request_order_no = f"{prefix}{existing_count + 1:03d}"
+        request_order_no = DocumentSequence.next_number('REQ')
         
         # CRITICAL FIX: Handle status from frontend
         initial_status = data.get('status', 'draft')  # Default to draft if not specified
@@ -408,7 +421,7 @@ def get_requisition(current_user, request_order_no):
             )
         
         response_data = order.to_dict()
-        response_data['items'] = [item.to_dict() for item in order.items.all()]
+        response_data['items'] = RequestOrderItem.bulk_to_dict(order.items.all())
         
         return create_response(response_data)
         
@@ -482,7 +495,7 @@ def update_requisition(current_user, request_order_no):
         # Reload with relationships
         order = RequestOrder.query.get(request_order_no)
         response_data = order.to_dict()
-        response_data['items'] = [item.to_dict() for item in order.items.all()]
+        response_data['items'] = RequestOrderItem.bulk_to_dict(order.items.all())
         
         return create_response(response_data)
         
@@ -631,6 +644,113 @@ def approve_line(current_user, request_order_no, detail_id):
             status_code=500
         )
 
+@bp.route('/<request_order_no>/lines/batch-approve', methods=['POST'])
+@procurement_required
+def batch_approve_lines(current_user, request_order_no):
+    """Approve several requisition lines in one transaction
+
+    Subscribers get one event for the whole batch instead of one per line.
+    """
+    try:
+        order = RequestOrder.query.filter_by(request_order_no=request_order_no).first_or_404()
+
+        data = request.get_json() or {}
+        lines = data.get('lines') or []
+        if not lines:
+            return create_error_response(
+                'MISSING_FIELD',
+                'lines is required',
+                status_code=400
+            )
+
+        for line in lines:
+            for field in ['detail_id', 'supplier_id', 'unit_price']:
+                if field not in line:
+                    return create_error_response(
+                        'MISSING_FIELD',
+                        f'{field} is required',
+                        {'detail_id': line.get('detail_id')},
+                        status_code=400
+                    )
+            if float(line['unit_price']) <= 0:
+                return create_error_response(
+                    'INVALID_PRICE',
+                    'Unit price must be positive',
+                    {'detail_id': line['detail_id']},
+                    status_code=400
+                )
+
+        detail_ids = [line['detail_id'] for line in lines]
+        items = {
+            item.detail_id: item
+            for item in RequestOrderItem.query.filter(
+                RequestOrderItem.request_order_no == request_order_no,
+                RequestOrderItem.detail_id.in_(detail_ids)
+            )
+        }
+        missing = [detail_id for detail_id in detail_ids if detail_id not in items]
+        if missing:
+            return create_error_response(
+                'ITEM_NOT_FOUND',
+                'Requisition lines not found',
+                {'detail_ids': missing},
+                status_code=404
+            )
+
+        item_changes = []
+        for line in lines:
+            item = items[line['detail_id']]
+            old_item_status = item.item_status
+            try:
+                item.approve(line['supplier_id'], line['unit_price'], line.get('note', ''))
+            except ValueError as e:
+                db.session.rollback()
+                return create_error_response(
+                    'INVALID_STATUS',
+                    str(e),
+                    {'detail_id': item.detail_id, 'item_status': old_item_status},
+                    status_code=400
+                )
+            item_changes.append((item.detail_id, old_item_status, item.item_status))
+
+        db.session.flush()
+
+        # Same status rule as approve_line, checked once for the batch
+        old_order_status = order.order_status
+        summary = order.get_summary()
+        if (order.order_status == 'submitted' and
+            summary['total_items'] > 0 and
+            summary['pending_items'] == 0):
+            order.update_status_after_review()
+
+        db.session.commit()
+
+        # WEBSOCKET INTEGRATION: One event per room for the whole batch
+        from app.websocket import broadcast_requisition_batch
+        status_change = None
+        if order.order_status != old_order_status:
+            status_change = (old_order_status, order.order_status)
+        broadcast_requisition_batch(
+            request_order_no,
+            item_changes,
+            status_change,
+            {'updated_by': current_user.username}
+        )
+
+        return create_response({
+            'items': [items[detail_id].to_dict() for detail_id in detail_ids],
+            'order_status': order.order_status
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return create_error_response(
+            'LINE_APPROVE_ERROR',
+            'Failed to approve lines',
+            {'error': str(e)},
+            status_code=500
+        )
+
 @bp.route('/<request_order_no>/lines/<int:detail_id>/question', methods=['POST'])
 @procurement_required
 def question_line(current_user, request_order_no, detail_id):
@@ -1067,34 +1187,16 @@ def scan_status_problems(current_user):
     try:
         print(f"[SCAN_PROBLEMS] Status problem scan requested by {current_user.username}")
         
-        # Find all submitted requisitions
-        submitted_orders = RequestOrder.query.filter_by(order_status='submitted').all()
+        # One aggregate query over submitted requisitions and their items
+        report = status_consistency.run_check(fix=False)
         
-        problems = []
-        
-        for order in submitted_orders:
-            summary = order.get_summary()
-            
-            # Check if all items are reviewed but status is still submitted
-            if (summary['total_items'] > 0 and 
-                summary['pending_items'] == 0):
-                
-                problems.append({
-                    'requisition_number': order.request_order_no,
-                    'requester_name': order.requester_name,
-                    'current_status': order.order_status,
-                    'expected_status': 'reviewed',
-                    'summary': summary,
-                    'created_at': order.created_at.isoformat() if order.created_at else None,
-                    'updated_at': order.updated_at.isoformat() if order.updated_at else None
-                })
-        
-        print(f"[SCAN_PROBLEMS] Found {len(problems)} problems")
+        print(f"[SCAN_PROBLEMS] Found {report['problem_count']} problems in {report['duration_ms']} ms")
         
         return create_response({
-            'total_problems': len(problems),
-            'problems': problems,
+            'total_problems': report['problem_count'],
+            'problems': [_format_status_problem(problem) for problem in report['problems']],
             'scan_time': datetime.now().isoformat(),
+            'scan_duration_ms': report['duration_ms'],
             'scanned_by': current_user.username
         })
         
@@ -1107,6 +1209,52 @@ def scan_status_problems(current_user):
             status_code=500
         )
 
+@bp.route('/fix-status-problems', methods=['POST'])
+@procurement_required
+def fix_status_problems(current_user):
+    """Move every requisition found by scan-status-problems to 'reviewed' in one update"""
+    try:
+        if current_user.role not in ['ProcurementMgr', 'Admin']:
+            return create_error_response(
+                'PERMISSION_DENIED',
+                'Only Procurement Managers and Administrators can fix requisition statuses',
+                status_code=403
+            )
+        
+        report = status_consistency.run_check(fix=True)
+        
+        print(f"[FIX_PROBLEMS] {current_user.username} fixed {report['fixed']} of "
+              f"{report['problem_count']} requisitions in {report['duration_ms']} ms")
+        
+        return create_response({
+            'total_problems': report['problem_count'],
+            'fixed_count': report['fixed'],
+            'fixed': [_format_status_problem(problem, 'reviewed') for problem in report['problems']],
+            'duration_ms': report['duration_ms'],
+            'fixed_by': current_user.username
+        })
+        
+    except Exception as e:
+        print(f"[FIX_PROBLEMS] Error fixing: {e}")
+        return create_error_response(
+            'FIX_PROBLEMS_ERROR',
+            'Failed to fix status problems',
+            {'error': str(e)},
+            status_code=500
+        )
+
+def _format_status_problem(problem, current_status=None):
+    """Response entry for one row of RequestOrder.scan_status_problems()"""
+    return {
+        'requisition_number': problem['request_order_no'],
+        'requester_name': problem['requester_name'],
+        'current_status': current_status or problem['order_status'],
+        'expected_status': 'reviewed',
+        'summary': problem['summary'],
+        'created_at': problem['created_at'].isoformat() if problem['created_at'] else None,
+        'updated_at': problem['updated_at'].isoformat() if problem['updated_at'] else None
+    }
+
 @bp.route('/<request_order_no>/cancel', methods=['POST'])
 @procurement_required
 def cancel_request_order(current_user, request_order_no):
@@ -19,143 +19,13 @@ from app.models import (
 from app.auth import require_roles
 from app.utils.validation import validate_storage_data, validate_movement_data
 from app.utils.pagination import paginate_query
-from app.utils.cache import cache_result, invalidate_cache
+from app.utils.cache import invalidate_cache
 
 # Create blueprint
 storage_bp = Blueprint('storage', __name__, url_prefix='/api/v1/storage')
 logger = logging.getLogger(__name__)
 
-@storage_bp.route('/tree', methods=['GET'])
-@jwt_required()
-@cache_result('storage', lambda: 'tree:hierarchy')
-def get_storage_tree():
-    """
-    Get storage location hierarchy in tree format
-    Returns: Zone -> Shelf -> Floor -> Position structure
-    """
-    try:
-        # Query all storage locations ordered by hierarchy
-        storage_locations = db.session.query(Storage)\
-                           .order_by(Storage.zone, Storage.shelf, Storage.floor, Storage.position)\
-                           .all()
-        
-        # Build hierarchical tree structure
-        storage_tree = {}
-        
-        for storage in storage_locations:
-            zone_key = storage.zone or 'Unassigned'
-            shelf_key = storage.shelf or 'No Shelf'
-            floor_key = storage.floor or 'No Floor'
-            
-            # Initialize zone if not exists
-            if zone_key not in storage_tree:
-                storage_tree[zone_key] = {
-                    'zone_name': zone_key,
-                    'zone_id': storage.zone,
-                    'shelves': {},
-                    'total_locations': 0,
-                    'available_locations': 0
-                }
-            
-            # Initialize shelf if not exists
-            if shelf_key not in storage_tree[zone_key]['shelves']:
-                storage_tree[zone_key]['shelves'][shelf_key] = {
-                    'shelf_name': shelf_key,
-                    'shelf_id': storage.shelf,
-                    'floors': {},
-                    'total_locations': 0,
-                    'available_locations': 0
-                }
-            
-            # Initialize floor if not exists
-            if floor_key not in storage_tree[zone_key]['shelves'][shelf_key]['floors']:
-                storage_tree[zone_key]['shelves'][shelf_key]['floors'][floor_key] = {
-                    'floor_name': floor_key,
-                    'floor_id': storage.floor,
-                    'positions': [],
-                    'total_locations': 0,
-                    'available_locations': 0
-                }
-            
-            # Add position to floor
-            position_data = {
-                'id': storage.id,
-                'position': storage.position,
-                'storage_type': storage.storage_type,
-                'is_available': storage.is_available,
-                'max_capacity': storage.max_capacity,
-                'current_capacity': storage.current_capacity,
-                'description': storage.description,
-                'created_at': storage.created_at.isoformat()
-            }
-            
-            storage_tree[zone_key]['shelves'][shelf_key]['floors'][floor_key]['positions'].append(position_data)
-            
-            # Update counters
-            storage_tree[zone_key]['shelves'][shelf_key]['floors'][floor_key]['total_locations'] += 1
-            storage_tree[zone_key]['shelves'][shelf_key]['total_locations'] += 1
-            storage_tree[zone_key]['total_locations'] += 1
-            
-            if storage.is_available:
-                storage_tree[zone_key]['shelves'][shelf_key]['floors'][floor_key]['available_locations'] += 1
-                storage_tree[zone_key]['shelves'][shelf_key]['available_locations'] += 1
-                storage_tree[zone_key]['available_locations'] += 1
-        
-        # Convert to list format for frontend consumption
-        zones_list = []
-        for zone_name, zone_data in storage_tree.items():
-            shelves_list = []
-            for shelf_name, shelf_data in zone_data['shelves'].items():
-                floors_list = []
-                for floor_name, floor_data in shelf_data['floors'].items():
-                    floors_list.append({
-                        'floor_name': floor_name,
-                        'floor_id': floor_data['floor_id'],
-                        'positions': floor_data['positions'],
-                        'total_locations': floor_data['total_locations'],
-                        'available_locations': floor_data['available_locations']
-                    })
-                
-                shelves_list.append({
-                    'shelf_name': shelf_name,
-                    'shelf_id': shelf_data['shelf_id'],
-                    'floors': floors_list,
-                    'total_locations': shelf_data['total_locations'],
-                    'available_locations': shelf_data['available_locations']
-                })
-            
-            zones_list.append({
-                'zone_name': zone_name,
-                'zone_id': zone_data['zone_id'],
-                'shelves': shelves_list,
-                'total_locations': zone_data['total_locations'],
-                'available_locations': zone_data['available_locations']
-            })
-        
-        return jsonify({
-            'success': True,
-            'data': {
-                'storage_tree': zones_list,
-                'summary': {
-                    'total_zones': len(zones_list),
-                    'total_locations': sum(zone['total_locations'] for zone in zones_list),
-                    'available_locations': sum(zone['available_locations'] for zone in zones_list)
-                }
-            },
-            'timestamp': datetime.utcnow().isoformat()
-        }), 200
-        
-    except Exception as e:
-        logger.error(f"Error retrieving storage tree: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': {
-                'code': 'GET_STORAGE_TREE_ERROR',
-                'message': 'Failed to retrieve storage hierarchy',
-                'details': str(e)
-            },
-            'timestamp': datetime.utcnow().isoformat()
-        }), 500
+# GET /api/v1/storage/tree is served by the inventory blueprint (cached per zone)
 
 @storage_bp.route('/locations', methods=['GET'])
 @jwt_required()
@@ -3,6 +3,7 @@ from werkzeug.exceptions import NotFound
 from app import db
 from app.models.user import User
 from app.auth import admin_required, authenticated_required, create_response, create_error_response, paginate_query
+from app.utils import user_cache
 import re
 from datetime import datetime
 
@@ -182,6 +183,7 @@ def update_user(current_user, user_id):
             user.is_active = data['is_active']
 
         db.session.commit()
+        user_cache.invalidate_user(user.user_id)
 
         # Log admin action if there were changes
         if changes and current_user.role == 'Admin':
@@ -273,6 +275,7 @@ def delete_user(current_user, user_id):
         user.updated_at = datetime.utcnow()
 
         db.session.commit()
+        user_cache.invalidate_user(user_id)
 
         # Log admin action
         log_admin_action(current_user, 'USER_DELETED', user_id, {
@@ -327,6 +330,7 @@ def reset_user_password(current_user, user_id):
         user.set_password(new_password)
         user.updated_at = datetime.utcnow()
         db.session.commit()
+        user_cache.invalidate_user(user_id)
 
         # Log admin action
         log_admin_action(current_user, 'PASSWORD_RESET', user_id, {
@@ -361,6 +365,7 @@ def activate_user(current_user, user_id):
         user.updated_at = datetime.utcnow()
 
         db.session.commit()
+        user_cache.invalidate_user(user_id)
 
         # Log admin action
         log_admin_action(current_user, 'USER_ACTIVATED', user_id, {
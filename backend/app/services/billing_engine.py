@@ -0,0 +1,258 @@
+"""
+Bulk Billing Engine
+批次請款 / 付款
+
+Month-end billing and payment runs cover hundreds of POs. The whole PO set
+is validated with one locking SELECT and changed with set-based UPDATEs
+guarded by the billing status the validation saw; every PO gets an outcome
+in the response. An Idempotency-Key is claimed before the POs are locked
+and the successful response is stored under it, so a retried request
+replays the original result instead of running again.
+"""
+import hashlib
+import json
+import time
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from flask import g
+
+from app import db
+from app.models.purchase_order import PurchaseOrder
+from app.utils.cache import ERPCache
+
+
+# A claimed key whose request died is freed after IN_PROGRESS_TTL seconds
+IN_PROGRESS_TTL = 300
+IN_PROGRESS_WAIT = 10
+
+
+class BillingError(ValueError):
+    """A billing request that cannot be applied, with its API error code"""
+
+    def __init__(self, code, message, details=None, status_code=400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.details = details
+        self.status_code = status_code
+
+
+def _unique(po_numbers):
+    return list(dict.fromkeys(po_numbers))
+
+
+def _lock_pos(*criteria):
+    """Billing columns of the matching POs, locked until the transaction ends"""
+    return db.session.query(
+        PurchaseOrder.purchase_order_no,
+        PurchaseOrder.supplier_id,
+        PurchaseOrder.billing_status,
+        PurchaseOrder.subtotal_int,
+        PurchaseOrder.tax_decimal1,
+        PurchaseOrder.grand_total_int
+    ).filter(*criteria).with_for_update().all()
+
+
+def _apply(po_numbers, guard, values):
+    """Set `values` on po_numbers in one UPDATE; every PO must still match `guard`"""
+    if not po_numbers:
+        return 0
+    updated = PurchaseOrder.query.filter(
+        PurchaseOrder.purchase_order_no.in_(po_numbers),
+        guard
+    ).update(values, synchronize_session=False)
+    if updated != len(po_numbers):
+        raise BillingError(
+            'CONCURRENT_UPDATE',
+            'Purchase orders changed while the request was being applied, please retry',
+            {'expected': len(po_numbers), 'updated': updated},
+            status_code=409
+        )
+    return updated
+
+
+def _outcome(row, outcome):
+    return {
+        'purchase_order_no': row.purchase_order_no,
+        'outcome': outcome,
+        'amount': row.grand_total_int or 0
+    }
+
+
+def generate_billing(supplier_id, month_str, term, po_numbers):
+    """Move a supplier's unbilled POs to 'billed' for month_str
+
+    All POs must exist, belong to the supplier and be unbilled; otherwise
+    nothing changes and BillingError INVALID_PO lists every PO's outcome.
+    """
+    try:
+        month_date = datetime.strptime(month_str, '%Y-%m').date()
+    except (TypeError, ValueError):
+        raise BillingError('INVALID_MONTH', 'month must be in YYYY-MM format')
+
+    po_numbers = _unique(po_numbers)
+    rows = {row.purchase_order_no: row for row in _lock_pos(PurchaseOrder.purchase_order_no.in_(po_numbers))}
+
+    outcomes = []
+    for po_no in po_numbers:
+        row = rows.get(po_no)
+        if row is None:
+            outcomes.append({'purchase_order_no': po_no, 'outcome': 'not_found', 'amount': 0})
+        elif row.supplier_id != supplier_id:
+            outcomes.append(_outcome(row, 'wrong_supplier'))
+        elif row.billing_status != 'none':
+            outcomes.append(_outcome(row, 'already_billed'))
+        else:
+            outcomes.append(_outcome(row, 'billed'))
+
+    invalid = [outcome for outcome in outcomes if outcome['outcome'] != 'billed']
+    if invalid:
+        raise BillingError(
+            'INVALID_PO',
+            f"PO {invalid[0]['purchase_order_no']} not found or already billed",
+            {'outcomes': outcomes}
+        )
+
+    # Due date is the end of the month plus the payment term
+    month_end = month_date + relativedelta(months=1) - relativedelta(days=1)
+    due_date = month_end + relativedelta(days=term)
+
+    _apply(po_numbers, PurchaseOrder.billing_status == 'none', {
+        'billing_status': 'billed',
+        'billed_month': month_str,
+        'due_date': due_date
+    })
+
+    billed = [rows[po_no] for po_no in po_numbers]
+    return {
+        'due_date': due_date,
+        'subtotal': sum(row.subtotal_int or 0 for row in billed),
+        'tax': sum(row.tax_decimal1 or 0 for row in billed),
+        'grand_total': sum(row.grand_total_int or 0 for row in billed),
+        'outcomes': outcomes
+    }
+
+
+def mark_batch_paid(supplier_id, month, method, pay_date):
+    """Pay every billed PO of a supplier's billing month
+
+    POs of the batch that are already paid are reported as 'already_paid';
+    raises BillingError BILLING_NOT_FOUND when the batch has no POs.
+    """
+    rows = _lock_pos(
+        PurchaseOrder.supplier_id == supplier_id,
+        PurchaseOrder.billed_month == month,
+        PurchaseOrder.billing_status.in_(('billed', 'paid'))
+    )
+    if not rows:
+        raise BillingError('BILLING_NOT_FOUND', 'Billing batch not found', status_code=404)
+
+    rows.sort(key=lambda row: row.purchase_order_no)
+    to_pay = [row.purchase_order_no for row in rows if row.billing_status == 'billed']
+    _apply(to_pay, PurchaseOrder.billing_status == 'billed', {
+        'billing_status': 'paid',
+        'payment_method': method,
+        'payment_date': pay_date
+    })
+
+    return {
+        'paid': to_pay,
+        'outcomes': [_outcome(row, 'paid' if row.billing_status == 'billed' else 'already_paid') for row in rows]
+    }
+
+
+def mark_paid(po_numbers, method, payment_date, payment_note=''):
+    """Pay the given POs; missing and already paid POs are reported and skipped"""
+    po_numbers = _unique(po_numbers)
+    rows = {row.purchase_order_no: row for row in _lock_pos(PurchaseOrder.purchase_order_no.in_(po_numbers))}
+
+    outcomes = []
+    to_pay = []
+    for po_no in po_numbers:
+        row = rows.get(po_no)
+        if row is None:
+            outcomes.append({'purchase_order_no': po_no, 'outcome': 'not_found', 'amount': 0})
+        elif row.billing_status == 'paid':
+            outcomes.append(_outcome(row, 'already_paid'))
+        else:
+            outcomes.append(_outcome(row, 'paid'))
+            to_pay.append(po_no)
+
+    not_paid = db.or_(PurchaseOrder.billing_status.is_(None), PurchaseOrder.billing_status != 'paid')
+    _apply(to_pay, not_paid, {
+        'billing_status': 'paid',
+        'payment_method': method,
+        'payment_date': payment_date,
+        'payment_note': payment_note
+    })
+
+    return {'paid': to_pay, 'outcomes': outcomes}
+
+
+def _fingerprint(body):
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _idempotency_key(scope, user_id, key):
+    return f'{scope}:{user_id}:{key}'
+
+
+def reserve(idempotency_key, scope, user_id, body):
+    """(payload, status_code) stored for an earlier request with this key, or
+    None once this request has claimed the key
+
+    The key is claimed atomically with an in-progress marker before any PO
+    is locked. A duplicate that arrives while the original is still running
+    waits up to IN_PROGRESS_WAIT seconds for its response, then gets 409.
+    Reusing a key with a different request body raises BillingError (422).
+    Without Redis the claim and the stored response live in this worker's
+    fallback cache, so a duplicate routed to another worker runs again.
+    """
+    if not idempotency_key:
+        return None
+    key = _idempotency_key(scope, user_id, idempotency_key)
+    fingerprint = _fingerprint(body)
+    deadline = time.monotonic() + IN_PROGRESS_WAIT
+    delay = 0.05
+    while True:
+        if ERPCache.reserve_idempotency_key(key, {'fingerprint': fingerprint, 'in_progress': True}, IN_PROGRESS_TTL):
+            g.idempotency_key = key
+            return None
+        stored = ERPCache.get_idempotent_response(key)
+        if stored is not None:
+            if stored['fingerprint'] != fingerprint:
+                raise BillingError(
+                    'IDEMPOTENCY_KEY_REUSED',
+                    'Idempotency-Key was already used for a different request',
+                    status_code=422
+                )
+            if not stored.get('in_progress'):
+                return stored['payload'], stored['status_code']
+        if time.monotonic() >= deadline:
+            raise BillingError(
+                'IDEMPOTENCY_KEY_IN_PROGRESS',
+                'A request with this Idempotency-Key is still being processed, please retry',
+                status_code=409
+            )
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def remember(idempotency_key, scope, user_id, body, payload, status_code=200):
+    """Store a successful response in place of the claim so a retry replays it"""
+    if not idempotency_key:
+        return
+    ERPCache.cache_idempotent_response(_idempotency_key(scope, user_id, idempotency_key), {
+        'fingerprint': _fingerprint(body),
+        'payload': payload,
+        'status_code': status_code
+    })
+    g.pop('idempotency_key', None)
+
+
+def release():
+    """Drop the key claimed by this request after it failed, so a retry runs again"""
+    key = g.pop('idempotency_key', None)
+    if key is not None:
+        ERPCache.release_idempotency_key(key)
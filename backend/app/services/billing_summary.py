@@ -0,0 +1,79 @@
+"""
+Accounting dashboard summaries
+Both the accounting report summary and the payment-management summary are
+built from one cached GROUP BY over purchase_orders. Routes that change a
+PO's billing, payment or purchase status call invalidate() after commit;
+the cache timeout bounds staleness from any other change (e.g. PO edits).
+Without Redis each worker caches its own copy and invalidate() only clears
+the calling worker's, so the others may lag by up to LOCAL_FALLBACK_TIMEOUT.
+"""
+
+from app.models.purchase_order import PurchaseOrder
+from app.utils.cache import ERPCache
+
+
+def get_breakdown():
+    """Per-billing-status counts and amounts, from cache when available
+
+    When the aggregate expires, one caller recomputes it and the others are
+    served the previous value meanwhile.
+    """
+    return ERPCache.billing_breakdown(PurchaseOrder.billing_breakdown)
+
+
+def invalidate():
+    """Drop the cached aggregate; call after committing a billing/payment change"""
+    ERPCache.invalidate_billing_summary()
+
+
+def _total(rows, predicate):
+    matched = [row for row in rows if predicate(row)]
+    return {
+        'count': sum(row['count'] for row in matched),
+        'amount': sum(row['amount'] for row in matched)
+    }
+
+
+def accounting_summary():
+    """Payload of GET /accounting/reports/summary"""
+    rows = get_breakdown()
+    unpaid = _total(rows, lambda row: row['billing_status'] == 'none' and row['purchased'])
+    billed = _total(rows, lambda row: row['billing_status'] == 'billed')
+    paid = _total(rows, lambda row: row['billing_status'] == 'paid')
+
+    return {
+        'unpaid': unpaid,
+        'billed': billed,
+        'paid': paid,
+        'total': {
+            'count': unpaid['count'] + billed['count'] + paid['count'],
+            'amount': unpaid['amount'] + billed['amount'] + paid['amount']
+        }
+    }
+
+
+def payment_summary():
+    """Payload of GET /accounting/payment-management/summary"""
+    rows = get_breakdown()
+    # billing_status != 'paid' in SQL never matches NULL
+    unpaid = _total(rows, lambda row: row['purchased'] and row['billing_status'] not in (None, 'paid'))
+    paid = _total(rows, lambda row: row['billing_status'] == 'paid')
+
+    def paid_by(method):
+        return _total(rows, lambda row: row['billing_status'] == 'paid' and row['payment_method'] == method)['amount']
+
+    return {
+        'unpaid': unpaid,
+        'paid': {
+            'count': paid['count'],
+            'amount': paid['amount'],
+            'by_method': {
+                'remittance': paid_by('remittance'),
+                'check': paid_by('check')
+            }
+        },
+        'total': {
+            'count': unpaid['count'] + paid['count'],
+            'amount': unpaid['amount'] + paid['amount']
+        }
+    }
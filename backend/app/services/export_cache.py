@@ -0,0 +1,152 @@
+"""
+Purchase Order Export Artifact Cache
+採購單匯出檔案快取
+
+Rendered HTML and Excel documents are stored on local disk under a hash of
+everything the generators print: the PO header fields, its lines and the
+template version. An unchanged PO is served from disk without rendering;
+any edit changes the hash, so stale artifacts are never served and simply
+age out. The directory is kept under EXPORT_CACHE_MAX_BYTES by evicting the
+least recently used files.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Bump when a generator's output changes so cached artifacts are not reused
+TEMPLATE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# File extension per artifact kind; the PDF export renders the same HTML
+ARTIFACT_EXTENSIONS = {
+    'html': 'html',
+    'excel': 'xlsx'
+}
+
+HEADER_FIELDS = (
+    'purchase_order_no', 'supplier_id', 'supplier_name', 'supplier_address', 'contact_phone',
+    'contact_person', 'quotation_no', 'order_date', 'subtotal_int', 'tax_decimal1', 'grand_total_int'
+)
+ITEM_FIELDS = (
+    'detail_id', 'item_name', 'item_specification', 'item_model', 'item_quantity', 'item_unit',
+    'unit_price', 'line_subtotal_int'
+)
+
+_prune_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def content_hash(purchase_order, items, kind):
+    """Hash of the rendered content of purchase_order as a `kind` artifact"""
+    payload = {
+        'template_version': TEMPLATE_VERSION,
+        'kind': kind,
+        'header': [getattr(purchase_order, field) for field in HEADER_FIELDS],
+        'items': [[getattr(item, field) for field in ITEM_FIELDS]
+                  for item in sorted(items, key=lambda item: item.detail_id or 0)]
+    }
+    data = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def _cache_dir():
+    directory = current_app.config.get('EXPORT_CACHE_DIR') or os.path.join(
+        tempfile.gettempdir(), 'erp_export_cache'
+    )
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _max_bytes():
+    return int(current_app.config.get('EXPORT_CACHE_MAX_BYTES') or DEFAULT_MAX_BYTES)
+
+
+def _prune(directory, max_bytes):
+    """Delete least recently used artifacts until the directory fits max_bytes"""
+    with _prune_lock:
+        entries = []
+        total = 0
+        for entry in os.scandir(directory):
+            if not entry.is_file() or entry.name.startswith('.'):
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        if total <= max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            _stats['evictions'] += 1
+            total -= size
+            if total <= max_bytes:
+                break
+
+
+def _artifact_path(directory, digest, kind):
+    return os.path.join(directory, f'{digest}.{ARTIFACT_EXTENSIONS[kind]}')
+
+
+def lookup(digest, kind):
+    """Cached artifact bytes for a content hash, or None"""
+    path = _artifact_path(_cache_dir(), digest, kind)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        # Mark as recently used for LRU eviction
+        os.utime(path)
+        _stats['hits'] += 1
+        return data
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Export cache read failed for {path}: {e}")
+    _stats['misses'] += 1
+    return None
+
+
+def store(digest, kind, data):
+    """Save rendered artifact bytes under their content hash"""
+    directory = _cache_dir()
+    path = _artifact_path(directory, digest, kind)
+    try:
+        # Write under a temporary name so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        _prune(directory, _max_bytes())
+    except OSError as e:
+        logger.warning(f"Export cache write failed for {path}: {e}")
+
+
+def get_or_render(purchase_order, kind, render):
+    """Return (content, etag, cached) for the `kind` artifact of purchase_order
+
+    render() is only called when no artifact with the current content hash
+    exists; text is stored as UTF-8 and returned in the type render() gives.
+    The etag is the content hash (unquoted, as Response.set_etag expects).
+    """
+    digest = content_hash(purchase_order, purchase_order.items.all(), kind)
+    data = lookup(digest, kind)
+    if data is not None:
+        return (data.decode('utf-8') if kind == 'html' else data), digest, True
+
+    content = render()
+    store(digest, kind, content.encode('utf-8') if isinstance(content, str) else content)
+    return content, digest, False
+
+
+def get_stats():
+    """Hit/miss/eviction counters of this process"""
+    return dict(_stats)
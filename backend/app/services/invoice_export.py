@@ -0,0 +1,145 @@
+"""
+Invoice Export
+請款單匯出 (CSV / Excel)
+
+PO lines are read through one PO + item + supplier join executed with a
+server-side cursor and consumed in chunks, so neither the rows nor the
+file are ever held in memory as a whole. CSV is written to the response as
+it is produced; the xlsx workbook is built in openpyxl write-only mode in a
+temporary file and streamed from disk.
+"""
+import csv
+import io
+import tempfile
+from decimal import Decimal
+from urllib.parse import quote
+
+from flask import Response, stream_with_context
+from openpyxl import Workbook
+
+from app import db
+from app.models.purchase_order import PurchaseOrder, PurchaseOrderItem
+from app.models.supplier import Supplier
+
+EXPORT_CHUNK_SIZE = 1000
+FILE_CHUNK_SIZE = 64 * 1024
+
+COLUMNS = ['採購單號', '供應商', '項目名稱', '規格', '數量', '單位', '單價', '小計', '狀態', '建立日期', '確認日期']
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
+
+
+def iter_lines(po_numbers, supplier_id=None):
+    """Yield one dict per PO line, in PO then line order
+
+    A single joined SELECT is streamed with a server-side cursor
+    (PostgreSQL); rows are fetched EXPORT_CHUNK_SIZE at a time.
+    """
+    statement = db.select(
+        PurchaseOrder.purchase_order_no,
+        Supplier.supplier_name_zh,
+        PurchaseOrder.purchase_status,
+        PurchaseOrder.created_at,
+        PurchaseOrder.confirm_purchaser_id,
+        PurchaseOrder.updated_at,
+        PurchaseOrderItem.item_name,
+        PurchaseOrderItem.item_specification,
+        PurchaseOrderItem.item_quantity,
+        PurchaseOrderItem.item_unit,
+        PurchaseOrderItem.unit_price
+    ).join(
+        PurchaseOrderItem, PurchaseOrderItem.purchase_order_no == PurchaseOrder.purchase_order_no
+    ).outerjoin(
+        Supplier, Supplier.supplier_id == PurchaseOrder.supplier_id
+    ).where(
+        PurchaseOrder.purchase_order_no.in_(po_numbers)
+    ).order_by(
+        PurchaseOrder.purchase_order_no, PurchaseOrderItem.detail_id
+    ).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+
+    if supplier_id:
+        statement = statement.where(PurchaseOrder.supplier_id == supplier_id)
+
+    result = db.session.execute(statement)
+    try:
+        for chunk in result.partitions():
+            for row in chunk:
+                subtotal = row.unit_price * row.item_quantity if row.unit_price and row.item_quantity else 0
+                yield {
+                    '採購單號': row.purchase_order_no,
+                    '供應商': row.supplier_name_zh or '',
+                    '項目名稱': row.item_name,
+                    '規格': row.item_specification,
+                    '數量': row.item_quantity,
+                    '單位': row.item_unit,
+                    '單價': row.unit_price,
+                    '小計': subtotal,
+                    '狀態': row.purchase_status,
+                    '建立日期': _format_date(row.created_at),
+                    # No confirmation date is stored; like to_dict(), use the last update of a confirmed PO
+                    '確認日期': _format_date(row.updated_at) if row.confirm_purchaser_id else ''
+                }
+    finally:
+        result.close()
+
+
+def stream_csv(lines):
+    """Yield UTF-8 CSV (with BOM so Excel detects the encoding) chunk by chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield '\ufeff' + buffer.getvalue()
+
+    buffer.seek(0)
+    buffer.truncate()
+    for count, line in enumerate(lines, 1):
+        writer.writerow(['' if line[column] is None else line[column] for column in COLUMNS])
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_xlsx(lines, title='請款資料'):
+    """Build a write-only workbook on disk and yield the file in chunks"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append(COLUMNS)
+    for line in lines:
+        sheet.append([float(value) if isinstance(value, Decimal) else value
+                      for value in (line[column] for column in COLUMNS)])
+
+    with tempfile.TemporaryFile() as handle:
+        workbook.save(handle)
+        handle.seek(0)
+        while True:
+            data = handle.read(FILE_CHUNK_SIZE)
+            if not data:
+                break
+            yield data
+
+
+def export_response(lines, export_format, filename):
+    """Stream `lines` as a CSV or xlsx download; `filename` has no extension"""
+    if export_format == 'csv':
+        body = (chunk.encode('utf-8') for chunk in stream_csv(lines))
+    else:
+        body = stream_xlsx(lines)
+
+    return Response(
+        stream_with_context(body),
+        mimetype=FORMATS[export_format],
+        headers={
+            'Content-Disposition': f"attachment; filename*=UTF-8''{quote(filename)}.{export_format}"
+        }
+    )
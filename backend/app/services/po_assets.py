@@ -0,0 +1,61 @@
+"""
+Purchase Order Document Assets
+採購單文件資源 (公司標誌)
+
+The TSIC logo is read, resized and encoded once per process and shared by
+the HTML, PDF and Excel generators.
+"""
+import base64
+import io
+import os
+from functools import lru_cache
+
+LOGO_FILENAME = 'TSIC_LOGO.png'
+# Excel places images at 96 DPI
+EXCEL_LOGO_WIDTH_PX = 270
+
+
+def _logo_path():
+    """First existing logo location, or None"""
+    possible_paths = [
+        os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'docs', LOGO_FILENAME)),
+        os.path.join('docs', LOGO_FILENAME)
+    ]
+    for logo_path in possible_paths:
+        if os.path.exists(logo_path):
+            return logo_path
+    return None
+
+
+@lru_cache(maxsize=1)
+def logo_base64():
+    """Logo PNG as a base64 string for data: URIs, or None"""
+    logo_path = _logo_path()
+    if not logo_path:
+        return None
+    try:
+        with open(logo_path, 'rb') as f:
+            return base64.b64encode(f.read()).decode('utf-8')
+    except Exception as e:
+        print(f"Error reading logo from {logo_path}: {e}")
+        return None
+
+
+@lru_cache(maxsize=4)
+def excel_logo(width_px=EXCEL_LOGO_WIDTH_PX):
+    """Logo resized to width_px as (PNG bytes, width, height), or None"""
+    logo_path = _logo_path()
+    if not logo_path:
+        return None
+    try:
+        from PIL import Image as PILImage
+
+        with PILImage.open(logo_path) as pil_img:
+            height_px = int(pil_img.height * (width_px / pil_img.width))
+            resized = pil_img.resize((width_px, height_px), PILImage.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        resized.save(buffer, format='PNG')
+        return buffer.getvalue(), width_px, height_px
+    except Exception as e:
+        print(f"Error preparing logo from {logo_path}: {e}")
+        return None
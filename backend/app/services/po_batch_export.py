@@ -0,0 +1,217 @@
+"""
+Batch Purchase Order Export
+批次採購單匯出 (ZIP)
+
+Many POs are exported as one zip. The documents come from the same
+generators as the single export, rendered in a shared process pool from
+picklable PO snapshots that the request loads in chunks. Documents whose
+content hash is in the export cache are not rendered again. Each file is
+written to the zip stream as soon as it is ready, and only a small window
+of documents is in flight, so the archive is never held in memory.
+"""
+import atexit
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+from flask import current_app
+
+from app import db
+from app.models.purchase_order import PurchaseOrder, PurchaseOrderItem
+from app.services import export_cache
+from app.services.po_excel_generator import POExcelGenerator
+from app.services.po_html_generator import POHTMLGenerator
+from app.services.po_pdf_generator import POPDFGenerator
+
+SNAPSHOT_CHUNK_SIZE = 100
+DEFAULT_MAX_POS = 1000
+
+# Export format -> (export cache kind, file extension); the PDF export is printable HTML
+FORMATS = {
+    'excel': ('excel', 'xlsx'),
+    'html': ('html', 'html'),
+    'pdf': ('html', 'html')
+}
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class _Items(list):
+    """Snapshot lines with the .all() of the dynamic `items` relationship"""
+
+    def all(self):
+        return list(self)
+
+
+def _render(export_format, snapshot):
+    """Render one PO snapshot to file bytes (runs in a worker process)"""
+    if export_format == 'excel':
+        return POExcelGenerator().generate_excel(snapshot)
+    if export_format == 'pdf':
+        return POPDFGenerator().generate_pdf(snapshot).encode('utf-8')
+    return POHTMLGenerator().generate_html(snapshot).encode('utf-8')
+
+
+def _worker_count():
+    return int(current_app.config.get('EXPORT_BATCH_WORKERS') or os.cpu_count() or 1)
+
+
+def _get_pool():
+    """Process pool shared by all batch exports of this process"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: workers must not inherit the server's threads or DB connections
+            _pool = ProcessPoolExecutor(
+                max_workers=_worker_count(),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def select_po_numbers(po_numbers=None, supplier=None, status=None):
+    """PO numbers to export: the given list (existing ones, in request order) or a filter"""
+    query = db.session.query(PurchaseOrder.purchase_order_no)
+    if po_numbers is not None:
+        po_numbers = list(dict.fromkeys(po_numbers))
+        found = {row[0] for row in query.filter(PurchaseOrder.purchase_order_no.in_(po_numbers))}
+        return [po_no for po_no in po_numbers if po_no in found]
+    if supplier:
+        query = query.filter(PurchaseOrder.supplier_id == supplier)
+    if status:
+        query = query.filter(PurchaseOrder.purchase_status == status)
+    return [row[0] for row in query.order_by(PurchaseOrder.purchase_order_no)]
+
+
+def record_exports(po_numbers, export_person_id):
+    """Record the export of every PO in one transaction; returns the status transitions"""
+    transitions = {}
+    try:
+        for start in range(0, len(po_numbers), SNAPSHOT_CHUNK_SIZE):
+            chunk = po_numbers[start:start + SNAPSHOT_CHUNK_SIZE]
+            for po in PurchaseOrder.query.filter(PurchaseOrder.purchase_order_no.in_(chunk)):
+                transitions[po.purchase_order_no] = po.record_export(export_person_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return transitions
+
+
+def _snapshots(po_numbers):
+    """Yield picklable PO snapshots with their lines, two queries per chunk"""
+    header_columns = [getattr(PurchaseOrder, field) for field in export_cache.HEADER_FIELDS]
+    item_columns = [getattr(PurchaseOrderItem, field) for field in export_cache.ITEM_FIELDS]
+
+    for start in range(0, len(po_numbers), SNAPSHOT_CHUNK_SIZE):
+        chunk = po_numbers[start:start + SNAPSHOT_CHUNK_SIZE]
+        headers = {
+            row.purchase_order_no: row._asdict()
+            for row in db.session.query(*header_columns).filter(PurchaseOrder.purchase_order_no.in_(chunk))
+        }
+        items = {po_no: _Items() for po_no in headers}
+        for row in db.session.query(PurchaseOrderItem.purchase_order_no, *item_columns).filter(
+            PurchaseOrderItem.purchase_order_no.in_(chunk)
+        ).order_by(PurchaseOrderItem.purchase_order_no, PurchaseOrderItem.detail_id):
+            items[row.purchase_order_no].append(
+                SimpleNamespace(**{field: getattr(row, field) for field in export_cache.ITEM_FIELDS})
+            )
+        for po_no in chunk:
+            if po_no in headers:
+                yield SimpleNamespace(**headers[po_no], items=items[po_no])
+
+
+class _ZipStream:
+    """Write-only file object whose written bytes are drained by the response"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(po_numbers, export_format, transitions=None):
+    """Yield a zip of every PO's document, in po_numbers order
+
+    The last entry, manifest.json, lists the files with their export status
+    transition, how many came from the cache, and the throughput in POs/sec.
+    """
+    kind, extension = FORMATS[export_format]
+    window = _worker_count() * 2
+    pool = _get_pool()
+    started = time.perf_counter()
+
+    output = _ZipStream()
+    archive = zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED)
+    pending = deque()
+    files = []
+    cached = 0
+
+    def write_next():
+        po_no, digest, data = pending.popleft()
+        if not isinstance(data, bytes):
+            data = data.result()
+            export_cache.store(digest, kind, data)
+        filename = f'PO_{po_no}.{extension}'
+        archive.writestr(filename, data)
+        files.append({'purchase_order_no': po_no, 'file': filename,
+                      **({'export': transitions[po_no]} if transitions and po_no in transitions else {})})
+        return output.drain()
+
+    try:
+        for snapshot in _snapshots(po_numbers):
+            digest = export_cache.content_hash(snapshot, snapshot.items, kind)
+            data = export_cache.lookup(digest, kind)
+            if data is not None:
+                cached += 1
+            else:
+                data = pool.submit(_render, export_format, snapshot)
+            pending.append((snapshot.purchase_order_no, digest, data))
+            # Keep the pool busy while bounding the rendered documents held in memory
+            while len(pending) > window or (pending and isinstance(pending[0][2], bytes)):
+                yield write_next()
+
+        while pending:
+            yield write_next()
+    finally:
+        # The client went away: drop renders nobody will read
+        for _, _, data in pending:
+            if not isinstance(data, bytes):
+                data.cancel()
+
+    elapsed = time.perf_counter() - started
+    manifest = {
+        'format': export_format,
+        'count': len(files),
+        'rendered': len(files) - cached,
+        'cached': cached,
+        'elapsed_seconds': round(elapsed, 3),
+        'pos_per_second': round(len(files) / elapsed, 2) if elapsed else None,
+        'files': files
+    }
+    archive.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2, default=str))
+    archive.close()
+    logger.info(f"Batch export: {manifest['count']} POs as {export_format} "
+                f"({cached} cached) in {manifest['elapsed_seconds']} s, {manifest['pos_per_second']} POs/sec")
+    yield output.drain()
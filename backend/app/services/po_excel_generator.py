@@ -7,8 +7,8 @@ from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 from openpyxl.drawing.image import Image
 import io
-import os
-from PIL import Image as PILImage
+
+from .po_assets import excel_logo
 
 
 class POExcelGenerator:
@@ -49,38 +49,20 @@ class POExcelGenerator:
         
         current_row = 1
         
-        # Try to add logo
-        logo_paths = [
-            os.path.join(os.path.dirname(__file__), '..', '..', '..', 'docs', 'TSIC_LOGO.png'),
-            'docs/TSIC_LOGO.png'
-        ]
-        
+        # Try to add logo (resized once per process)
         logo_added = False
-        for logo_path in logo_paths:
-            if os.path.exists(logo_path):
-                try:
-                    # Resize logo to fit
-                    pil_img = PILImage.open(logo_path)
-                    # Scale to 270px width (Excel uses 96 DPI)
-                    width_px = 270
-                    height_px = int(pil_img.height * (width_px / pil_img.width))
-                    pil_img = pil_img.resize((width_px, height_px), PILImage.Resampling.LANCZOS)
-                    
-                    # Save to memory
-                    img_buffer = io.BytesIO()
-                    pil_img.save(img_buffer, format='PNG')
-                    img_buffer.seek(0)
-                    
-                    # Add to Excel
-                    img = Image(img_buffer)
-                    img.width = width_px
-                    img.height = height_px
-                    ws.add_image(img, 'A1')
-                    logo_added = True
-                    current_row = 5  # Skip rows for logo
-                    break
-                except Exception as e:
-                    print(f"Error adding logo: {e}")
+        logo = excel_logo()
+        if logo:
+            try:
+                png_bytes, width_px, height_px = logo
+                img = Image(io.BytesIO(png_bytes))
+                img.width = width_px
+                img.height = height_px
+                ws.add_image(img, 'A1')
+                logo_added = True
+                current_row = 5  # Skip rows for logo
+            except Exception as e:
+                print(f"Error adding logo: {e}")
         
         if not logo_added:
             # Add text logo
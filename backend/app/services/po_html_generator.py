@@ -5,30 +5,16 @@ Purchase Order HTML Generator
 from datetime import datetime
 from typing import Dict, Any, Optional
 from decimal import Decimal
-import base64
-import os
+
+from .po_assets import logo_base64
 
 
 class POHTMLGenerator:
     """Purchase Order HTML Generator"""
     
     def get_logo_base64(self):
-        """Get TSIC logo as base64 string"""
-        # Try multiple possible locations for the logo
-        possible_paths = [
-            os.path.join(os.path.dirname(__file__), '..', '..', '..', 'docs', 'TSIC_LOGO.png'),
-            os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'docs', 'TSIC_LOGO.png')),
-            'docs/TSIC_LOGO.png'
-        ]
-        
-        for logo_path in possible_paths:
-            try:
-                if os.path.exists(logo_path):
-                    with open(logo_path, 'rb') as f:
-                        return base64.b64encode(f.read()).decode('utf-8')
-            except Exception as e:
-                print(f"Error reading logo from {logo_path}: {e}")
-        return None
+        """Get TSIC logo as base64 string (read once per process)"""
+        return logo_base64()
     
     def generate_html(self, purchase_order) -> str:
         """Generate HTML for purchase order"""
@@ -0,0 +1,51 @@
+"""
+Requisition status consistency check
+Finds submitted requisitions whose items have all been reviewed (the status
+update after review was missed) and optionally moves them to 'reviewed'.
+Shared by the scan endpoint, the CLI and the scheduled maintenance task.
+"""
+
+import logging
+import time
+from datetime import datetime
+
+from app import db
+from app.models.request_order import RequestOrder
+
+logger = logging.getLogger(__name__)
+
+
+def run_check(fix=False):
+    """Scan for status problems and optionally fix them in one statement.
+
+    Returns a report with the problems found, the number of orders fixed
+    and how long the scan and the fix took. A fix is committed here.
+    """
+    started = time.perf_counter()
+    problems = RequestOrder.scan_status_problems()
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    fixed = 0
+    fix_ms = 0.0
+    if fix and problems:
+        fix_started = time.perf_counter()
+        try:
+            fixed = RequestOrder.fix_status_problems()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        fix_ms = (time.perf_counter() - fix_started) * 1000
+
+    report = {
+        'checked_at': datetime.utcnow().isoformat(),
+        'problem_count': len(problems),
+        'problems': problems,
+        'fixed': fixed,
+        'scan_ms': round(scan_ms, 2),
+        'fix_ms': round(fix_ms, 2),
+        'duration_ms': round(scan_ms + fix_ms, 2)
+    }
+    logger.info(f"Status consistency check: {report['problem_count']} problems, {fixed} fixed "
+                f"in {report['duration_ms']} ms")
+    return report
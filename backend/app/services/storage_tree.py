@@ -0,0 +1,135 @@
+"""
+Storage Hierarchy Tree Cache
+快取儲位樹 (Zone -> Shelf -> Floor -> Position)
+
+The tree is cached one zone (area_code) per key, so a write that touches a
+single location only rebuilds that zone's subtree on the next read. Without
+Redis the zones are cached per worker and invalidation only reaches the
+worker that made the write, so they expire after LOCAL_FALLBACK_TIMEOUT
+instead of TREE_TIMEOUT.
+"""
+import hashlib
+import json
+
+from app import db
+from app.models.storage import Storage
+from app.utils.cache import cache_get, cache_set, shared_timeout, CACHE_CONFIGS, ERPCache
+
+ZONES_KEY = 'tree:zones'
+TREE_TIMEOUT = CACHE_CONFIGS['storage']['timeout']
+
+
+def _zone_key(area_code):
+    return f'tree:zone:{area_code}'
+
+
+def _etag(payload):
+    data = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+
+def _build_zone(area_code, storages, positions):
+    """Build one zone subtree from storages ordered by shelf/floor/position"""
+    shelves = {}
+    for storage, position in zip(storages, positions):
+        shelf = shelves.setdefault(storage.shelf_code, {
+            'shelf_code': storage.shelf_code,
+            'floors': {}
+        })
+        floor = shelf['floors'].setdefault(storage.floor_level, {
+            'floor_level': storage.floor_level,
+            'positions': []
+        })
+        floor['positions'].append(position)
+
+    shelf_list = []
+    for shelf in shelves.values():
+        shelf['floors'] = sorted(shelf['floors'].values(), key=lambda x: x['floor_level'])
+        shelf_list.append(shelf)
+
+    return {
+        'area_code': area_code,
+        'shelves': sorted(shelf_list, key=lambda x: x['shelf_code'])
+    }
+
+
+def _get_zone_codes():
+    zones = cache_get('storage', ZONES_KEY)
+    if zones is None:
+        rows = db.session.query(Storage.area_code).filter(
+            Storage.is_active == True
+        ).distinct().all()
+        zones = sorted(row.area_code for row in rows)
+        cache_set('storage', ZONES_KEY, zones, shared_timeout(TREE_TIMEOUT))
+    return zones
+
+
+def _load_zones(area_codes, all_zones=False):
+    """Build the given zones with one storage query and one count query"""
+    query = Storage.query.filter_by(is_active=True)
+    if not all_zones:
+        query = query.filter(Storage.area_code.in_(area_codes))
+    storages = query.order_by(
+        Storage.area_code, Storage.shelf_code, Storage.floor_level,
+        Storage.front_back_position, Storage.left_middle_right_position
+    ).all()
+
+    positions = Storage.serialize_many(storages, all_locations=all_zones)
+
+    grouped = {}
+    for storage, position in zip(storages, positions):
+        zone_storages, zone_positions = grouped.setdefault(storage.area_code, ([], []))
+        zone_storages.append(storage)
+        zone_positions.append(position)
+
+    timeout = shared_timeout(TREE_TIMEOUT)
+    entries = {}
+    for area_code in area_codes:
+        zone_storages, zone_positions = grouped.get(area_code, ([], []))
+        data = _build_zone(area_code, zone_storages, zone_positions)
+        entry = {'etag': _etag(data), 'data': data}
+        cache_set('storage', _zone_key(area_code), entry, timeout)
+        entries[area_code] = entry
+    return entries
+
+
+def get_storage_tree():
+    """Return (areas, etag) for the full storage tree.
+
+    Cached zones are reused as-is; only missing or invalidated zones are
+    rebuilt from the database.
+    """
+    area_codes = _get_zone_codes()
+
+    entries = {}
+    missing = []
+    for area_code in area_codes:
+        entry = cache_get('storage', _zone_key(area_code))
+        if entry is None:
+            missing.append(area_code)
+        else:
+            entries[area_code] = entry
+
+    if missing:
+        entries.update(_load_zones(missing, all_zones=len(missing) == len(area_codes)))
+
+    areas = [entries[area_code]['data'] for area_code in area_codes]
+    etag = hashlib.sha1(
+        ':'.join(entries[area_code]['etag'] for area_code in area_codes).encode('utf-8')
+    ).hexdigest()
+    return areas, etag
+
+
+def invalidate_zone(area_code):
+    """Drop one zone subtree (and the zone list, in case the zone is new)"""
+    if area_code:
+        ERPCache.invalidate_storage_zone(area_code)
+
+
+def invalidate_location(storage_id):
+    """Drop the zone subtree containing the given storage location"""
+    row = db.session.query(Storage.area_code).filter(
+        Storage.storage_id == storage_id
+    ).first()
+    if row:
+        invalidate_zone(row.area_code)
@@ -5,17 +5,83 @@ Architecture Lead: Winston
 """
 
 import redis
-import json
 import logging
+import threading
+import time
+import math
+import random
+import uuid
+import fnmatch
+from collections import OrderedDict
 from functools import wraps
 from typing import Any, Optional, Union, Dict, List
 from datetime import datetime, timedelta
 from flask import current_app
-import pickle
 import hashlib
 
+from cache.codec import CacheCodec, UndecodablePayload, decode_legacy
+
 logger = logging.getLogger(__name__)
 
+# Marks values stored by get_or_compute together with their freshness metadata
+ENTRY_MARKER = '__cache_entry__'
+
+# Delete the recompute lock only if this caller still holds it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class LocalLRUCache:
+    """Thread-safe in-process LRU cache with per-entry TTL.
+    
+    Used by CacheManager when Redis is unavailable. Entries live only in the
+    current worker process, so invalidation does not reach other workers.
+    """
+    
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, bytes)
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return data
+    
+    def set(self, key: str, data: Any, timeout: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+    
+    def delete_pattern(self, pattern: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+    
+    def __len__(self):
+        return len(self._entries)
+
+
 class CacheManager:
     """Advanced Redis cache manager with multiple strategies"""
     
@@ -29,6 +95,26 @@ class CacheManager:
         
         self.redis_client = None
         self.default_timeout = 300  # 5 minutes
+        # In-process fallback so hot keys are still cached without Redis
+        self.local_cache = LocalLRUCache()
+        self.codec = CacheCodec()
+        self.local_tags = {}  # tag -> cache keys, for the in-process fallback
+        self.local_locks = {}  # cache key -> recompute lock, for the in-process fallback
+        self._local_guard = threading.Lock()
+
+        # Single-flight recomputation (get_or_compute)
+        self.lock_timeout = 30  # seconds a recompute may hold the lock
+        self.lock_wait = 10  # seconds a caller waits for another caller's recompute
+        self.early_refresh_beta = 1.0  # > 1 refreshes earlier, 0 disables early refresh
+        self.tag_timeout = 86400  # tag sets outlive the longest cache timeout
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'recomputes': 0,
+            'early_refreshes': 0,
+            'stale_served': 0,
+            'lock_waits': 0
+        }
         self.connect()
     
     def connect(self):
@@ -62,47 +148,55 @@ class CacheManager:
         except:
             return False
     
-    def _serialize(self, data: Any) -> bytes:
-        """Serialize data for storage"""
-        try:
-            # Use pickle for complex objects, JSON for simple ones
-            if isinstance(data, (dict, list, str, int, float, bool)) or data is None:
-                return json.dumps(data, default=str).encode('utf-8')
-            else:
-                return pickle.dumps(data)
-        except Exception as e:
-            logger.error(f"Serialization error: {e}")
-            return pickle.dumps(data)
+    def _serialize(self, data: Any, namespace: str = '', pickled: bool = False) -> bytes:
+        """Serialize data for storage (msgpack/orjson/JSON, pickle for complex objects)"""
+        return self.codec.encode(data, namespace, pickled)
     
-    def _deserialize(self, data: bytes) -> Any:
+    def _deserialize(self, data: bytes, namespace: str = '') -> Any:
         """Deserialize data from storage"""
+        if not self.codec.is_encoded(data):
+            # Written before the codec
+            return decode_legacy(data)
         try:
-            # Try JSON first (most common)
-            return json.loads(data.decode('utf-8'))
-        except (UnicodeDecodeError, json.JSONDecodeError):
-            try:
-                # Fall back to pickle
-                return pickle.loads(data)
-            except Exception as e:
-                logger.error(f"Deserialization error: {e}")
-                return None
+            return self.codec.decode(data, namespace)
+        except UndecodablePayload as e:
+            # Another codec version; treat as a miss until it is rewritten
+            logger.debug(f"Undecodable cache payload: {e}")
+            return None
+    
+    def _namespace_of(self, cache_key: str) -> str:
+        return cache_key.split(':', 2)[1] if cache_key.count(':') >= 2 else ''
     
     def _generate_key(self, namespace: str, key: str) -> str:
         """Generate cache key with namespace"""
         return f"erp:{namespace}:{key}"
     
+    def _is_local_cacheable(self, value: Any) -> bool:
+        """Only plain JSON payloads are kept in the in-process fallback"""
+        return isinstance(value, (dict, list, str, int, float, bool))
+    
     def get(self, namespace: str, key: str) -> Any:
         """Get value from cache"""
+        cache_key = self._generate_key(namespace, key)
+        
+        data = self._read(cache_key)
+        if self._is_entry(data):
+            return data['value']
+        return data
+    
+    def _read(self, cache_key: str) -> Any:
+        """Stored value of cache_key, or None"""
+        namespace = self._namespace_of(cache_key)
         if not self.is_available():
-            return None
+            data = self.local_cache.get(cache_key)
+            return self._deserialize(data, namespace) if data is not None else None
         
         try:
-            cache_key = self._generate_key(namespace, key)
             data = self.redis_client.get(cache_key)
             
             if data is not None:
                 logger.debug(f"Cache hit: {cache_key}")
-                return self._deserialize(data)
+                return self._deserialize(data, namespace)
             else:
                 logger.debug(f"Cache miss: {cache_key}")
                 return None
@@ -111,16 +205,49 @@ class CacheManager:
             logger.error(f"Cache get error: {e}")
             return None
     
-    def set(self, namespace: str, key: str, value: Any, timeout: int = None) -> bool:
-        """Set value in cache"""
-        if not self.is_available():
+    def set(self, namespace: str, key: str, value: Any, timeout: int = None, tags: List[str] = None) -> bool:
+        """Set value in cache; tagged keys can be dropped together with invalidate_tags"""
+        cache_key = self._generate_key(namespace, key)
+        timeout = timeout or self.default_timeout
+        
+        if not self._write(cache_key, value, timeout, self._serialize(value, namespace)):
             return False
+        if tags:
+            self._tag(cache_key, tags)
+        return True
+    
+    def add(self, namespace: str, key: str, value: Any, timeout: int = None) -> bool:
+        """Set value only if key is absent (SET NX); False if another caller holds it
+
+        Without Redis the check is against this worker's fallback cache only.
+        On a Redis error the value is not stored and True is returned, so
+        callers proceed as they would without the reservation.
+        """
+        cache_key = self._generate_key(namespace, key)
+        timeout = timeout or self.default_timeout
+        serialized_data = self._serialize(value, namespace)
+
+        if not self.is_available():
+            with self._local_guard:
+                if self.local_cache.get(cache_key) is not None:
+                    return False
+                self.local_cache.set(cache_key, serialized_data, timeout)
+                return True
+
+        try:
+            return bool(self.redis_client.set(cache_key, serialized_data, nx=True, ex=timeout))
+        except Exception as e:
+            logger.error(f"Cache add error: {e}")
+            return True
+
+    def _write(self, cache_key: str, value: Any, timeout: int, serialized_data: bytes) -> bool:
+        if not self.is_available():
+            if not self._is_local_cacheable(value):
+                return False
+            self.local_cache.set(cache_key, serialized_data, timeout)
+            return True
         
         try:
-            cache_key = self._generate_key(namespace, key)
-            serialized_data = self._serialize(value)
-            timeout = timeout or self.default_timeout
-            
             result = self.redis_client.setex(cache_key, timeout, serialized_data)
             
             if result:
@@ -132,13 +259,174 @@ class CacheManager:
         
         return False
     
+    def _tag(self, cache_key: str, tags: List[str]):
+        """Record cache_key in the set of each tag"""
+        if not self.is_available():
+            with self._local_guard:
+                for tag in tags:
+                    self.local_tags.setdefault(tag, set()).add(cache_key)
+            return
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for tag in tags:
+                tag_key = f"erp:tag:{tag}"
+                pipe.sadd(tag_key, cache_key)
+                pipe.expire(tag_key, self.tag_timeout)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Cache tag error: {e}")
+    
+    def invalidate_tags(self, *tags: str) -> int:
+        """Delete every key stored with one of the tags"""
+        with self._local_guard:
+            local_keys = set().union(*(self.local_tags.pop(tag, set()) for tag in tags))
+        local_deleted = sum(1 for key in local_keys if self.local_cache.delete(key))
+        
+        if not self.is_available():
+            return local_deleted
+        
+        try:
+            tag_keys = [f"erp:tag:{tag}" for tag in tags]
+            keys = set().union(*(self.redis_client.smembers(tag_key) for tag_key in tag_keys))
+            deleted = self.redis_client.delete(*keys) if keys else 0
+            self.redis_client.delete(*tag_keys)
+            logger.info(f"Cache invalidation: {deleted} keys deleted for tags {list(tags)}")
+            return deleted
+        except Exception as e:
+            logger.error(f"Cache tag invalidation error: {e}")
+        
+        return local_deleted
+    
+    def _is_entry(self, data: Any) -> bool:
+        return isinstance(data, dict) and data.get(ENTRY_MARKER) == 1
+    
+    def _acquire_lock(self, cache_key: str):
+        """Handle of the recompute lock of cache_key, or None if another caller holds it"""
+        if not self.is_available():
+            with self._local_guard:
+                lock = self.local_locks.setdefault(cache_key, threading.Lock())
+            return ('local', lock) if lock.acquire(blocking=False) else None
+        
+        token = uuid.uuid4().hex
+        try:
+            if self.redis_client.set(f"erp:lock:{cache_key}", token, nx=True, ex=self.lock_timeout):
+                return ('redis', token)
+            return None
+        except Exception as e:
+            # Without the lock every caller recomputes, as before
+            logger.error(f"Cache lock error: {e}")
+            return ('none', None)
+    
+    def _release_lock(self, cache_key: str, handle):
+        kind, lock = handle
+        if kind == 'local':
+            lock.release()
+        elif kind == 'redis':
+            lock_key = f"erp:lock:{cache_key}"
+            try:
+                self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, lock)
+            except redis.ResponseError:
+                # Scripting disabled: check and delete non-atomically rather than hold the lock until it expires
+                try:
+                    if self.redis_client.get(lock_key) == lock.encode():
+                        self.redis_client.delete(lock_key)
+                except Exception as e:
+                    logger.error(f"Cache unlock error: {e}")
+            except Exception as e:
+                logger.error(f"Cache unlock error: {e}")
+    
+    def _recompute(self, cache_key: str, compute, timeout: int, stale_ttl: int, handle, tags=None) -> Any:
+        """Run compute() while holding the lock and store the result with its cost"""
+        try:
+            started = time.perf_counter()
+            value = compute()
+            entry = {
+                ENTRY_MARKER: 1,
+                'value': value,
+                'fresh_until': time.time() + timeout,
+                'delta': time.perf_counter() - started
+            }
+            # Plain data is stored compactly; anything else is pickled whole
+            serialized = self._serialize(entry, self._namespace_of(cache_key),
+                                         pickled=not (self._is_local_cacheable(value) or value is None))
+            if self._write(cache_key, entry, timeout + stale_ttl, serialized) and tags:
+                self._tag(cache_key, tags)
+            self.stats['recomputes'] += 1
+            return value
+        finally:
+            self._release_lock(cache_key, handle)
+    
+    def get_or_compute(self, namespace: str, key: str, compute, timeout: int = None, stale_ttl: int = 0,
+                       tags: List[str] = None) -> Any:
+        """Cached value of compute(), recomputed by one caller at a time
+
+        A value is fresh for `timeout` seconds and may then be served stale
+        for `stale_ttl` more seconds while the one caller holding the
+        recompute lock refreshes it. Before expiry, callers refresh early
+        with a probability that grows as expiry nears and with the cost of
+        compute() (XFetch), so a hot key is usually renewed before anyone
+        misses it. On a cold miss the other callers wait for the lock
+        holder's result instead of running compute() themselves. Tags are
+        recorded for invalidate_tags.
+        """
+        cache_key = self._generate_key(namespace, key)
+        timeout = timeout or self.default_timeout
+        
+        data = self._read(cache_key)
+        if data is not None and not self._is_entry(data):
+            # Stored by set(); no freshness metadata
+            self.stats['hits'] += 1
+            return data
+        
+        if data is not None:
+            remaining = data['fresh_until'] - time.time()
+            early = remaining > 0 and \
+                data['delta'] * self.early_refresh_beta * -math.log(1.0 - random.random()) >= remaining
+            if remaining > 0 and not early:
+                self.stats['hits'] += 1
+                return data['value']
+            
+            handle = self._acquire_lock(cache_key)
+            if handle is None:
+                # Another caller is already refreshing it
+                self.stats['hits' if remaining > 0 else 'stale_served'] += 1
+                return data['value']
+            self.stats['early_refreshes' if remaining > 0 else 'misses'] += 1
+            return self._recompute(cache_key, compute, timeout, stale_ttl, handle, tags)
+        
+        self.stats['misses'] += 1
+        deadline = time.monotonic() + self.lock_wait
+        delay = 0.01
+        while True:
+            handle = self._acquire_lock(cache_key)
+            if handle is not None:
+                # The previous holder may have stored a value since our read
+                data = self._read(cache_key)
+                if self._is_entry(data) and data['fresh_until'] > time.time():
+                    self._release_lock(cache_key, handle)
+                    return data['value']
+                return self._recompute(cache_key, compute, timeout, stale_ttl, handle, tags)
+            
+            self.stats['lock_waits'] += 1
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            data = self._read(cache_key)
+            if self._is_entry(data):
+                return data['value']
+            if time.monotonic() >= deadline:
+                logger.warning(f"Timed out waiting for the recompute of {cache_key}")
+                return compute()
+    
     def delete(self, namespace: str, key: str) -> bool:
         """Delete specific key from cache"""
+        cache_key = self._generate_key(namespace, key)
+        local_deleted = self.local_cache.delete(cache_key)
+        
         if not self.is_available():
-            return False
+            return local_deleted
         
         try:
-            cache_key = self._generate_key(namespace, key)
             result = self.redis_client.delete(cache_key)
             
             if result:
@@ -148,29 +436,40 @@ class CacheManager:
         except Exception as e:
             logger.error(f"Cache delete error: {e}")
         
-        return False
+        return local_deleted
     
     def invalidate_pattern(self, pattern: str) -> int:
         """Invalidate multiple keys matching pattern"""
+        local_deleted = self.local_cache.delete_pattern(f"erp:{pattern}")
+        
         if not self.is_available():
-            return 0
+            return local_deleted
         
         try:
-            keys = self.redis_client.keys(f"erp:{pattern}")
-            if keys:
-                deleted = self.redis_client.delete(*keys)
+            # Incremental SCAN in batches; KEYS would block Redis for the whole keyspace walk
+            deleted = 0
+            batch = []
+            for key in self.redis_client.scan_iter(match=f"erp:{pattern}", count=1000):
+                batch.append(key)
+                if len(batch) >= 500:
+                    deleted += self.redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += self.redis_client.unlink(*batch)
+            if deleted:
                 logger.info(f"Cache invalidation: {deleted} keys deleted for pattern {pattern}")
-                return deleted
+            return deleted
                 
         except Exception as e:
             logger.error(f"Cache pattern invalidation error: {e}")
         
-        return 0
+        return local_deleted
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
         if not self.is_available():
-            return {'available': False}
+            return {'available': False, 'local_cache_entries': len(self.local_cache), 'compute': dict(self.stats),
+                    'codec': self.codec.get_stats()}
         
         try:
             info = self.redis_client.info()
@@ -183,7 +482,9 @@ class CacheManager:
                 'keyspace_hits': info.get('keyspace_hits', 0),
                 'keyspace_misses': info.get('keyspace_misses', 0),
                 'hit_rate': self._calculate_hit_rate(info),
-                'total_keys': self._count_erp_keys()
+                'total_keys': self._count_erp_keys(),
+                'compute': dict(self.stats),
+                'codec': self.codec.get_stats()
             }
             
         except Exception as e:
@@ -203,9 +504,12 @@ class CacheManager:
     
     def _count_erp_keys(self) -> int:
         """Count ERP-related keys"""
+        return self.count_keys('erp:*')
+    
+    def count_keys(self, match: str) -> int:
+        """Count keys matching a pattern with an incremental SCAN"""
         try:
-            keys = self.redis_client.keys('erp:*')
-            return len(keys)
+            return sum(1 for _ in self.redis_client.scan_iter(match=match, count=1000))
         except:
             return 0
 
@@ -232,7 +536,8 @@ CACHE_CONFIGS = {
     },
     'dashboard_stats': {
         'timeout': 180,  # 3 minutes
-        'key_prefix': 'stats'
+        'key_prefix': 'stats',
+        'stale_ttl': 60  # served while one caller recomputes
     },
     'projects': {
         'timeout': 900,  # 15 minutes
@@ -245,10 +550,15 @@ CACHE_CONFIGS = {
     'suppliers': {
         'timeout': 1800,  # 30 minutes
         'key_prefix': 'suppliers'
+    },
+    'idempotency': {
+        'timeout': 86400,  # 24 hours
+        'key_prefix': 'idempotency'
     }
 }
 
-def cache_result(cache_type: str = 'default', key_func: callable = None, timeout: int = None):
+def cache_result(cache_type: str = 'default', key_func: callable = None, timeout: int = None,
+                 stale_ttl: int = None, tags: List[str] = None):
     """
     Decorator for caching function results
     
@@ -256,6 +566,9 @@ def cache_result(cache_type: str = 'default', key_func: callable = None, timeout
         cache_type: Type of cache configuration to use
         key_func: Function to generate cache key (receives function args)
         timeout: Override default timeout
+        stale_ttl: Seconds an expired result may still be served while one
+            caller recomputes it (default from the cache configuration)
+        tags: Tags for invalidate_tags
     """
     def decorator(func):
         @wraps(func)
@@ -274,18 +587,13 @@ def cache_result(cache_type: str = 'default', key_func: callable = None, timeout
                 cache_key = ':'.join(key_parts)
             
             namespace = config['key_prefix']
-            
-            # Try to get from cache first
-            cached_result = cache_manager.get(namespace, cache_key)
-            if cached_result is not None:
-                return cached_result
-            
-            # Execute function and cache result
-            result = func(*args, **kwargs)
-            
-            # Cache the result
             cache_timeout = timeout or config['timeout']
-            cache_manager.set(namespace, cache_key, result, cache_timeout)
+            
+            # Only one caller runs func on a miss; the others wait for or reuse its result
+            result = cache_manager.get_or_compute(
+                namespace, cache_key, lambda: func(*args, **kwargs), cache_timeout,
+                config.get('stale_ttl', 0) if stale_ttl is None else stale_ttl, tags
+            )
             
             return result
         
@@ -296,10 +604,18 @@ def invalidate_cache(pattern: str):
     """Invalidate cache entries matching pattern"""
     return cache_manager.invalidate_pattern(pattern)
 
+def invalidate_cache_tags(*tags: str):
+    """Invalidate cache entries stored with any of the tags"""
+    return cache_manager.invalidate_tags(*tags)
+
 def cache_set(namespace: str, key: str, value: Any, timeout: int = None):
     """Set cache value directly"""
     return cache_manager.set(namespace, key, value, timeout)
 
+def cache_add(namespace: str, key: str, value: Any, timeout: int = None):
+    """Set cache value only if the key is absent"""
+    return cache_manager.add(namespace, key, value, timeout)
+
 def cache_get(namespace: str, key: str):
     """Get cache value directly"""
     return cache_manager.get(namespace, key)
@@ -308,6 +624,21 @@ def cache_delete(namespace: str, key: str):
     """Delete cache value directly"""
     return cache_manager.delete(namespace, key)
 
+# Without Redis every worker caches in its own LocalLRUCache and a delete only
+# reaches the worker that made it, so data that writes invalidate is kept
+# this long at most and other workers catch up within it
+LOCAL_FALLBACK_TIMEOUT = 15
+
+def shared_timeout(timeout: int) -> int:
+    """Timeout for an entry that writes invalidate; capped without Redis"""
+    if cache_manager.is_available():
+        return timeout
+    return min(timeout, LOCAL_FALLBACK_TIMEOUT)
+
+def cache_get_or_compute(namespace: str, key: str, compute: callable, timeout: int = None, stale_ttl: int = 0):
+    """Get cache value, computing it once across concurrent callers on a miss"""
+    return cache_manager.get_or_compute(namespace, key, compute, timeout, stale_ttl)
+
 # Specific cache helpers for common ERP operations
 class ERPCache:
     """ERP-specific cache operations"""
@@ -332,6 +663,54 @@ class ERPCache:
         """Get cached dashboard stats"""
         return cache_get('dashboard_stats', 'main')
     
+    @staticmethod
+    def cache_billing_breakdown(rows: List[Dict], timeout: int = 180):
+        """Cache the per-billing-status PO aggregate behind the accounting summaries"""
+        return cache_set('dashboard_stats', 'billing:breakdown', rows, timeout)
+    
+    @staticmethod
+    def get_billing_breakdown() -> Optional[List[Dict]]:
+        """Get the cached billing aggregate"""
+        return cache_get('dashboard_stats', 'billing:breakdown')
+    
+    @staticmethod
+    def billing_breakdown(compute: callable, timeout: int = 180) -> List[Dict]:
+        """Billing aggregate from cache; when it expires one caller recomputes it while others get the last value
+
+        Without Redis the aggregate is per worker and invalidate_billing_summary
+        only reaches one of them, so it is kept for LOCAL_FALLBACK_TIMEOUT and
+        never served stale.
+        """
+        if cache_manager.is_available():
+            return cache_get_or_compute('dashboard_stats', 'billing:breakdown', compute, timeout, stale_ttl=60)
+        return cache_get_or_compute('dashboard_stats', 'billing:breakdown', compute,
+                                    min(timeout, LOCAL_FALLBACK_TIMEOUT))
+    
+    @staticmethod
+    def invalidate_billing_summary():
+        """Invalidate accounting summaries after a PO's billing, payment or purchase status changed"""
+        cache_delete('dashboard_stats', 'billing:breakdown')
+    
+    @staticmethod
+    def cache_idempotent_response(key: str, response: Dict, timeout: int = 86400):
+        """Remember the response of a request sent with an Idempotency-Key"""
+        return cache_set('idempotency', key, response, timeout)
+    
+    @staticmethod
+    def reserve_idempotency_key(key: str, marker: Dict, timeout: int) -> bool:
+        """Claim an Idempotency-Key for a request in progress; False if already claimed"""
+        return cache_add('idempotency', key, marker, timeout)
+
+    @staticmethod
+    def release_idempotency_key(key: str):
+        """Drop the claim of a request that failed, so a retry runs again"""
+        return cache_delete('idempotency', key)
+
+    @staticmethod
+    def get_idempotent_response(key: str) -> Optional[Dict]:
+        """Get the stored response for an Idempotency-Key"""
+        return cache_get('idempotency', key)
+    
     @staticmethod
     def cache_supplier_list(suppliers: List[Dict], timeout: int = 1800):
         """Cache supplier list"""
@@ -352,6 +731,12 @@ class ERPCache:
         """Get cached storage tree"""
         return cache_get('storage', 'tree:hierarchy')
     
+    @staticmethod
+    def invalidate_storage_zone(area_code: str):
+        """Invalidate one zone subtree of the storage hierarchy cache"""
+        cache_delete('storage', f'tree:zone:{area_code}')
+        cache_delete('storage', 'tree:zones')
+    
     @staticmethod
     def invalidate_project_cache(project_id: int = None):
         """Invalidate project-related cache"""
@@ -473,9 +858,8 @@ class CacheMaintenance:
         # Analyze cache types
         for cache_type, config in CACHE_CONFIGS.items():
             try:
-                keys = cache_manager.redis_client.keys(f'erp:{config["key_prefix"]}:*')
                 report['cache_types'][cache_type] = {
-                    'key_count': len(keys),
+                    'key_count': cache_manager.count_keys(f'erp:{config["key_prefix"]}:*'),
                     'timeout': config['timeout']
                 }
             except:
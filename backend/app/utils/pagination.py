@@ -4,9 +4,21 @@ Provides consistent pagination across all API endpoints
 Architecture Lead: Winston
 """
 
-from typing import Dict, Any, List
+import base64
+import json
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Query
-from sqlalchemy import func
+from sqlalchemy import func, and_, or_, select
+
+# Total modes for cursor pagination: skip the count, use the planner's row
+# estimate (PostgreSQL; exact elsewhere) or run an exact COUNT
+CURSOR_TOTAL_MODES = ('none', 'estimate', 'exact')
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+    pass
 
 
 def paginate_query(query: Query, page: int = 1, page_size: int = 20, max_page_size: int = 100) -> Dict[str, Any]:
@@ -254,4 +266,217 @@ def quick_paginate(query: Query, request_args: Dict[str, Any], data_formatter=No
     """
     params = get_pagination_params(request_args)
     paginated_result = paginate_query(query, params['page'], params['page_size'])
-    return format_pagination_response(paginated_result, data_formatter)
\ No newline at end of file
+    return format_pagination_response(paginated_result, data_formatter)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if '$dt' in value:
+            return datetime.fromisoformat(value['$dt'])
+        if '$d' in value:
+            return date.fromisoformat(value['$d'])
+        raise ValueError('Unsupported cursor value')
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort-key values of the last row on a page as an opaque cursor"""
+    payload = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, key_count: int) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor
+    
+    Raises:
+        InvalidCursorError: If the cursor is malformed or does not match the sort keys
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != key_count:
+            raise InvalidCursorError('Invalid cursor: sort keys do not match')
+        return [_decode_value(value) for value in values]
+    except InvalidCursorError:
+        raise
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f'Invalid cursor: {e}')
+
+
+def get_cursor_params(request_args: Dict[str, Any], default_page_size: int = 20,
+                      default_total: str = 'estimate') -> Optional[Dict[str, Any]]:
+    """
+    Extract cursor pagination parameters, or None when the request uses pages
+    
+    Cursor mode is opt-in: `?cursor=` (empty) starts at the first page and each
+    response carries the `next_cursor` for the following one. `?total=` picks
+    one of CURSOR_TOTAL_MODES.
+    """
+    if 'cursor' not in request_args:
+        return None
+    
+    params = get_pagination_params(request_args, default_page_size)
+    total = request_args.get('total', default_total)
+    return {
+        'cursor': request_args.get('cursor') or None,
+        'page_size': params['page_size'],
+        'total': total if total in CURSOR_TOTAL_MODES else default_total
+    }
+
+
+def keyset_condition(keys: Sequence[Tuple[Any, bool]], values: Sequence[Any]):
+    """
+    Build the "after this row" filter for ORM keyset pagination
+    
+    Args:
+        keys: (column expression, descending) pairs, unique as a whole and non-null
+        values: Sort-key values of the last row on the previous page
+    """
+    clauses = []
+    for index, (expression, descending) in enumerate(keys):
+        equal = [keys[i][0] == values[i] for i in range(index)]
+        after = expression < values[index] if descending else expression > values[index]
+        clauses.append(and_(*equal, after))
+    return or_(*clauses)
+
+
+def keyset_sql(keys: Sequence[Tuple[str, bool]], values: Sequence[Any],
+               param_prefix: str = 'cursor') -> Tuple[str, Dict[str, Any]]:
+    """
+    Raw SQL variant of keyset_condition
+    
+    Returns:
+        (SQL fragment, bind parameters) to AND into the WHERE clause
+    """
+    params = {f'{param_prefix}_{index}': value for index, value in enumerate(values)}
+    clauses = []
+    for index, (expression, descending) in enumerate(keys):
+        terms = [f"{keys[i][0]} = :{param_prefix}_{i}" for i in range(index)]
+        terms.append(f"{expression} {'<' if descending else '>'} :{param_prefix}_{index}")
+        clauses.append('(' + ' AND '.join(terms) + ')')
+    return '(' + ' OR '.join(clauses) + ')', params
+
+
+def order_by_sql(keys: Sequence[Tuple[str, bool]]) -> str:
+    """ORDER BY list matching keyset_sql"""
+    return ', '.join(f"{expression} {'DESC' if descending else 'ASC'}" for expression, descending in keys)
+
+
+def keyset_columns_sql(keys: Sequence[Tuple[str, bool]]) -> str:
+    """SELECT-list entries exposing the sort-key values as cursor_0, cursor_1, ..."""
+    return ', '.join(f"{expression} AS cursor_{index}" for index, (expression, _) in enumerate(keys))
+
+
+def row_cursor(row, key_count: int) -> str:
+    """Cursor pointing after a raw SQL row selected with keyset_columns_sql"""
+    return encode_cursor([row._mapping[f'cursor_{index}'] for index in range(key_count)])
+
+
+def estimate_count(session, statement, params: Dict[str, Any] = None) -> Optional[int]:
+    """
+    Row estimate from the PostgreSQL planner, without running the query
+    
+    Returns None on other databases.
+    """
+    bind = session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return None
+    
+    compiled = statement.compile(dialect=bind.dialect)
+    bind_params = dict(compiled.params)
+    bind_params.update(params or {})
+    plan = session.connection().exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', bind_params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_rows(session, count_statement, mode: str, params: Dict[str, Any] = None,
+               estimate_statement=None) -> Tuple[Optional[int], bool]:
+    """
+    Total for a cursor page according to mode
+    
+    Args:
+        count_statement: Statement returning the exact COUNT
+        estimate_statement: Row query to estimate (defaults to count_statement)
+        
+    Returns:
+        (total or None, whether it is an estimate)
+    """
+    if mode == 'none':
+        return None, False
+    if mode == 'estimate':
+        estimate = estimate_count(session, estimate_statement if estimate_statement is not None else count_statement,
+                                  params)
+        if estimate is not None:
+            return estimate, True
+    return session.execute(count_statement, params or {}).scalar(), False
+
+
+def paginate_keyset(query: Query, keys: Sequence[Tuple[Any, bool]], cursor: Optional[str] = None,
+                    page_size: int = 20, max_page_size: int = 100, total: str = 'none') -> Dict[str, Any]:
+    """
+    Paginate a SQLAlchemy query by keyset (seek) instead of OFFSET
+    
+    Deep pages cost the same as the first: the database seeks past the last
+    row of the previous page instead of reading and discarding every row
+    before it. The query's own ORDER BY is replaced by keys.
+    
+    Args:
+        query: SQLAlchemy query object
+        keys: (column expression, descending) pairs; together they must be unique
+              and non-null, e.g. [(Model.created_at, True), (Model.id, True)]
+        cursor: Cursor from the previous page's next_cursor, None for the first page
+        page_size: Number of items per page
+        max_page_size: Maximum allowed page size
+        total: One of CURSOR_TOTAL_MODES
+        
+    Raises:
+        InvalidCursorError: If the cursor is invalid
+        
+    Returns:
+        Dictionary containing the page items and cursor metadata
+    """
+    page_size = min(max(1, int(page_size)), max_page_size)
+    
+    base_query = query.order_by(None)
+    total_count, total_is_estimate = (None, False)
+    if total != 'none':
+        count_statement = select(func.count()).select_from(base_query.statement.subquery())
+        total_count, total_is_estimate = count_rows(
+            query.session, count_statement, total, estimate_statement=base_query.statement
+        )
+    
+    page_query = base_query
+    if cursor:
+        page_query = page_query.filter(keyset_condition(keys, decode_cursor(cursor, len(keys))))
+    
+    # Select the key values alongside each row and fetch one extra to detect a next page
+    labels = [expression.label(f'_cursor_{index}') for index, (expression, _) in enumerate(keys)]
+    rows = page_query.add_columns(*labels).order_by(
+        *[expression.desc() if descending else expression.asc() for expression, descending in keys]
+    ).limit(page_size + 1).all()
+    
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(list(rows[-1][1:])) if has_more else None
+    
+    return {
+        'items': [row[0] for row in rows],
+        'total': total_count,
+        'total_is_estimate': total_is_estimate,
+        'page_size': page_size,
+        'has_more': has_more,
+        'has_prev': cursor is not None,
+        'cursor': cursor,
+        'next_cursor': next_cursor
+    }
@@ -8,11 +8,13 @@ import jwt
 import logging
 import hashlib
 import secrets
+import threading
+import time
 import bcrypt
 from functools import wraps
 from typing import Dict, List, Optional, Set, Any, Tuple
 from datetime import datetime, timedelta
-from flask import current_app, request, jsonify, g
+from flask import current_app, request, jsonify, g, has_app_context
 from flask_jwt_extended import (
     jwt_required, get_jwt_identity, get_jwt, 
     create_access_token, create_refresh_token
@@ -100,16 +102,24 @@ PERMISSIONS = {
 class SecurityManager:
     """Advanced security management system"""
     
+    REDIS_RETRY_INTERVAL = 30  # seconds between reconnect attempts
+    
     def __init__(self):
         self.redis_client = None
+        self._redis_retry_at = 0
         self.failed_login_attempts = {}
         self.blocked_ips = set()
         self.session_store = {}
         self.security_events = []
+        self.revoked_tokens = TokenRevocationList(self)
         self._init_redis()
     
     def _init_redis(self):
         """Initialize Redis connection for security features"""
+        if not has_app_context():
+            # Created at import time; connect lazily on first use in the app
+            return
+        
         try:
             redis_url = current_app.config.get('REDIS_URL', 'redis://localhost:6379/1')
             self.redis_client = redis.Redis.from_url(redis_url, decode_responses=True)
@@ -117,6 +127,13 @@ class SecurityManager:
         except Exception as e:
             logger.warning(f"Redis not available for security features: {e}")
             self.redis_client = None
+            self._redis_retry_at = time.time() + self.REDIS_RETRY_INTERVAL
+    
+    def get_redis_client(self):
+        """Return the shared Redis client, connecting on first use"""
+        if self.redis_client is None and time.time() >= self._redis_retry_at:
+            self._init_redis()
+        return self.redis_client
     
     def hash_password(self, password: str) -> str:
         """Securely hash password using bcrypt"""
@@ -302,6 +319,81 @@ class SecurityManager:
         except:
             return False
 
+class TokenRevocationList:
+    """Revoked JWT ids shared by every worker through Redis.
+    
+    Redis holds a sorted set of jti -> exp, so entries drop out once the token
+    would have expired anyway. Each worker keeps a local mirror and re-reads
+    the set only when the shared version counter changes, checking that
+    counter at most every SYNC_INTERVAL seconds; the common not-revoked check
+    is a dict lookup. Without Redis the list is process-local.
+    """
+    
+    KEY = 'revoked_tokens'
+    VERSION_KEY = 'revoked_tokens:version'
+    SYNC_INTERVAL = 1.0  # seconds a revocation may take to reach other workers
+    
+    def __init__(self, manager):
+        self.manager = manager
+        self._local = {}  # jti -> exp timestamp
+        self._version = None
+        self._next_sync = 0
+        self._lock = threading.Lock()
+    
+    def revoke(self, jti: str, expires_at: float):
+        """Revoke jti until expires_at (the token's exp claim)"""
+        now = time.time()
+        if expires_at <= now:
+            return
+        
+        with self._lock:
+            self._local[jti] = expires_at
+        
+        client = self.manager.get_redis_client()
+        if not client:
+            return
+        
+        try:
+            pipe = client.pipeline()
+            pipe.zadd(self.KEY, {jti: expires_at})
+            pipe.zremrangebyscore(self.KEY, '-inf', now)
+            pipe.incr(self.VERSION_KEY)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to store token revocation: {e}")
+    
+    def is_revoked(self, jti: str) -> bool:
+        """Check jti against the local mirror, syncing it when due"""
+        now = time.time()
+        if now >= self._next_sync:
+            self._sync(now)
+        
+        expires_at = self._local.get(jti)
+        return expires_at is not None and expires_at > now
+    
+    def _sync(self, now: float):
+        self._next_sync = now + self.SYNC_INTERVAL
+        
+        client = self.manager.get_redis_client()
+        if client:
+            try:
+                version = client.get(self.VERSION_KEY)
+                if version != self._version:
+                    members = client.zrangebyscore(self.KEY, now, '+inf', withscores=True)
+                    with self._lock:
+                        self._local = {jti: expires_at for jti, expires_at in members}
+                    self._version = version
+                return
+            except Exception as e:
+                logger.error(f"Failed to sync token revocations: {e}")
+        
+        # Local-only mode: drop entries whose tokens have expired
+        with self._lock:
+            self._local = {jti: exp for jti, exp in self._local.items() if exp > now}
+    
+    def __len__(self):
+        return len(self._local)
+
 class RBACManager:
     """Role-Based Access Control manager"""
     
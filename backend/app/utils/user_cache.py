@@ -0,0 +1,148 @@
+"""
+Current-user resolution cache
+Resolves the JWT identity to a User once per request, backed by a short-TTL
+process-local cache and the shared Redis cache. Without Redis only the
+short-TTL local cache is used, so a deactivated user loses access on every
+worker within LOCAL_TTL.
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from flask import g, has_request_context
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db
+from app.models.user import User
+from app.utils.cache import LocalLRUCache, cache_manager, cache_get, cache_set, cache_delete
+
+logger = logging.getLogger(__name__)
+
+# Process-local entries expire quickly so role changes made through another
+# worker are picked up within seconds even without a Redis notification.
+LOCAL_TTL = 15
+REDIS_TTL = 300
+CACHE_NAMESPACE = 'auth_user'
+
+# Cached columns; the password hash is never cached and lazy-loads on access
+CACHED_FIELDS = ('user_id', 'chinese_name', 'username', 'department', 'job_title',
+                 'role', 'is_active', 'created_at', 'updated_at')
+DATETIME_FIELDS = ('created_at', 'updated_at')
+
+_local_cache = LocalLRUCache(max_entries=2048)
+_stats_lock = threading.Lock()
+_stats = {'request_hits': 0, 'local_hits': 0, 'redis_hits': 0, 'db_loads': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _snapshot(user):
+    data = {field: getattr(user, field) for field in CACHED_FIELDS}
+    for field in DATETIME_FIELDS:
+        if data[field] is not None:
+            data[field] = data[field].isoformat()
+    return data
+
+
+def _attach(data):
+    """Attach a cached snapshot to the session without querying"""
+    values = dict(data)
+    for field in DATETIME_FIELDS:
+        if values.get(field):
+            values[field] = datetime.fromisoformat(values[field])
+
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def _load_snapshot(user_id):
+    key = f'user:{user_id}'
+
+    data = _local_cache.get(key)
+    if data is not None:
+        _count('local_hits')
+        return data
+
+    data = cache_get(CACHE_NAMESPACE, key)
+    if data is not None:
+        _count('redis_hits')
+        _local_cache.set(key, data, LOCAL_TTL)
+        return data
+
+    return None
+
+
+def _request_user():
+    """The user bound to flask.g, if it still belongs to the current session
+
+    g lives as long as the app context, which can outlast the request's
+    session (db.session.remove() detaches it); a detached user is dropped
+    and resolved again.
+    """
+    if not has_request_context():
+        return None
+    cached = getattr(g, 'current_user', None)
+    if cached is not None and cached not in db.session:
+        g.pop('current_user', None)
+        return None
+    return cached
+
+
+def get_user(user_id) -> Optional[User]:
+    """Return the User for user_id, using the request, local and Redis caches.
+
+    The user is bound to flask.g for the rest of the request, so repeated
+    calls (decorators, helpers, route code) never re-query.
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    cached = _request_user()
+    if cached is not None and cached.user_id == user_id:
+        _count('request_hits')
+        return cached
+
+    data = _load_snapshot(user_id)
+    if data is not None:
+        user = _attach(data)
+    else:
+        _count('db_loads')
+        user = db.session.get(User, user_id)
+        if user is not None:
+            data = _snapshot(user)
+            _local_cache.set(f'user:{user_id}', data, LOCAL_TTL)
+            # The cache's own fallback is worker-local too; keeping a REDIS_TTL
+            # copy there would outlive invalidate_user() on other workers
+            if cache_manager.is_available():
+                cache_set(CACHE_NAMESPACE, f'user:{user_id}', data, REDIS_TTL)
+
+    if user is not None and has_request_context():
+        g.current_user = user
+    return user
+
+
+def invalidate_user(user_id):
+    """Drop a user from every cache layer after it was changed"""
+    key = f'user:{user_id}'
+    _local_cache.delete(key)
+    cache_delete(CACHE_NAMESPACE, key)
+
+    cached = _request_user()
+    if cached is not None and cached.user_id == user_id:
+        g.pop('current_user', None)
+
+
+def get_stats():
+    """Lookup counters since process start; db_loads are the remaining round trips"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['local_entries'] = len(_local_cache)
+    return stats
@@ -1,17 +1,214 @@
 """
 WebSocket 事件管理器 - 用於即時狀態更新
+
+Under gunicorn each worker only holds its own clients. With
+SOCKETIO_MESSAGE_QUEUE set, socket.io publishes every emit to that Redis
+and each worker delivers it to the clients it holds; subscriptions are
+recorded in the same Redis so every worker sees them. Broadcasts to a room
+within SOCKETIO_COALESCE_MS are sent as one batch_update event, and
+broadcast_requisition_batch sends everything one request changed as one.
 """
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+
+import redis
+from flask import request
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import logging
 
 logger = logging.getLogger(__name__)
 
 socketio = SocketIO(cors_allowed_origins="*", logger=True, engineio_logger=True)
 
+
+class SubscriptionStore:
+    """Sessions following each user and requisition, shared by every worker
+
+    Kept in Redis sets when the message queue is Redis (ws:<kind>:<target>
+    holds session ids, ws:session:<sid> what the session follows, so a
+    disconnect is cleaned up by whichever worker sees it). Otherwise, or
+    while Redis is unreachable, kept in process dicts.
+    """
+
+    KEY_PREFIX = 'ws'
+
+    def __init__(self):
+        self.redis_client = None
+        self.ttl = 86400
+        self.local = {}  # (kind, target) -> set of session ids
+        self.local_sessions = {}  # session id -> set of (kind, target)
+        self._lock = threading.Lock()
+
+    def configure(self, redis_url=None, ttl=86400):
+        self.ttl = ttl
+        self.redis_client = None
+        if redis_url and redis_url.startswith(('redis://', 'rediss://', 'unix://')):
+            self.redis_client = redis.Redis.from_url(
+                redis_url, decode_responses=True, socket_connect_timeout=2, socket_timeout=2
+            )
+
+    def _key(self, kind, target):
+        return f'{self.KEY_PREFIX}:{kind}:{target}'
+
+    def _session_key(self, session_id):
+        return f'{self.KEY_PREFIX}:session:{session_id}'
+
+    def add(self, kind, target, session_id):
+        """Record that session_id follows target"""
+        target = str(target)
+        if self.redis_client is not None:
+            try:
+                pipe = self.redis_client.pipeline()
+                pipe.sadd(self._key(kind, target), session_id)
+                pipe.expire(self._key(kind, target), self.ttl)
+                pipe.sadd(self._session_key(session_id), f'{kind}:{target}')
+                pipe.expire(self._session_key(session_id), self.ttl)
+                pipe.execute()
+                return
+            except redis.RedisError as e:
+                logger.warning(f'Subscription store unavailable, keeping {kind} {target} locally: {e}')
+        with self._lock:
+            self.local.setdefault((kind, target), set()).add(session_id)
+            self.local_sessions.setdefault(session_id, set()).add((kind, target))
+
+    def remove(self, kind, target, session_id):
+        """Forget that session_id follows target"""
+        target = str(target)
+        if self.redis_client is not None:
+            try:
+                pipe = self.redis_client.pipeline()
+                pipe.srem(self._key(kind, target), session_id)
+                pipe.srem(self._session_key(session_id), f'{kind}:{target}')
+                pipe.execute()
+            except redis.RedisError as e:
+                logger.warning(f'Subscription store unavailable: {e}')
+        with self._lock:
+            self._discard_local(kind, target, session_id)
+            self.local_sessions.get(session_id, set()).discard((kind, target))
+
+    def remove_session(self, session_id):
+        """Forget everything a disconnected session followed"""
+        if self.redis_client is not None:
+            try:
+                followed = self.redis_client.smembers(self._session_key(session_id))
+                pipe = self.redis_client.pipeline()
+                for entry in followed:
+                    kind, target = entry.split(':', 1)
+                    pipe.srem(self._key(kind, target), session_id)
+                pipe.delete(self._session_key(session_id))
+                pipe.execute()
+            except redis.RedisError as e:
+                logger.warning(f'Subscription store unavailable: {e}')
+        with self._lock:
+            for kind, target in self.local_sessions.pop(session_id, set()):
+                self._discard_local(kind, target, session_id)
+
+    def _discard_local(self, kind, target, session_id):
+        sessions = self.local.get((kind, target))
+        if sessions is not None:
+            sessions.discard(session_id)
+            if not sessions:
+                del self.local[(kind, target)]
+
+    def members(self, kind, target):
+        """Session ids following target, on any worker"""
+        target = str(target)
+        with self._lock:
+            sessions = set(self.local.get((kind, target), ()))
+        if self.redis_client is not None:
+            try:
+                sessions |= self.redis_client.smembers(self._key(kind, target))
+            except redis.RedisError as e:
+                logger.warning(f'Subscription store unavailable: {e}')
+                return None
+        return sessions
+
+    def has_members(self, kind, target):
+        """Whether anyone follows target; True when that cannot be checked"""
+        sessions = self.members(kind, target)
+        return sessions is None or bool(sessions)
+
+
+class BroadcastCoalescer:
+    """Collect broadcasts per room and emit them together after a short window
+
+    A room that received one message in the window gets it as its usual
+    event; a room that received several gets one batch_update event listing
+    them in order. The window only merges emits made by one worker, so
+    changes made by one request are sent together with send() instead.
+    """
+
+    BATCH_EVENT = 'batch_update'
+
+    def __init__(self, window=0.05):
+        self.window = window
+        self.pending = OrderedDict()  # room -> list of (event, message)
+        self.stats = {'queued': 0, 'emitted': 0, 'batches': 0}
+        self._lock = threading.Lock()
+        self._scheduled = False
+
+    def publish(self, room, event, message):
+        """Queue message for room; flushed when the window closes"""
+        if self.window <= 0:
+            self.send(room, [(event, message)])
+            return
+        with self._lock:
+            self.pending.setdefault(room, []).append((event, message))
+            self.stats['queued'] += 1
+            if self._scheduled:
+                return
+            self._scheduled = True
+        socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        socketio.sleep(self.window)
+        self.flush()
+
+    def flush(self):
+        """Emit everything queued, one event per room"""
+        with self._lock:
+            pending, self.pending = self.pending, OrderedDict()
+            self._scheduled = False
+        for room, messages in pending.items():
+            try:
+                self.send(room, messages)
+            except Exception as e:
+                logger.error(f'Broadcast error for {room}: {e}')
+
+    def send(self, room, messages):
+        """Emit (event, message) pairs to room now, as one event"""
+        if len(messages) == 1:
+            event, message = messages[0]
+            socketio.emit(event, message, to=room)
+        else:
+            socketio.emit(self.BATCH_EVENT, {
+                'room': room,
+                'count': len(messages),
+                'events': [message for _, message in messages],
+                'timestamp': datetime.utcnow().isoformat()
+            }, to=room)
+            self.stats['batches'] += 1
+        self.stats['emitted'] += 1
+
+
 # 存儲用戶連線和訂閱
-user_connections = {}  # user_id -> set of session_ids
-requisition_subscribers = {}  # requisition_id -> set of session_ids
+subscriptions = SubscriptionStore()
+broadcaster = BroadcastCoalescer()
+
+
+def init_socketio(app):
+    """Attach socketio to app, fanning out through the configured message queue"""
+    message_queue = app.config.get('SOCKETIO_MESSAGE_QUEUE') or None
+    options = {'channel': app.config.get('SOCKETIO_CHANNEL', 'erp-socketio')}
+    if app.config.get('SOCKETIO_ASYNC_MODE'):
+        options['async_mode'] = app.config['SOCKETIO_ASYNC_MODE']
+    socketio.init_app(app, message_queue=message_queue, **options)
+    subscriptions.configure(message_queue, app.config.get('SOCKETIO_SUBSCRIPTION_TTL', 86400))
+    broadcaster.window = app.config.get('SOCKETIO_COALESCE_MS', 50) / 1000
+    logger.info(f'Socket.IO async mode {socketio.async_mode}, message queue '
+                f'{"enabled" if message_queue else "disabled"}')
 
 @socketio.on('connect')
 def handle_connect():
@@ -38,20 +235,18 @@ def handle_authenticate(data):
     """處理用戶身份驗證"""
     try:
         user_id = get_jwt_identity()
-        
-        if user_id not in user_connections:
-            user_connections[user_id] = set()
-        user_connections[user_id].add(request.sid)
-        
+
+        subscriptions.add('user', user_id, request.sid)
+
         join_room(f'user_{user_id}')
         logger.info(f'User {user_id} authenticated with session {request.sid}')
-        
+
         emit('auth_status', {
-            'authenticated': True, 
+            'authenticated': True,
             'user_id': user_id,
             'message': f'用戶 {user_id} 身份驗證成功'
         })
-        
+
     except Exception as e:
         logger.error(f'Authentication error: {e}')
         emit('auth_status', {'authenticated': False, 'error': str(e)})
@@ -63,28 +258,26 @@ def handle_subscribe_requisition(data):
     try:
         user_id = get_jwt_identity()
         requisition_id = data.get('requisition_id')
-        
+
         if not requisition_id:
             emit('subscription_error', {'error': '缺少請購單ID'})
             return
-            
+
         # 加入請購單房間
         room_name = f'requisition_{requisition_id}'
         join_room(room_name)
-        
+
         # 記錄訂閱
-        if requisition_id not in requisition_subscribers:
-            requisition_subscribers[requisition_id] = set()
-        requisition_subscribers[requisition_id].add(request.sid)
-        
+        subscriptions.add('requisition', requisition_id, request.sid)
+
         logger.info(f'User {user_id} subscribed to requisition {requisition_id}')
-        
+
         emit('subscription_status', {
             'subscribed': True,
             'requisition_id': requisition_id,
             'message': f'已訂閱請購單 {requisition_id} 的狀態更新'
         })
-        
+
     except Exception as e:
         logger.error(f'Subscription error: {e}')
         emit('subscription_error', {'error': str(e)})
@@ -94,64 +287,68 @@ def handle_unsubscribe_requisition(data):
     """取消訂閱請購單狀態更新"""
     try:
         requisition_id = data.get('requisition_id')
-        
+
         if requisition_id:
             room_name = f'requisition_{requisition_id}'
             leave_room(room_name)
-            
+
             # 移除訂閱記錄
-            if requisition_id in requisition_subscribers:
-                requisition_subscribers[requisition_id].discard(request.sid)
-                if not requisition_subscribers[requisition_id]:
-                    del requisition_subscribers[requisition_id]
-            
+            subscriptions.remove('requisition', requisition_id, request.sid)
+
             logger.info(f'Session {request.sid} unsubscribed from requisition {requisition_id}')
-            
+
         emit('subscription_status', {
             'subscribed': False,
             'requisition_id': requisition_id,
             'message': f'已取消訂閱請購單 {requisition_id}'
         })
-        
+
     except Exception as e:
         logger.error(f'Unsubscription error: {e}')
 
 def cleanup_subscriptions(session_id):
     """清理斷線用戶的訂閱"""
     try:
-        # 清理用戶連線記錄
-        for user_id, sessions in user_connections.items():
-            sessions.discard(session_id)
-        user_connections = {k: v for k, v in user_connections.items() if v}
-        
-        # 清理請購單訂閱記錄
-        for req_id, sessions in requisition_subscribers.items():
-            sessions.discard(session_id)
-        requisition_subscribers = {k: v for k, v in requisition_subscribers.items() if v}
-        
+        subscriptions.remove_session(session_id)
     except Exception as e:
         logger.error(f'Cleanup error: {e}')
 
+def _status_change_message(requisition_id, old_status, new_status, data=None):
+    return {
+        'event': 'requisition_status_changed',
+        'requisition_id': requisition_id,
+        'old_status': old_status,
+        'new_status': new_status,
+        'timestamp': datetime.utcnow().isoformat(),
+        'data': data or {}
+    }
+
+def _item_change_message(requisition_id, item_id, old_status, new_status, data=None):
+    return {
+        'event': 'requisition_item_changed',
+        'requisition_id': requisition_id,
+        'item_id': item_id,
+        'old_status': old_status,
+        'new_status': new_status,
+        'timestamp': datetime.utcnow().isoformat(),
+        'data': data or {}
+    }
+
 # 廣播函數 - 供其他模組使用
 def broadcast_requisition_status_change(requisition_id, old_status, new_status, data=None):
     """廣播請購單狀態變更"""
     try:
+        if not subscriptions.has_members('requisition', requisition_id):
+            return True
         room_name = f'requisition_{requisition_id}'
-        
-        message_data = {
-            'event': 'requisition_status_changed',
-            'requisition_id': requisition_id,
-            'old_status': old_status,
-            'new_status': new_status,
-            'timestamp': datetime.utcnow().isoformat(),
-            'data': data or {}
-        }
-        
+
+        message_data = _status_change_message(requisition_id, old_status, new_status, data)
+
         logger.info(f'Broadcasting status change for requisition {requisition_id}: {old_status} -> {new_status}')
-        socketio.emit('requisition_status_changed', message_data, room=room_name)
-        
+        broadcaster.publish(room_name, 'requisition_status_changed', message_data)
+
         return True
-        
+
     except Exception as e:
         logger.error(f'Broadcast error: {e}')
         return False
@@ -159,32 +356,58 @@ def broadcast_requisition_status_change(requisition_id, old_status, new_status,
 def broadcast_requisition_item_change(requisition_id, item_id, old_status, new_status, data=None):
     """廣播請購單項目狀態變更"""
     try:
+        if not subscriptions.has_members('requisition', requisition_id):
+            return True
         room_name = f'requisition_{requisition_id}'
-        
-        message_data = {
-            'event': 'requisition_item_changed',
-            'requisition_id': requisition_id,
-            'item_id': item_id,
-            'old_status': old_status,
-            'new_status': new_status,
-            'timestamp': datetime.utcnow().isoformat(),
-            'data': data or {}
-        }
-        
+
+        message_data = _item_change_message(requisition_id, item_id, old_status, new_status, data)
+
         logger.info(f'Broadcasting item change for requisition {requisition_id}, item {item_id}: {old_status} -> {new_status}')
-        socketio.emit('requisition_item_changed', message_data, room=room_name)
-        
+        broadcaster.publish(room_name, 'requisition_item_changed', message_data)
+
         return True
-        
+
     except Exception as e:
         logger.error(f'Item broadcast error: {e}')
         return False
 
+def broadcast_requisition_batch(requisition_id, item_changes, status_change=None, data=None):
+    """廣播批次審核結果 - 整批只送出一個事件
+
+    item_changes: (item_id, old_status, new_status) per changed line
+    status_change: (old_status, new_status) if the requisition status moved
+    """
+    try:
+        if not subscriptions.has_members('requisition', requisition_id):
+            return True
+        room_name = f'requisition_{requisition_id}'
+
+        messages = [
+            ('requisition_item_changed', _item_change_message(requisition_id, item_id, old, new, data))
+            for item_id, old, new in item_changes
+        ]
+        if status_change:
+            messages.append(('requisition_status_changed',
+                             _status_change_message(requisition_id, *status_change, data)))
+        if not messages:
+            return True
+
+        logger.info(f'Broadcasting {len(messages)} changes for requisition {requisition_id} as one event')
+        broadcaster.send(room_name, messages)
+
+        return True
+
+    except Exception as e:
+        logger.error(f'Batch broadcast error: {e}')
+        return False
+
 def broadcast_user_notification(user_id, notification_type, message, data=None):
     """向特定用戶廣播通知"""
     try:
+        if not subscriptions.has_members('user', user_id):
+            return True
         room_name = f'user_{user_id}'
-        
+
         message_data = {
             'event': 'user_notification',
             'type': notification_type,
@@ -192,16 +415,12 @@ def broadcast_user_notification(user_id, notification_type, message, data=None):
             'timestamp': datetime.utcnow().isoformat(),
             'data': data or {}
         }
-        
+
         logger.info(f'Broadcasting notification to user {user_id}: {notification_type}')
-        socketio.emit('user_notification', message_data, room=room_name)
-        
+        broadcaster.publish(room_name, 'user_notification', message_data)
+
         return True
-        
+
     except Exception as e:
         logger.error(f'User notification error: {e}')
         return False
-
-# 導入必要模組
-from datetime import datetime
-from flask import request
\ No newline at end of file
@@ -0,0 +1,266 @@
+# Cache Payload Codec
+# Compact binary encoding for cached values, shared by both cache layers
+
+import json
+import pickle
+import threading
+import time
+import zlib
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:  # Optional: faster and smaller than JSON
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:  # Optional: used when msgpack is not installed
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: zlib is used instead
+    zstandard = None
+
+# Encoded payloads start with MAGIC + FORMAT_VERSION + serializer id + compression id.
+# 0xC1 is never emitted by msgpack and cannot start a JSON, UTF-8 or pickle payload,
+# so entries written before the codec existed are told apart and decoded the old way.
+MAGIC = b'\xc1\xe7'
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+SERIALIZER_JSON = 1
+SERIALIZER_MSGPACK = 2
+SERIALIZER_ORJSON = 3
+SERIALIZER_PICKLE = 4
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+SERIALIZER_NAMES = {
+    SERIALIZER_JSON: 'json',
+    SERIALIZER_MSGPACK: 'msgpack',
+    SERIALIZER_ORJSON: 'orjson',
+    SERIALIZER_PICKLE: 'pickle'
+}
+COMPRESSION_NAMES = {
+    COMPRESSION_NONE: 'none',
+    COMPRESSION_ZLIB: 'zlib',
+    COMPRESSION_ZSTD: 'zstd'
+}
+
+# Tuples are pickled, as before the codec, so they come back as tuples
+PLAIN_TYPES = (dict, list, str, int, float, bool, type(None))
+
+
+class UndecodablePayload(ValueError):
+    """A cached payload written by an unknown codec version or damaged"""
+
+
+class CacheCodec:
+    """Encode cached values as msgpack / orjson / JSON, compressed above a threshold
+
+    Plain data (dicts, lists, scalars) uses the best installed serializer;
+    anything else is pickled as before. Payloads of compress_threshold bytes
+    or more are compressed with zstd (or zlib) when that makes them smaller.
+    A header records the format, so entries written by another codec
+    version or before the codec existed are never misread.
+    """
+
+    def __init__(self, serializer: str = 'auto', compression: str = 'auto',
+                 compress_threshold: int = 1024, zstd_level: int = 3, zlib_level: int = 6):
+        """
+        Args:
+            serializer: 'msgpack', 'orjson', 'json' or 'auto' (best installed)
+            compression: 'zstd', 'zlib', 'none' or 'auto' (zstd if installed, else zlib)
+            compress_threshold: Smallest serialized size in bytes that is compressed
+            zstd_level: zstd compression level
+            zlib_level: zlib compression level
+        """
+        self.serializer = self._pick_serializer(serializer)
+        self.compression = self._pick_compression(compression)
+        self.compress_threshold = compress_threshold
+        self.zlib_level = zlib_level
+        self._zstd_level = zstd_level
+        self._local = threading.local()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def _pick_serializer(name: str) -> int:
+        if name == 'auto':
+            if msgpack is not None:
+                return SERIALIZER_MSGPACK
+            if orjson is not None:
+                return SERIALIZER_ORJSON
+            return SERIALIZER_JSON
+        serializer = {value: key for key, value in SERIALIZER_NAMES.items()}[name]
+        if (serializer == SERIALIZER_MSGPACK and msgpack is None) or (serializer == SERIALIZER_ORJSON and orjson is None):
+            raise ValueError(f"Cache serializer '{name}' is not installed")
+        return serializer
+
+    @staticmethod
+    def _pick_compression(name: str) -> int:
+        if name == 'auto':
+            return COMPRESSION_ZSTD if zstandard is not None else COMPRESSION_ZLIB
+        compression = {value: key for key, value in COMPRESSION_NAMES.items()}[name]
+        if compression == COMPRESSION_ZSTD and zstandard is None:
+            raise ValueError("Cache compression 'zstd' is not installed")
+        return compression
+
+    def _zstd(self):
+        # zstd contexts are not thread-safe; keep one pair per thread
+        if not hasattr(self._local, 'compressor'):
+            self._local.compressor = zstandard.ZstdCompressor(level=self._zstd_level)
+            self._local.decompressor = zstandard.ZstdDecompressor()
+        return self._local.compressor, self._local.decompressor
+
+    def _serialize(self, value: Any, pickled: bool) -> Tuple[int, bytes]:
+        if pickled or not isinstance(value, PLAIN_TYPES):
+            return SERIALIZER_PICKLE, pickle.dumps(value)
+        try:
+            if self.serializer == SERIALIZER_MSGPACK:
+                return SERIALIZER_MSGPACK, msgpack.packb(value, default=str, use_bin_type=True)
+            if self.serializer == SERIALIZER_ORJSON:
+                # Datetimes go through default=str, as with json.dumps
+                return SERIALIZER_ORJSON, orjson.dumps(
+                    value, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                )
+            return SERIALIZER_JSON, json.dumps(value, default=str, separators=(',', ':')).encode('utf-8')
+        except (TypeError, ValueError, OverflowError):
+            return SERIALIZER_PICKLE, pickle.dumps(value)
+
+    @staticmethod
+    def _deserialize(serializer: int, data: bytes) -> Any:
+        if serializer == SERIALIZER_MSGPACK:
+            if msgpack is None:
+                raise UndecodablePayload('msgpack is not installed')
+            return msgpack.unpackb(data, raw=False, strict_map_key=False)
+        if serializer == SERIALIZER_ORJSON:
+            return orjson.loads(data) if orjson is not None else json.loads(data)
+        if serializer == SERIALIZER_JSON:
+            return json.loads(data)
+        if serializer == SERIALIZER_PICKLE:
+            return pickle.loads(data)
+        raise UndecodablePayload(f'unknown serializer {serializer}')
+
+    def _compress(self, data: bytes) -> Tuple[int, bytes]:
+        if self.compression == COMPRESSION_NONE or len(data) < self.compress_threshold:
+            return COMPRESSION_NONE, data
+        if self.compression == COMPRESSION_ZSTD:
+            compressed = self._zstd()[0].compress(data)
+        else:
+            compressed = zlib.compress(data, self.zlib_level)
+        if len(compressed) >= len(data):
+            return COMPRESSION_NONE, data
+        return self.compression, compressed
+
+    def _decompress(self, compression: int, data: bytes) -> bytes:
+        if compression == COMPRESSION_NONE:
+            return data
+        if compression == COMPRESSION_ZLIB:
+            return zlib.decompress(data)
+        if compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise UndecodablePayload('zstandard is not installed')
+            return self._zstd()[1].decompress(data)
+        raise UndecodablePayload(f'unknown compression {compression}')
+
+    def encode_sized(self, value: Any, namespace: str = '', pickled: bool = False) -> Tuple[bytes, int]:
+        """(payload, serialized size before compression); pickled forces pickle"""
+        started = time.perf_counter()
+        serializer, data = self._serialize(value, pickled)
+        compression, stored = self._compress(data)
+        payload = MAGIC + bytes((FORMAT_VERSION, serializer, compression)) + stored
+        self._record(namespace, 'encode', time.perf_counter() - started, len(data), len(payload))
+        return payload, len(data)
+
+    def encode(self, value: Any, namespace: str = '', pickled: bool = False) -> bytes:
+        """Serialize value into a versioned cache payload"""
+        return self.encode_sized(value, namespace, pickled)[0]
+
+    @staticmethod
+    def is_encoded(payload: bytes) -> bool:
+        """Whether payload was written by this codec (of any version)"""
+        return payload[:len(MAGIC)] == MAGIC
+
+    def decode_sized(self, payload: bytes, namespace: str = '') -> Tuple[Any, int]:
+        """(value, serialized size) of a payload written by encode()
+
+        Raises UndecodablePayload for other codec versions and damaged data;
+        callers treat that as a cache miss.
+        """
+        started = time.perf_counter()
+        if not self.is_encoded(payload) or len(payload) < HEADER_SIZE:
+            raise UndecodablePayload('not a codec payload')
+        version, serializer, compression = payload[len(MAGIC):HEADER_SIZE]
+        if version != FORMAT_VERSION:
+            raise UndecodablePayload(f'codec version {version}')
+        try:
+            data = self._decompress(compression, payload[HEADER_SIZE:])
+            value = self._deserialize(serializer, data)
+        except UndecodablePayload:
+            raise
+        except Exception as e:
+            raise UndecodablePayload(str(e)) from e
+        self._record(namespace, 'decode', time.perf_counter() - started, len(data), len(payload))
+        return value, len(data)
+
+    def decode(self, payload: bytes, namespace: str = '') -> Any:
+        """Value of a payload written by encode()"""
+        return self.decode_sized(payload, namespace)[0]
+
+    def _record(self, namespace: str, operation: str, seconds: float, serialized: int, stored: int):
+        with self._stats_lock:
+            stats = self._stats.get(namespace)
+            if stats is None:
+                stats = self._stats[namespace] = {
+                    'encodes': 0, 'encode_ms': 0.0, 'serialized_bytes': 0, 'stored_bytes': 0,
+                    'decodes': 0, 'decode_ms': 0.0, 'read_bytes': 0
+                }
+            if operation == 'encode':
+                stats['encodes'] += 1
+                stats['encode_ms'] += seconds * 1000
+                stats['serialized_bytes'] += serialized
+                stats['stored_bytes'] += stored
+            else:
+                stats['decodes'] += 1
+                stats['decode_ms'] += seconds * 1000
+                stats['read_bytes'] += stored
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Codec settings and per-namespace byte and time counters"""
+        with self._stats_lock:
+            namespaces = {
+                namespace: {
+                    **{key: round(value, 3) if isinstance(value, float) else value for key, value in stats.items()},
+                    # Saved by compression, relative to the serialized size
+                    'bytes_saved': stats['serialized_bytes'] - stats['stored_bytes'],
+                    'avg_encode_us': round(stats['encode_ms'] * 1000 / stats['encodes'], 2) if stats['encodes'] else 0,
+                    'avg_decode_us': round(stats['decode_ms'] * 1000 / stats['decodes'], 2) if stats['decodes'] else 0
+                }
+                for namespace, stats in self._stats.items()
+            }
+        return {
+            'serializer': SERIALIZER_NAMES[self.serializer],
+            'compression': COMPRESSION_NAMES[self.compression],
+            'compress_threshold': self.compress_threshold,
+            'namespaces': namespaces
+        }
+
+
+def decode_legacy(payload: bytes) -> Optional[Any]:
+    """Value of an entry written before the codec (JSON or pickle), or None"""
+    try:
+        return json.loads(payload.decode('utf-8') if isinstance(payload, bytes) else payload)
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        try:
+            return pickle.loads(payload)
+        except Exception as e:
+            logger.error(f"Deserialization error: {e}")
+            return None
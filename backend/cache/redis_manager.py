@@ -3,34 +3,207 @@
 
 import json
 import time
+import uuid
 import redis
 import logging
+import threading
+from collections import OrderedDict
+from fnmatch import fnmatchcase
 from functools import wraps
 from typing import Any, Optional, Dict, List
 from datetime import datetime, timedelta
 
+from cache.codec import CacheCodec, UndecodablePayload
+
 logger = logging.getLogger(__name__)
 
+# Workers publish the keys they change here so the others drop their L1 copies
+INVALIDATION_CHANNEL = 'cache:l1:invalidate'
+
+_MISSING = object()
+
+
+class LocalCache:
+    """Bounded in-process (L1) cache with per-namespace byte budgets
+
+    Keys are grouped by namespace (the part before the first ':'). Every
+    namespace is an LRU list kept under its own byte budget, so a burst of
+    large dashboard payloads cannot push out sessions or permissions. Entry
+    size is the length of the serialized payload. Expired entries are swept
+    periodically instead of waiting for the key to be read again.
+    """
+
+    def __init__(self, namespace_budgets: Optional[Dict[str, int]] = None,
+                 default_budget: int = 4 * 1024 * 1024, max_entry_ratio: float = 0.25):
+        """
+        Args:
+            namespace_budgets: Byte budget per namespace
+            default_budget: Byte budget of namespaces not listed
+            max_entry_ratio: Entries larger than this share of their budget are
+                not kept locally (they would evict most of the namespace)
+        """
+        self.namespace_budgets = dict(namespace_budgets or {})
+        self.default_budget = default_budget
+        self.max_entry_ratio = max_entry_ratio
+        self._namespaces: Dict[str, OrderedDict] = {}
+        self._bytes: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'rejected': 0
+        }
+
+    @staticmethod
+    def namespace_of(key: str) -> str:
+        return key.split(':', 1)[0] if ':' in key else ''
+
+    def budget_for(self, namespace: str) -> int:
+        return self.namespace_budgets.get(namespace, self.default_budget)
+
+    def get(self, key: str) -> Any:
+        """Cached data for key, or _MISSING"""
+        namespace = self.namespace_of(key)
+        with self._lock:
+            entries = self._namespaces.get(namespace)
+            entry = entries.get(key) if entries else None
+            if entry is None:
+                self.stats['misses'] += 1
+                return _MISSING
+            if time.time() >= entry['expires_at']:
+                self._remove(namespace, key)
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return _MISSING
+            entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry['data']
+
+    def set(self, key: str, data: Any, size: int, ttl: int) -> bool:
+        """Store data of `size` bytes for ttl seconds; False when not admitted"""
+        namespace = self.namespace_of(key)
+        budget = self.budget_for(namespace)
+        with self._lock:
+            self._remove(namespace, key)
+            if size > budget * self.max_entry_ratio:
+                self.stats['rejected'] += 1
+                return False
+
+            entries = self._namespaces.setdefault(namespace, OrderedDict())
+            entries[key] = {'data': data, 'size': size, 'expires_at': time.time() + ttl}
+            self._bytes[namespace] = self._bytes.get(namespace, 0) + size
+
+            # Evict least recently used entries of this namespace only
+            while self._bytes[namespace] > budget:
+                old_key = next(iter(entries))
+                self._remove(namespace, old_key)
+                self.stats['evictions'] += 1
+            return True
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            removed = self._remove(self.namespace_of(key), key)
+            if removed:
+                self.stats['invalidations'] += 1
+            return removed
+
+    def delete_pattern(self, pattern: str) -> int:
+        """Drop every key matching a Redis-style glob pattern"""
+        with self._lock:
+            matched = [key for entries in self._namespaces.values() for key in entries
+                       if fnmatchcase(key, pattern)]
+            for key in matched:
+                self._remove(self.namespace_of(key), key)
+            self.stats['invalidations'] += len(matched)
+            return len(matched)
+
+    def sweep(self) -> int:
+        """Remove all expired entries; returns how many were removed"""
+        now = time.time()
+        with self._lock:
+            expired = [(namespace, key) for namespace, entries in self._namespaces.items()
+                       for key, entry in entries.items() if entry['expires_at'] <= now]
+            for namespace, key in expired:
+                self._remove(namespace, key)
+            self.stats['expirations'] += len(expired)
+            return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._namespaces.clear()
+            self._bytes.clear()
+
+    def namespace_stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                namespace: {
+                    'entries': len(entries),
+                    'bytes': self._bytes.get(namespace, 0),
+                    'budget': self.budget_for(namespace)
+                }
+                for namespace, entries in self._namespaces.items()
+            }
+
+    def _remove(self, namespace: str, key: str) -> bool:
+        entries = self._namespaces.get(namespace)
+        entry = entries.pop(key, None) if entries else None
+        if entry is None:
+            return False
+        self._bytes[namespace] -= entry['size']
+        return True
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._namespaces.values())
+
+    def __contains__(self, key):
+        entries = self._namespaces.get(self.namespace_of(key))
+        return bool(entries) and key in entries
+
+
 class RedisCacheManager:
     """Advanced Redis cache management with multi-layer strategy"""
     
-    def __init__(self, redis_url: str, default_ttl: int = 3600):
+    def __init__(self, redis_url: str, default_ttl: int = 3600,
+                 local_budgets: Optional[Dict[str, int]] = None,
+                 local_default_budget: int = 4 * 1024 * 1024,
+                 local_max_ttl: int = 300, sweep_interval: int = 30,
+                 listen_for_invalidations: bool = True, codec: Optional[CacheCodec] = None):
         """
         Initialize Redis cache manager
         
         Args:
             redis_url: Redis connection URL
             default_ttl: Default time-to-live in seconds
+            local_budgets: L1 byte budget per namespace (key prefix without ':')
+            local_default_budget: L1 byte budget of other namespaces
+            local_max_ttl: Upper bound of an L1 entry's lifetime, which also bounds
+                staleness if an invalidation message is lost
+            sweep_interval: Seconds between sweeps of expired L1 entries
+            listen_for_invalidations: Subscribe to invalidations published by other workers
+            codec: Payload codec (default: msgpack/orjson with compression)
         """
-        self.redis_client = redis.from_url(redis_url, decode_responses=True)
+        # Binary payloads: values are encoded by the codec
+        self.redis_client = redis.from_url(redis_url, decode_responses=False)
+        self.codec = codec or CacheCodec()
         self.default_ttl = default_ttl
-        self.local_cache = {}  # Application-level cache
+        self.local_max_ttl = local_max_ttl
+        self.sweep_interval = sweep_interval
+        self.local_cache = LocalCache(local_budgets, local_default_budget)  # Application-level cache
         self.cache_stats = {
             'hits': 0,
             'misses': 0,
             'sets': 0,
             'deletes': 0
         }
+        self.instance_id = uuid.uuid4().hex
+        self._next_sweep = time.time() + sweep_interval
+        self._pubsub = None
+        self._listener = None
+        self._listen = listen_for_invalidations
         
         # Cache key prefixes for different data types
         self.key_prefixes = {
@@ -43,6 +216,9 @@ class RedisCacheManager:
             'settings': 'settings:',
             'dashboard': 'dashboard:'
         }
+
+        if self._listen:
+            self._start_invalidation_listener()
     
     def get(self, key: str, fetch_func=None, ttl: Optional[int] = None) -> Any:
         """
@@ -56,28 +232,30 @@ class RedisCacheManager:
         Returns:
             Cached data or fetched data
         """
+        self._housekeeping()
+
         # L1: Application cache (fastest)
-        if key in self.local_cache:
-            cache_data = self.local_cache[key]
-            if not self._is_expired(cache_data):
-                self.cache_stats['hits'] += 1
-                logger.debug(f"L1 cache hit for key: {key}")
-                return cache_data['data']
-            else:
-                # Remove expired data from local cache
-                del self.local_cache[key]
+        data = self.local_cache.get(key)
+        if data is not _MISSING:
+            self.cache_stats['hits'] += 1
+            logger.debug(f"L1 cache hit for key: {key}")
+            return data
         
         # L2: Redis cache (distributed)
         try:
             cached_data = self.redis_client.get(key)
             if cached_data:
-                data = json.loads(cached_data)
+                if self.codec.is_encoded(cached_data):
+                    data, size = self.codec.decode_sized(cached_data, LocalCache.namespace_of(key))
+                else:
+                    # Written as JSON before the codec
+                    data, size = json.loads(cached_data), len(cached_data)
                 # Store in local cache for faster access
-                self._store_local(key, data, ttl or self.default_ttl)
+                self._store_local(key, data, size, ttl or self.default_ttl)
                 self.cache_stats['hits'] += 1
                 logger.debug(f"L2 cache hit for key: {key}")
                 return data
-        except (redis.RedisError, json.JSONDecodeError) as e:
+        except (redis.RedisError, json.JSONDecodeError, UnicodeDecodeError, UndecodablePayload) as e:
             logger.warning(f"Redis cache error for key {key}: {e}")
         
         # L3: Fetch from source
@@ -111,11 +289,12 @@ class RedisCacheManager:
         
         try:
             # Store in Redis
-            serialized_data = json.dumps(data, default=str)
+            serialized_data, size = self.codec.encode_sized(data, LocalCache.namespace_of(key))
             self.redis_client.setex(key, ttl, serialized_data)
             
-            # Store in local cache
-            self._store_local(key, data, ttl)
+            # Store in local cache, budgeted by the uncompressed size; other workers drop their now stale copy
+            self._store_local(key, data, size, ttl)
+            self._publish_invalidation(keys=[key])
             
             self.cache_stats['sets'] += 1
             logger.debug(f"Cached data for key: {key} with TTL: {ttl}")
@@ -135,13 +314,13 @@ class RedisCacheManager:
         Returns:
             Success status
         """
+        # Drop the local copy even if Redis is unreachable
+        self.local_cache.delete(key)
+
         try:
             # Delete from Redis
             self.redis_client.delete(key)
-            
-            # Delete from local cache
-            if key in self.local_cache:
-                del self.local_cache[key]
+            self._publish_invalidation(keys=[key])
             
             self.cache_stats['deletes'] += 1
             logger.debug(f"Deleted cache for key: {key}")
@@ -161,23 +340,19 @@ class RedisCacheManager:
         Returns:
             Number of keys deleted
         """
+        # Local copies may exist even when Redis holds no matching key any more
+        local_deleted = self.local_cache.delete_pattern(pattern)
+
         try:
+            deleted_count = 0
             keys = self.redis_client.keys(pattern)
             if keys:
                 # Delete from Redis
                 deleted_count = self.redis_client.delete(*keys)
-                
-                # Delete from local cache
-                local_deleted = 0
-                for key in list(self.local_cache.keys()):
-                    if self._matches_pattern(key, pattern):
-                        del self.local_cache[key]
-                        local_deleted += 1
-                
-                logger.info(f"Invalidated {deleted_count} Redis keys and {local_deleted} local keys for pattern: {pattern}")
-                return deleted_count
-            
-            return 0
+            self._publish_invalidation(pattern=pattern)
+
+            logger.info(f"Invalidated {deleted_count} Redis keys and {local_deleted} local keys for pattern: {pattern}")
+            return deleted_count
             
         except redis.RedisError as e:
             logger.error(f"Failed to invalidate pattern {pattern}: {e}")
@@ -198,36 +373,81 @@ class RedisCacheManager:
             'cache_stats': self.cache_stats,
             'hit_rate': round(hit_rate, 2),
             'local_cache_size': len(self.local_cache),
+            'codec': self.codec.get_stats(),
+            'local_cache': {
+                **self.local_cache.stats,
+                'namespaces': self.local_cache.namespace_stats(),
+                'invalidation_listener': self._listener is not None and self._listener.is_alive()
+            },
             'redis_info': redis_info
         }
+
+    def close(self):
+        """Stop the invalidation listener"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
     
-    def _store_local(self, key: str, data: Any, ttl: int):
+    def _store_local(self, key: str, data: Any, size: int, ttl: int):
         """Store data in local cache with expiration"""
-        # Limit local cache size
-        if len(self.local_cache) >= 1000:
-            # Remove oldest entries
-            sorted_items = sorted(
-                self.local_cache.items(),
-                key=lambda x: x[1]['timestamp']
+        self.local_cache.set(key, data, size, min(ttl, self.local_max_ttl))
+
+    def _housekeeping(self):
+        """Sweep expired L1 entries and reconnect the listener, at most once per sweep_interval"""
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        swept = self.local_cache.sweep()
+        if swept:
+            logger.debug(f"Swept {swept} expired local cache entries")
+        if self._listen and (self._listener is None or not self._listener.is_alive()):
+            self._start_invalidation_listener()
+
+    def _start_invalidation_listener(self):
+        """Subscribe to invalidations of other workers in a daemon thread"""
+        try:
+            self._pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{INVALIDATION_CHANNEL: self._on_invalidation})
+            self._listener = self._pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=self._on_listener_error
             )
-            for old_key, _ in sorted_items[:100]:  # Remove 100 oldest
-                del self.local_cache[old_key]
-        
-        self.local_cache[key] = {
-            'data': data,
-            'timestamp': time.time(),
-            'ttl': ttl
-        }
-    
-    def _is_expired(self, cache_data: Dict) -> bool:
-        """Check if local cache data is expired"""
-        return time.time() > (cache_data['timestamp'] + cache_data['ttl'])
+        except redis.RedisError as e:
+            # Until the listener is up, L1 entries only live for local_max_ttl
+            logger.warning(f"Cache invalidation listener unavailable: {e}")
+            self._pubsub = None
+            self._listener = None
+
+    def _on_listener_error(self, error, pubsub, thread):
+        logger.warning(f"Cache invalidation listener stopped: {error}")
+        thread.stop()
+        pubsub.close()
+
+    def _publish_invalidation(self, keys: Optional[List[str]] = None, pattern: Optional[str] = None):
+        message = json.dumps({'origin': self.instance_id, 'keys': keys, 'pattern': pattern})
+        try:
+            self.redis_client.publish(INVALIDATION_CHANNEL, message)
+        except redis.RedisError as e:
+            logger.warning(f"Failed to publish cache invalidation: {e}")
+
+    def _on_invalidation(self, message: Dict):
+        try:
+            payload = json.loads(message['data'])
+        except (TypeError, ValueError):
+            return
+        if payload.get('origin') == self.instance_id:
+            return
+        for key in payload.get('keys') or []:
+            self.local_cache.delete(key)
+        if payload.get('pattern'):
+            self.local_cache.delete_pattern(payload['pattern'])
     
     def _matches_pattern(self, key: str, pattern: str) -> bool:
         """Check if key matches pattern"""
-        if pattern.endswith('*'):
-            return key.startswith(pattern[:-1])
-        return key == pattern
+        return fnmatchcase(key, pattern)
 
 
 class CacheDecorator:
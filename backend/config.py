@@ -85,6 +85,31 @@ class Config:
     # Pagination
     DEFAULT_PAGE_SIZE = 20
     MAX_PAGE_SIZE = 100
+    
+    # Rendered PO export documents, cached on local disk by content hash
+    EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR') or os.path.join(
+        os.path.abspath(os.path.dirname(__file__)), 'instance', 'export_cache'
+    )
+    EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+    # Batch PO export: render worker processes (0 = CPU count) and POs per request
+    EXPORT_BATCH_WORKERS = int(os.environ.get('EXPORT_BATCH_WORKERS', 0))
+    EXPORT_BATCH_MAX_POS = int(os.environ.get('EXPORT_BATCH_MAX_POS', 1000))
+
+    # System settings are read from a per-worker snapshot; the version row is
+    # checked at most this often for changes made by other workers
+    SETTINGS_CACHE_ENABLED = os.environ.get('SETTINGS_CACHE_ENABLED', 'true').lower() == 'true'
+    SETTINGS_CACHE_CHECK_SECONDS = float(os.environ.get('SETTINGS_CACHE_CHECK_SECONDS', 5))
+
+    # WebSocket fan-out: with a message queue every worker delivers broadcasts
+    # made by the others, and subscriptions are tracked in the same Redis.
+    # Without one, socket.io and subscriptions stay in the process.
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE', os.environ.get('REDIS_URL'))
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL', 'erp-socketio')
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE') or None
+    SOCKETIO_SUBSCRIPTION_TTL = int(os.environ.get('SOCKETIO_SUBSCRIPTION_TTL', 86400))
+    # Broadcasts to one room within this window are sent as one batched event
+    SOCKETIO_COALESCE_MS = int(os.environ.get('SOCKETIO_COALESCE_MS', 50))
 
 class DevelopmentConfig(Config):
     DEBUG = True
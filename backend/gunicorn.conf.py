@@ -7,7 +7,15 @@ backlog = 2048
 
 # Worker processes
 workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = 'sync'
+# WebSocket connections hold a thread each (simple-websocket provides the
+# transport); broadcasts reach clients on other workers through
+# SOCKETIO_MESSAGE_QUEUE. The frontend connects over WebSocket only: long
+# polling spreads one session's requests across workers and fails with
+# "Invalid session" unless the load balancer pins clients to a worker.
+# Use 'eventlet' or 'gevent' together with SOCKETIO_ASYNC_MODE when those
+# are installed.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 50))
 worker_connections = 1000
 timeout = 120
 keepalive = 2
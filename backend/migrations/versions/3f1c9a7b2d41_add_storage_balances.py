@@ -0,0 +1,53 @@
+"""Add storage_balances materialized on-hand table
+
+Revision ID: 3f1c9a7b2d41
+Revises: 889acf7a64dd
+Create Date: 2026-10-17 09:12:30.114520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7b2d41'
+down_revision = '889acf7a64dd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('storage_balances',
+    sa.Column('storage_id', sa.String(length=20), nullable=False),
+    sa.Column('item_id', sa.String(length=50), nullable=False),
+    sa.Column('source_no', sa.String(length=50), nullable=False),
+    sa.Column('source_line', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['storage_id'], ['storages.storage_id'], ),
+    sa.PrimaryKeyConstraint('storage_id', 'item_id', 'source_no', 'source_line')
+    )
+    with op.batch_alter_table('storage_balances', schema=None) as batch_op:
+        batch_op.create_index('idx_storage_balances_storage_qty', ['storage_id', 'quantity'], unique=False)
+        batch_op.create_index('idx_storage_balances_item', ['item_id'], unique=False)
+
+    # Backfill from the existing ledger; `flask storage-balances` verifies afterwards
+    op.execute("""
+        INSERT INTO storage_balances (storage_id, item_id, source_no, source_line, quantity, updated_at)
+        SELECT storage_id,
+               item_id,
+               COALESCE(source_no, ''),
+               COALESCE(source_line, -1),
+               SUM(CASE WHEN operation_type = 'in' THEN quantity ELSE -quantity END),
+               CURRENT_TIMESTAMP
+        FROM storage_history
+        GROUP BY storage_id, item_id, COALESCE(source_no, ''), COALESCE(source_line, -1)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('storage_balances', schema=None) as batch_op:
+        batch_op.drop_index('idx_storage_balances_item')
+        batch_op.drop_index('idx_storage_balances_storage_qty')
+
+    op.drop_table('storage_balances')
@@ -0,0 +1,55 @@
+"""Add document_sequences per-day number counters
+
+Revision ID: a7d2e5c9f013
+Revises: 3f1c9a7b2d41
+Create Date: 2026-10-17 11:40:02.508113
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2e5c9f013'
+down_revision = '3f1c9a7b2d41'
+branch_labels = None
+depends_on = None
+
+# Existing numbers look like <CODE><YYYYMMDD><sequence>
+NUMBER_PATTERN = re.compile(r'^(REQ|PO|CONSOL|CONS)(\d{8})(\d+)$')
+NUMBER_SOURCES = (
+    ('request_orders', 'request_order_no'),
+    ('purchase_orders', 'purchase_order_no'),
+    ('shipment_consolidations', 'consolidation_id'),
+)
+
+
+def upgrade():
+    sequences = op.create_table('document_sequences',
+    sa.Column('prefix', sa.String(length=30), nullable=False),
+    sa.Column('last_value', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('prefix')
+    )
+
+    # Seed counters from existing documents so new numbers continue after them
+    connection = op.get_bind()
+    last_values = {}
+    for table, column in NUMBER_SOURCES:
+        for (number,) in connection.execute(sa.text(f"SELECT {column} FROM {table}")):
+            match = NUMBER_PATTERN.match(number or '')
+            if match:
+                prefix = match.group(1) + match.group(2)
+                last_values[prefix] = max(last_values.get(prefix, 0), int(match.group(3)))
+
+    if last_values:
+        op.bulk_insert(sequences, [
+            {'prefix': prefix, 'last_value': value}
+            for prefix, value in sorted(last_values.items())
+        ])
+
+
+def downgrade():
+    op.drop_table('document_sequences')
@@ -86,6 +86,14 @@ celery_app.conf.update(
             'task': 'erp.tasks.maintenance.backup_critical_data',
             'schedule': crontab(hour=23, minute=0),  # 11:00 PM daily
         },
+        'verify-project-expenditures': {
+            'task': 'erp.tasks.maintenance.verify_project_expenditures',
+            'schedule': crontab(hour=4, minute=0),  # 4:00 AM daily
+        },
+        'fix-requisition-status': {
+            'task': 'erp.tasks.maintenance.fix_requisition_status',
+            'schedule': crontab(minute=15),  # Hourly at :15
+        },
     },
 )
 
@@ -554,6 +562,62 @@ def backup_critical_data(self) -> TaskResult:
         logger.error(f"Failed to backup critical data: {exc}")
         return TaskResult(success=False, error=str(exc))
 
+@celery_app.task(bind=True, name='erp.tasks.maintenance.verify_project_expenditures')
+def verify_project_expenditures(self) -> TaskResult:
+    """Recompute project expenditures from scratch and report ledger drift"""
+    try:
+        from app.models import Project
+        
+        report = Project.verify_expenditures(fix=False)
+        if report['drift_count']:
+            logger.warning(f"Project expenditure drift: {report['drift_count']} entries, "
+                           f"first: {report['drift'][:5]}")
+        
+        store_report.delay('project_expenditure_drift', {
+            'timestamp': datetime.utcnow().isoformat(),
+            'projects_checked': report['projects_checked'],
+            'drift_count': report['drift_count'],
+            'drift': report['drift'][:100]
+        })
+        
+        return TaskResult(success=True, data={
+            'projects_checked': report['projects_checked'],
+            'drift_count': report['drift_count']
+        })
+        
+    except Exception as exc:
+        logger.error(f"Failed to verify project expenditures: {exc}")
+        return TaskResult(success=False, error=str(exc))
+
+@celery_app.task(bind=True, name='erp.tasks.maintenance.fix_requisition_status')
+def fix_requisition_status(self) -> TaskResult:
+    """Move requisitions whose items are all reviewed to 'reviewed' and report the run"""
+    try:
+        from app.services import status_consistency
+        
+        report = status_consistency.run_check(fix=True)
+        if report['fixed']:
+            logger.warning(f"Fixed {report['fixed']} requisitions stuck in submitted, first: "
+                           f"{[problem['request_order_no'] for problem in report['problems'][:5]]}")
+        
+        store_report.delay('requisition_status_consistency', {
+            'timestamp': report['checked_at'],
+            'problem_count': report['problem_count'],
+            'fixed': report['fixed'],
+            'duration_ms': report['duration_ms'],
+            'requisitions': [problem['request_order_no'] for problem in report['problems'][:100]]
+        })
+        
+        return TaskResult(success=True, data={
+            'problem_count': report['problem_count'],
+            'fixed': report['fixed'],
+            'duration_ms': report['duration_ms']
+        })
+        
+    except Exception as exc:
+        logger.error(f"Failed to fix requisition statuses: {exc}")
+        return TaskResult(success=False, error=str(exc))
+
 # ================================
 # UTILITY TASKS
 # ================================
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark the accounting dashboard summaries at scale.
+
+Seeds --pos purchase orders spread over billing statuses, purchase statuses
+and payment methods. It times three ways of building the summaries:
+- the previous per-status COUNT/SUM queries
+- the single GROUP BY pass, uncached
+- the GROUP BY pass served from cache
+Then it checks that both endpoints return exactly the previous payloads and
+that a payment update invalidates the cache.
+
+Usage:
+    python performance/benchmark_accounting_summary.py [--pos 100000] [--database-url URL]
+"""
+
+import argparse
+import sys
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url, ensure_bench_user, print_table, time_call
+)
+
+PREFIX = 'ACS'
+BILLING_STATUSES = ('none', 'pending', 'billed', 'paid', None)
+PURCHASE_STATUSES = ('purchased', 'purchased', 'order_created', 'shipped')
+PAYMENT_METHODS = ('remittance', 'check', 'cash', None)
+
+
+def seed(creator_id, count):
+    from app import db
+    from app.models import Supplier, PurchaseOrder
+
+    db.session.add(Supplier(supplier_id=f'{PREFIX}SUP', supplier_name_zh=f'{PREFIX} supplier',
+                            supplier_region='domestic'))
+    db.session.flush()
+
+    batch = []
+    for index in range(count):
+        batch.append({
+            'purchase_order_no': f'{PREFIX}{index:07d}',
+            'supplier_id': f'{PREFIX}SUP',
+            'supplier_name': f'{PREFIX} supplier',
+            'creator_id': creator_id,
+            'purchase_status': PURCHASE_STATUSES[index % len(PURCHASE_STATUSES)],
+            'billing_status': BILLING_STATUSES[index % len(BILLING_STATUSES)],
+            'payment_method': PAYMENT_METHODS[index % len(PAYMENT_METHODS)],
+            'grand_total_int': 100 + index % 997
+        })
+        if len(batch) == 10000:
+            db.session.execute(PurchaseOrder.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(PurchaseOrder.__table__.insert(), batch)
+    db.session.commit()
+
+
+def legacy_summaries():
+    """The previous endpoints: one COUNT or SUM query per status and method"""
+    from app import db
+    from app.models import PurchaseOrder
+
+    def total(*criteria):
+        count = PurchaseOrder.query.filter(*criteria).count()
+        amount = db.session.query(db.func.sum(PurchaseOrder.grand_total_int)).filter(*criteria).scalar() or 0
+        return {'count': count, 'amount': amount}
+
+    purchased = PurchaseOrder.purchase_status == 'purchased'
+    unpaid = total(PurchaseOrder.billing_status == 'none', purchased)
+    billed = total(PurchaseOrder.billing_status == 'billed')
+    paid = total(PurchaseOrder.billing_status == 'paid')
+    accounting = {
+        'unpaid': unpaid, 'billed': billed, 'paid': paid,
+        'total': {'count': unpaid['count'] + billed['count'] + paid['count'],
+                  'amount': unpaid['amount'] + billed['amount'] + paid['amount']}
+    }
+
+    payment_unpaid = total(purchased, PurchaseOrder.billing_status != 'paid')
+    by_method = {
+        method: total(PurchaseOrder.billing_status == 'paid', PurchaseOrder.payment_method == method)['amount']
+        for method in ('remittance', 'check')
+    }
+    payment = {
+        'unpaid': payment_unpaid,
+        'paid': {'count': paid['count'], 'amount': paid['amount'], 'by_method': by_method},
+        'total': {'count': payment_unpaid['count'] + paid['count'],
+                  'amount': payment_unpaid['amount'] + paid['amount']}
+    }
+    return accounting, payment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pos', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('accounting_summary'))
+
+    from app import db
+    from app.services import billing_summary
+
+    with app.app_context():
+        user = ensure_bench_user()
+        headers = auth_headers(user)
+        seed(user.user_id, args.pos)
+        engine = db.engine
+
+        def uncached():
+            billing_summary.invalidate()
+            return billing_summary.accounting_summary(), billing_summary.payment_summary()
+
+        rows = []
+        for label, build in (('per-status', legacy_summaries), ('group-by', uncached),
+                             ('cached', lambda: (billing_summary.accounting_summary(),
+                                                 billing_summary.payment_summary()))):
+            build()
+            with count_queries(engine) as statements:
+                build()
+            timing = time_call(build, repeat=args.repeat)
+            rows.append({'variant': label, 'median_ms': timing['median_ms'], 'statements': len(statements)})
+        expected_accounting, expected_payment = legacy_summaries()
+        billing_summary.invalidate()
+        db.session.remove()
+
+    print_table(f'Accounting + payment summaries over {args.pos} POs', rows,
+                ['variant', 'median_ms', 'statements'])
+
+    client = app.test_client()
+    failures = []
+    accounting = client.get('/api/v1/accounting/reports/summary', headers=headers).get_json()
+    payment = client.get('/api/v1/accounting/payment-management/summary', headers=headers).get_json()
+    if accounting != expected_accounting or payment != expected_payment:
+        failures.append('summaries differ from the per-status queries')
+
+    # Paying an unpaid purchased PO must show up immediately
+    unpaid_po = f'{PREFIX}{0:07d}'
+    client.post('/api/v1/accounting/payment-management/update-payment', headers=headers,
+                json={'purchase_order_nos': [unpaid_po], 'payment_method': 'remittance'})
+    after = client.get('/api/v1/accounting/payment-management/summary', headers=headers).get_json()
+    if after['paid']['count'] != payment['paid']['count'] + 1:
+        failures.append('payment update did not invalidate the cached summary')
+
+    if failures:
+        print('\nFAILED')
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print('\nOK: identical payloads, invalidated on payment update')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark the batch PO export.
+
+Seeds --pos purchase orders with --lines items each and compares:
+- sequential: one POST /api/v1/po/<po>/export per PO, as the UI did
+- batch: POST /api/v1/po/export/batch, rendered by --workers processes
+  (cold export cache), then once more with every document cached
+The zip is consumed chunk by chunk and checked: one file per PO in request
+order plus manifest.json, and every PO moved from order_created to
+outputted by the batch. Throughput is reported in POs/sec.
+
+Usage:
+    python performance/benchmark_batch_export.py [--pos 200] [--lines 20] [--workers 1 2 4]
+        [--format excel] [--database-url URL]
+"""
+
+import argparse
+import io
+import json
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+from benchmark_support import (
+    auth_headers, create_bench_app, default_sqlite_url, ensure_bench_user, print_table, seed_purchase_chain
+)
+
+PREFIX = 'BEX'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pos', type=int, default=200)
+    parser.add_argument('--lines', type=int, default=20)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--format', default='excel', choices=['excel', 'html', 'pdf'])
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('batch_export'))
+    cache_dir = tempfile.mkdtemp(prefix='erp_batch_export_')
+    app.config['EXPORT_CACHE_DIR'] = cache_dir
+
+    from app import db
+    from app.models import PurchaseOrder
+    from app.services import po_batch_export
+
+    with app.app_context():
+        user = ensure_bench_user()
+        headers = auth_headers(user)
+        po_numbers = seed_purchase_chain(user.user_id, PREFIX, args.pos, args.lines,
+                                         purchase_status='order_created')
+
+    client = app.test_client()
+
+    def reset():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        with app.app_context():
+            PurchaseOrder.query.filter(PurchaseOrder.purchase_order_no.in_(po_numbers)).update(
+                {'purchase_status': 'order_created'}, synchronize_session=False
+            )
+            db.session.commit()
+
+    def statuses():
+        with app.app_context():
+            return {status for (status,) in db.session.query(PurchaseOrder.purchase_status).filter(
+                PurchaseOrder.purchase_order_no.in_(po_numbers)
+            ).distinct()}
+
+    def sequential():
+        for po_no in po_numbers:
+            response = client.post(f'/api/v1/po/{po_no}/export', json={'format': args.format}, headers=headers)
+            if response.status_code != 200:
+                print(f"Export of {po_no} failed: {response.status_code}")
+                sys.exit(1)
+
+    def batch():
+        response = client.post('/api/v1/po/export/batch', json={
+            'format': args.format, 'purchase_order_nos': po_numbers
+        }, headers=headers, buffered=False)
+        if response.status_code != 200:
+            print(f"Batch export failed: {response.status_code} {response.get_data(as_text=True)[:300]}")
+            sys.exit(1)
+        body = io.BytesIO()
+        largest_chunk = 0
+        for chunk in response.response:
+            largest_chunk = max(largest_chunk, len(chunk))
+            body.write(chunk)
+        response.close()
+        with zipfile.ZipFile(body) as archive:
+            names = archive.namelist()
+            manifest = json.loads(archive.read('manifest.json'))
+        extension = po_batch_export.FORMATS[args.format][1]
+        if names != [f'PO_{po_no}.{extension}' for po_no in po_numbers] + ['manifest.json']:
+            print("Zip does not contain one file per PO in request order")
+            sys.exit(1)
+        return manifest, largest_chunk
+
+    rows = []
+    reset()
+    started = time.perf_counter()
+    sequential()
+    elapsed = time.perf_counter() - started
+    rows.append({'variant': 'sequential', 'workers': 1, 'seconds': round(elapsed, 2),
+                 'POs/sec': round(args.pos / elapsed, 1)})
+
+    for workers in args.workers:
+        reset()
+        app.config['EXPORT_BATCH_WORKERS'] = workers
+        po_batch_export._pool = None
+        # Start the workers outside the timing, as a long-running server would have them
+        with app.app_context():
+            pool = po_batch_export._get_pool()
+        list(pool.map(abs, range(workers * 4)))
+
+        started = time.perf_counter()
+        manifest, largest_chunk = batch()
+        elapsed = time.perf_counter() - started
+        if statuses() != {'outputted'}:
+            print(f"Batch export did not record every export: {statuses()}")
+            sys.exit(1)
+        rows.append({'variant': 'batch (cold)', 'workers': workers, 'seconds': round(elapsed, 2),
+                     'POs/sec': round(args.pos / elapsed, 1), 'rendered': manifest['rendered'],
+                     'largest chunk': largest_chunk})
+
+        started = time.perf_counter()
+        manifest, largest_chunk = batch()
+        elapsed = time.perf_counter() - started
+        rows.append({'variant': 'batch (cached)', 'workers': workers, 'seconds': round(elapsed, 2),
+                     'POs/sec': round(args.pos / elapsed, 1), 'rendered': manifest['rendered'],
+                     'largest chunk': largest_chunk})
+        pool.shutdown()
+
+    print_table(f"{args.format} export of {args.pos} POs x {args.lines} lines", rows,
+                ['variant', 'workers', 'seconds', 'POs/sec', 'rendered', 'largest chunk'])
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
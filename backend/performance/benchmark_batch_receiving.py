@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark for POST /api/v1/receiving/batch-confirm.
+
+Seeds consolidation-sized shipments (several POs feeding one project),
+confirms every line in one request and reports wall time, SQL statement
+count and the endpoint's own per-phase timings (?debug=1). The statement
+count should stay flat as the number of lines grows.
+
+Usage:
+    python performance/benchmark_batch_receiving.py [--lines 30,300] [--database-url URL]
+"""
+
+import argparse
+import time
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url,
+    ensure_bench_user, print_table, seed_purchase_chain
+)
+
+LINES_PER_PO = 30
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', default='30,300', help='Comma-separated shipment sizes (lines)')
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('batch_receiving'))
+
+    from app import db
+    from app.models import PurchaseOrderItem
+
+    rows = []
+    with app.app_context():
+        user = ensure_bench_user()
+        operator_id = user.user_id
+        headers = auth_headers(user)
+        client = app.test_client()
+
+        for run, lines in enumerate(int(value) for value in args.lines.split(',')):
+            po_count = max(1, lines // LINES_PER_PO)
+            prefix = f'BR{run}'
+            po_numbers = seed_purchase_chain(
+                operator_id, prefix, po_count, LINES_PER_PO, project_id=f'{prefix}PRJ'
+            )
+            items = [
+                {
+                    'item_id': item.detail_id,
+                    'purchase_order_number': item.purchase_order_no,
+                    'requisition_number': item.source_request_order_no
+                }
+                for item in PurchaseOrderItem.query.filter(
+                    PurchaseOrderItem.purchase_order_no.in_(po_numbers)
+                ).all()
+            ]
+            db.session.remove()
+
+            start = time.perf_counter()
+            with count_queries(db.engine) as statements:
+                response = client.post('/api/v1/receiving/batch-confirm?debug=1', headers=headers, json={
+                    'items': items,
+                    'receiver': 'Benchmark',
+                    'received_at': '2024-01-15T08:00:00Z'
+                })
+            elapsed = (time.perf_counter() - start) * 1000
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+            body = response.get_json()
+            row = {
+                'lines': len(items),
+                'confirmed': body['confirmed_count'],
+                'queries': len(statements),
+                'wall_ms': round(elapsed, 2)
+            }
+            row.update(body.get('timings_ms', {}))
+            rows.append(row)
+
+    print_table(
+        'batch-confirm',
+        rows,
+        ['lines', 'confirmed', 'queries', 'wall_ms', 'prefetch', 'insert', 'po_status', 'commit']
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Benchmark month-end billing and payment runs over many POs.
+
+Seeds --pos purchased, unbilled POs for one supplier and runs the run
+three times, each time through the endpoints:
+- billing: POST /accounting/billing
+- batch payment: POST /accounting/billing/<supplier>-<month>/mark-paid
+- manual payment: POST /accounting/payment-management/update-payment, on
+  a second PO set
+Each step is compared with the previous per-PO loop (one SELECT per PO,
+then one UPDATE per changed row at flush) on an identical PO set.
+
+It also checks idempotency:
+- a retry with the same Idempotency-Key replays the original response
+- a retry sent while the original still runs gets 409, or the original's
+  response if it finishes within the wait
+- reusing a key with a different body is rejected with 422
+- a retry without a key reports the POs as already paid
+
+Usage:
+    python performance/benchmark_bulk_billing.py [--pos 500] [--database-url URL]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from datetime import date
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url, ensure_bench_user, print_table
+)
+
+PREFIX = 'BLB'
+SUPPLIER = f'{PREFIX}SUP'
+MONTH = '2024-07'
+
+
+def seed(creator_id, count):
+    """Three identical PO sets: legacy, bulk billing, manual payment"""
+    from app import db
+    from app.models import Supplier, PurchaseOrder
+
+    db.session.add(Supplier(supplier_id=SUPPLIER, supplier_name_zh=f'{PREFIX} supplier', supplier_region='domestic'))
+    db.session.flush()
+    sets = {name: [f'{PREFIX}{name}{index:06d}' for index in range(count)] for name in ('L', 'B', 'M')}
+    db.session.execute(PurchaseOrder.__table__.insert(), [{
+        'purchase_order_no': po_no,
+        'supplier_id': SUPPLIER,
+        'supplier_name': f'{PREFIX} supplier',
+        'creator_id': creator_id,
+        'purchase_status': 'purchased',
+        'billing_status': 'none',
+        'subtotal_int': 1000,
+        'tax_decimal1': 50,
+        'grand_total_int': 1050
+    } for po_numbers in sets.values() for po_no in po_numbers])
+    db.session.commit()
+    return sets
+
+
+def legacy_run(po_numbers):
+    """The previous loops: bill, pay the batch, then pay again through update-payment"""
+    from app import db
+    from app.models import PurchaseOrder
+
+    timings = {}
+    started = time.perf_counter()
+    pos = [PurchaseOrder.query.filter_by(purchase_order_no=po_no, supplier_id=SUPPLIER,
+                                         billing_status='none').first() for po_no in po_numbers]
+    for po in pos:
+        po.billing_status = 'billed'
+        po.billed_month = '1999-01'
+    db.session.commit()
+    timings['billing'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for po in PurchaseOrder.query.filter(PurchaseOrder.supplier_id == SUPPLIER, PurchaseOrder.billed_month == '1999-01',
+                                         PurchaseOrder.billing_status == 'billed').all():
+        po.billing_status = 'paid'
+        po.payment_method = 'remittance'
+    db.session.commit()
+    timings['batch payment'] = time.perf_counter() - started
+
+    PurchaseOrder.query.filter(PurchaseOrder.purchase_order_no.in_(po_numbers)).update(
+        {'billing_status': 'billed'}, synchronize_session=False)
+    db.session.commit()
+    started = time.perf_counter()
+    for po_no in po_numbers:
+        po = db.session.get(PurchaseOrder, po_no)
+        if po and po.billing_status != 'paid':
+            po.billing_status = 'paid'
+            po.payment_method = 'check'
+            po.payment_date = date.today()
+    db.session.commit()
+    timings['manual payment'] = time.perf_counter() - started
+    return timings
+
+
+def check_in_flight_duplicate(app, client, headers, user_id, step):
+    """A retry sent while the original request still runs must not run again"""
+    from app.services import billing_engine
+    from app.utils.cache import ERPCache
+
+    label, url, body = step
+    failures = []
+    key = f'{PREFIX}-in-flight'
+    stored_key = billing_engine._idempotency_key('update_payment', user_id, key)
+    marker = {'fingerprint': billing_engine._fingerprint(body), 'in_progress': True}
+    billing_engine.IN_PROGRESS_WAIT = 0.5
+
+    # The original request has claimed the key and is still running
+    ERPCache.reserve_idempotency_key(stored_key, marker, 60)
+    response = client.post(url, json=body, headers={'Idempotency-Key': key, **headers})
+    if response.status_code != 409:
+        failures.append(f'{label}: duplicate of a running request got {response.status_code}, expected 409')
+
+    # The original finishes while the duplicate waits: the duplicate replays it
+    payload = {'message': 'original response'}
+    timer = threading.Timer(0.2, lambda: ERPCache.cache_idempotent_response(
+        stored_key, {**marker, 'in_progress': False, 'payload': payload, 'status_code': 200}))
+    timer.start()
+    response = client.post(url, json=body, headers={'Idempotency-Key': key, **headers})
+    timer.join()
+    if response.status_code != 200 or response.get_json() != payload:
+        failures.append(f'{label}: duplicate waiting for a running request did not replay its response')
+    print(f"in-flight duplicate: 409 while running, original response replayed once it finished")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pos', type=int, default=500)
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('bulk_billing'))
+
+    from app import db
+
+    with app.app_context():
+        user = ensure_bench_user()
+        user_id = user.user_id
+        headers = auth_headers(user)
+        sets = seed(user.user_id, args.pos)
+        engine = db.engine
+        with count_queries(engine) as legacy_statements:
+            legacy = legacy_run(sets['L'])
+        db.session.remove()
+
+    client = app.test_client()
+    steps = (
+        ('billing', '/api/v1/accounting/billing',
+         {'supplier_id': SUPPLIER, 'month': MONTH, 'term': 30, 'po_list': sets['B']}),
+        ('batch payment', f'/api/v1/accounting/billing/{SUPPLIER}-{MONTH}/mark-paid',
+         {'method': 'remittance', 'pay_date': '2024-08-30'}),
+        ('manual payment', '/api/v1/accounting/payment-management/update-payment',
+         {'purchase_order_nos': sets['M'], 'payment_method': 'check'}),
+    )
+    failures = []
+    rows = []
+    for index, (label, url, body) in enumerate(steps):
+        key = {'Idempotency-Key': f'{PREFIX}-{index}', **headers}
+        with count_queries(engine) as statements:
+            started = time.perf_counter()
+            response = client.post(url, json=body, headers=key)
+            elapsed = time.perf_counter() - started
+        if response.status_code not in (200, 201):
+            failures.append(f'{label}: {response.status_code} {response.get_data(as_text=True)[:200]}')
+            continue
+        rows.append({'step': label, 'legacy_ms': round(legacy[label] * 1000, 1), 'bulk_ms': round(elapsed * 1000, 1),
+                     'bulk_statements': len(statements)})
+
+        with count_queries(engine) as replay_statements:
+            replayed = client.post(url, json=body, headers=key)
+        if replayed.get_json() != response.get_json() or replayed.status_code != response.status_code:
+            failures.append(f'{label}: retry with the same Idempotency-Key did not replay the response')
+        if any(statement.lstrip().upper().startswith('UPDATE') for statement in replay_statements):
+            failures.append(f'{label}: replay issued an UPDATE')
+        if client.post(url, json={**body, 'extra': 1}, headers=key).status_code != 422:
+            failures.append(f'{label}: reused Idempotency-Key with another body was not rejected')
+
+    failures.extend(check_in_flight_duplicate(app, client, headers, user_id, steps[2]))
+
+    outcomes = client.post(steps[2][1], json=steps[2][2], headers=headers).get_json()['outcomes']
+    if {outcome['outcome'] for outcome in outcomes} != {'already_paid'}:
+        failures.append('retry without a key paid POs again')
+
+    with app.app_context():
+        from app.models import PurchaseOrder
+        paid = PurchaseOrder.query.filter(PurchaseOrder.billing_status == 'paid',
+                                          PurchaseOrder.supplier_id == SUPPLIER).count()
+        if paid != 3 * args.pos:
+            failures.append(f'{paid} POs paid, expected {3 * args.pos}')
+
+    print_table(f'Billing run over {args.pos} POs (legacy total {len(legacy_statements)} statements)', rows,
+                ['step', 'legacy_ms', 'bulk_ms', 'bulk_statements'])
+
+    if failures:
+        print('\nFAILED')
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print('\nOK: set-based updates, replayed retries, no double payment')
+
+
+if __name__ == '__main__':
+    main()
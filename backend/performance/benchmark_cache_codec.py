@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cache payload codec on the largest cached payloads.
+
+Builds the supplier list (Supplier.to_dict() for --suppliers suppliers) and
+the storage tree (--shelves shelves of 36 bins), then compares the JSON
+blobs stored before the codec with each codec configuration available
+here (msgpack / orjson / zstd only when installed):
+- bytes stored in Redis and sent over the network per read or write
+- encode and decode time per payload
+Every configuration must round-trip to the same value as the legacy JSON
+path. With --redis-url the payloads are also written to Redis and its
+MEMORY USAGE is reported.
+
+Usage:
+    python performance/benchmark_cache_codec.py [--suppliers 2000] [--shelves 20]
+        [--redis-url redis://localhost:6379/15] [--database-url URL]
+"""
+
+import argparse
+import json
+import sys
+
+from benchmark_support import (
+    create_bench_app, default_sqlite_url, ensure_bench_user, print_table, time_call
+)
+from check_storage_query_counts import seed_warehouse
+
+
+def seed_suppliers(db, count):
+    from app.models import Supplier
+
+    db.session.add_all([Supplier(
+        supplier_id=f'CDC{index:05d}',
+        supplier_name_zh=f'測試供應商 {index} 股份有限公司',
+        supplier_name_en=f'Codec Supplier {index} Co., Ltd.',
+        supplier_address=f'台北市信義區松仁路 {index} 號 {index % 30} 樓',
+        supplier_phone=f'02-2{index:07d}',
+        supplier_email=f'sales{index}@supplier{index}.example.com',
+        supplier_contact_person=f'王小明 {index}',
+        supplier_tax_id=f'{index:08d}',
+        supplier_region='domestic' if index % 3 else 'international',
+        supplier_remark='月結 60 天, 需附發票' if index % 2 else None,
+        payment_terms='NET60',
+        bank_account=f'012-{index:012d}'
+    ) for index in range(count)])
+    db.session.commit()
+    return [supplier.to_dict() for supplier in Supplier.query.order_by(Supplier.supplier_id)]
+
+
+def codecs():
+    from cache import codec as codec_module
+    from cache.codec import CacheCodec
+
+    variants = {'json': CacheCodec('json', 'none'), 'json+zlib': CacheCodec('json', 'zlib')}
+    if codec_module.zstandard is not None:
+        variants['json+zstd'] = CacheCodec('json', 'zstd')
+    for serializer in ('msgpack', 'orjson'):
+        if getattr(codec_module, serializer) is None:
+            print(f"{serializer} not installed, skipped")
+            continue
+        variants[serializer] = CacheCodec(serializer, 'none')
+        variants[f'{serializer}+zlib'] = CacheCodec(serializer, 'zlib')
+        if codec_module.zstandard is not None:
+            variants[f'{serializer}+zstd'] = CacheCodec(serializer, 'zstd')
+    variants['auto'] = CacheCodec()
+    return variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suppliers', type=int, default=2000)
+    parser.add_argument('--shelves', type=int, default=20)
+    parser.add_argument('--redis-url', default=None)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('cache_codec'))
+
+    from app import db
+    from app.services import storage_tree
+
+    with app.app_context():
+        user = ensure_bench_user()
+        payloads = {'supplier list': seed_suppliers(db, args.suppliers)}
+        seed_warehouse(db, user.user_id, args.shelves)
+        payloads['storage tree'] = storage_tree.get_storage_tree()[0]
+
+    redis_client = None
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url)
+
+    rows = []
+    for name, value in payloads.items():
+        # What CacheManager stored before the codec
+        legacy = json.dumps(value, default=str).encode('utf-8')
+        expected = json.loads(legacy)
+        variants = [('legacy json', lambda: json.dumps(value, default=str).encode('utf-8'), json.loads)]
+        for label, codec in codecs().items():
+            variants.append((label, lambda codec=codec: codec.encode(value, 'bench'),
+                             lambda data, codec=codec: codec.decode(data, 'bench')))
+
+        for label, encode, decode in variants:
+            data = encode()
+            if json.loads(json.dumps(decode(data), default=str)) != expected:
+                print(f"{name} / {label}: decoded value differs from the legacy JSON value")
+                sys.exit(1)
+            row = {
+                'payload': name,
+                'codec': label,
+                'bytes': len(data),
+                'vs_legacy': f'{len(data) / len(legacy):.0%}',
+                'encode_ms': time_call(encode, repeat=5)['median_ms'],
+                'decode_ms': time_call(lambda: decode(data), repeat=5)['median_ms']
+            }
+            if redis_client is not None:
+                redis_client.set('erp:codec_bench', data)
+                row['redis_memory'] = redis_client.memory_usage('erp:codec_bench')
+                redis_client.delete('erp:codec_bench')
+            rows.append(row)
+
+    columns = ['payload', 'codec', 'bytes', 'vs_legacy', 'encode_ms', 'decode_ms']
+    if redis_client is not None:
+        columns.append('redis_memory')
+    print_table(f"{args.suppliers} suppliers, {args.shelves * 36} storage bins", rows, columns)
+
+    # Entries written before the codec, or by a newer codec version
+    import pickle
+    from cache.codec import FORMAT_VERSION, MAGIC
+    from app.utils.cache import cache_manager
+
+    legacy_json = json.dumps({'total': 3}).encode('utf-8')
+    legacy_pickle = pickle.dumps(('a', 1))
+    newer = MAGIC + bytes((FORMAT_VERSION + 1, 1, 0)) + b'{}'
+    results = {
+        'legacy JSON entry': cache_manager._deserialize(legacy_json) == {'total': 3},
+        'legacy pickle entry': cache_manager._deserialize(legacy_pickle) == ('a', 1),
+        'newer codec version is a miss': cache_manager._deserialize(newer) is None
+    }
+    print()
+    for label, passed in results.items():
+        print(f"{'ok  ' if passed else 'FAIL'} {label}")
+    if not all(results.values()):
+        sys.exit(1)
+
+    print(f"\nCacheManager codec: {cache_manager.codec.get_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Load test: origin queries when a hot cache key expires.
+
+--threads callers read one key whose origin query takes --origin-ms.
+Each strategy is run in two scenarios:
+- expiry: the key has just expired and every caller arrives at once
+- sustained: callers read the key in a loop for --seconds while it
+  expires every --ttl seconds
+The strategies are:
+- naive: get, and on a miss run the query and set (the old cache_result)
+- single-flight: CacheManager.get_or_compute without a stale window
+- swr: get_or_compute with a stale window, plus early refresh
+The report shows the origin queries run and the caller latency.
+
+Without --redis-url the CacheManager runs on its in-process fallback, so
+the callers are threads of one worker. With a Redis URL the recompute lock
+is shared by every process using that Redis.
+
+Usage:
+    python performance/benchmark_cache_stampede.py [--threads 64] [--origin-ms 50]
+        [--seconds 5] [--ttl 1] [--redis-url redis://localhost:6379/15]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmark_support import print_table  # noqa: E402
+from app.utils.cache import CacheManager  # noqa: E402
+
+NAMESPACE = 'stampede'
+
+
+class Origin:
+    """Stand-in for a heavy dashboard query that counts its executions"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.seconds)
+        return {'total': 42, 'computed_at': time.time()}
+
+
+def naive_read(manager, key, origin, ttl):
+    value = manager.get(NAMESPACE, key)
+    if value is None:
+        value = origin()
+        manager.set(NAMESPACE, key, value, ttl)
+    return value
+
+
+def strategies(manager, ttl):
+    return {
+        'naive': lambda key, origin: naive_read(manager, key, origin, ttl),
+        'single-flight': lambda key, origin: manager.get_or_compute(NAMESPACE, key, origin, ttl),
+        'swr': lambda key, origin: manager.get_or_compute(NAMESPACE, key, origin, ttl, stale_ttl=ttl * 10)
+    }
+
+
+def run_threads(threads, target):
+    barrier = threading.Barrier(threads)
+    latencies = []
+    latency_lock = threading.Lock()
+
+    def worker():
+        barrier.wait()
+        samples = target()
+        with latency_lock:
+            latencies.extend(samples)
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies
+
+
+def timed(read, key, origin):
+    started = time.perf_counter()
+    read(key, origin)
+    return (time.perf_counter() - started) * 1000
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    return {
+        'reads': len(ordered),
+        'p50_ms': round(statistics.median(ordered), 2),
+        'p99_ms': round(ordered[int(len(ordered) * 0.99) - 1], 2),
+        'max_ms': round(ordered[-1], 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--origin-ms', type=float, default=50)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--ttl', type=int, default=1)
+    parser.add_argument('--redis-url', default='redis://127.0.0.1:1/0')
+    args = parser.parse_args()
+
+    manager = CacheManager(args.redis_url)
+    print(f"Redis available: {manager.is_available()}")
+    manager.invalidate_pattern(f'{NAMESPACE}:*')
+
+    rows = []
+    for name, read in strategies(manager, args.ttl).items():
+        # Expiry: prime the key, let it expire, release every caller at once
+        key = f'{name}:expiry'
+        origin = Origin(args.origin_ms / 1000)
+        read(key, origin)
+        time.sleep(args.ttl + 0.1)
+        origin.calls = 0
+        latencies = run_threads(args.threads, lambda: [timed(read, key, origin)])
+        rows.append({'strategy': name, 'scenario': 'expiry', 'origin_calls': origin.calls, **summary(latencies)})
+
+        # Sustained: the key expires repeatedly under constant load
+        key = f'{name}:sustained'
+        origin = Origin(args.origin_ms / 1000)
+        deadline = time.monotonic() + args.seconds
+
+        def loop():
+            samples = []
+            while time.monotonic() < deadline:
+                samples.append(timed(read, key, origin))
+                time.sleep(0.005)
+            return samples
+
+        latencies = run_threads(args.threads, loop)
+        rows.append({'strategy': name, 'scenario': f'{args.seconds:g}s sustained', 'origin_calls': origin.calls,
+                     **summary(latencies)})
+
+    print_table(f"{args.threads} callers, origin {args.origin_ms:g} ms, ttl {args.ttl}s", rows,
+                ['strategy', 'scenario', 'origin_calls', 'reads', 'p50_ms', 'p99_ms', 'max_ms'])
+    print(f"\nCounters: {manager.stats}")
+    manager.invalidate_pattern(f'{NAMESPACE}:*')
+
+
+if __name__ == '__main__':
+    main()
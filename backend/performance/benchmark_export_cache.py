@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark the PO export artifact cache.
+
+Seeds one purchase order with --lines items and exports it through
+POST /api/v1/po/<po>/export as Excel and HTML:
+- cold: every request renders (the artifact cache is cleared first)
+- cached: the artifact is served from disk by content hash
+Every export returns the document, since a POST is never revalidated. It
+then checks that the ETag is stable, that editing a line changes it, that
+the directory is pruned to EXPORT_CACHE_MAX_BYTES, and that the logo is
+decoded once per process.
+
+Usage:
+    python performance/benchmark_export_cache.py [--lines 40] [--repeat 10] [--database-url URL]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmark_support import (
+    auth_headers, create_bench_app, default_sqlite_url, ensure_bench_user, print_table,
+    seed_purchase_chain, time_call
+)
+
+PREFIX = 'XCA'
+
+
+def clear_cache(directory):
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('export_cache'))
+    cache_dir = tempfile.mkdtemp(prefix='erp_export_cache_')
+    app.config['EXPORT_CACHE_DIR'] = cache_dir
+
+    from app import db
+    from app.models import PurchaseOrderItem
+    from app.services import export_cache, po_assets
+
+    with app.app_context():
+        user = ensure_bench_user()
+        headers = auth_headers(user)
+        po_no = seed_purchase_chain(user.user_id, PREFIX, 1, args.lines, purchase_status='order_created')[0]
+
+    client = app.test_client()
+    url = f'/api/v1/po/{po_no}/export'
+
+    def export(fmt, extra_headers=None):
+        response = client.post(url, json={'format': fmt}, headers={**headers, **(extra_headers or {})})
+        if response.status_code != 200:
+            print(f"{fmt} export failed: {response.status_code} {response.get_data(as_text=True)[:200]}")
+            sys.exit(1)
+        return response
+
+    rows = []
+    etags = {}
+    for fmt in ('excel', 'html'):
+        def cold():
+            clear_cache(cache_dir)
+            export(fmt)
+
+        cold_stats = time_call(cold, repeat=args.repeat)
+        first = export(fmt)
+        etags[fmt] = first.get_etag()[0]
+        cached_stats = time_call(lambda: export(fmt), repeat=args.repeat)
+        resent = export(fmt, {'If-None-Match': first.headers['ETag']})
+        if resent.status_code != 200 or resent.get_data() != first.get_data():
+            print(f"{fmt}: a matching If-None-Match must still return the document")
+            sys.exit(1)
+        rows.append({'format': fmt, 'variant': 'cold render', **cold_stats})
+        rows.append({'format': fmt, 'variant': 'cached', **cached_stats})
+
+    print_table(f"PO export with {args.lines} lines", rows, ['format', 'variant', 'min_ms', 'median_ms', 'max_ms'])
+
+    # Same content, same ETag; an edited line gives a new artifact
+    if export('html').get_etag()[0] != etags['html']:
+        print("ETag changed although the PO did not")
+        sys.exit(1)
+    with app.app_context():
+        item = PurchaseOrderItem.query.filter_by(purchase_order_no=po_no).first()
+        item.item_quantity = (item.item_quantity or 0) + 1
+        db.session.commit()
+    if export('html').get_etag()[0] == etags['html']:
+        print("ETag did not change after a line was edited")
+        sys.exit(1)
+    print("\nETag stable for unchanged content and changed after an edit")
+
+    # With the budget set to the current directory size, the next new artifact
+    # evicts the least recently used ones and is itself kept
+    clear_cache(cache_dir)
+    evictions = export_cache.get_stats()['evictions']
+    export('excel')
+    export('html')
+    budget = sum(entry.stat().st_size for entry in os.scandir(cache_dir))
+    app.config['EXPORT_CACHE_MAX_BYTES'] = budget
+    with app.app_context():
+        item = PurchaseOrderItem.query.filter_by(purchase_order_no=po_no).first()
+        item.item_quantity += 1
+        db.session.commit()
+    newest = export('html').get_etag()[0]
+    remaining = sorted(os.listdir(cache_dir))
+    used = sum(entry.stat().st_size for entry in os.scandir(cache_dir))
+    print(f"Pruned to {used}/{budget} bytes: files left {len(remaining)}, "
+          f"evictions {export_cache.get_stats()['evictions'] - evictions}")
+    if used > budget or f'{newest}.html' not in remaining or any(name.endswith('.xlsx') for name in remaining):
+        print("LRU pruning did not keep the newest artifact within budget")
+        sys.exit(1)
+    app.config['EXPORT_CACHE_MAX_BYTES'] = export_cache.DEFAULT_MAX_BYTES
+
+    print(f"Cache counters: {export_cache.get_stats()}")
+    print(f"Logo loads: excel {po_assets.excel_logo.cache_info().misses}, "
+          f"html {po_assets.logo_base64.cache_info().misses}")
+
+    clear_cache(cache_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark the invoice export for a large supplier month.
+
+Seeds one supplier with --pos purchase orders of --lines items each. It
+compares three ways of exporting the lines:
+- the previous approach: load every PO, lazy-load each PO's items, and build
+  the rows in memory
+- the streamed CSV export
+- the streamed xlsx export
+Each variant reports time, SQL statements and peak Python heap (tracemalloc,
+measured on a separate run).
+The streamed responses are consumed chunk by chunk without buffering. Their
+heap peak should stay flat when the number of POs grows; compare runs with
+different --pos values. The CSV must contain every line.
+
+Usage:
+    python performance/benchmark_invoice_export.py [--pos 2000] [--lines 25] [--database-url URL]
+"""
+
+import argparse
+import csv
+import io
+import sys
+import time
+import tracemalloc
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url, ensure_bench_user, print_table
+)
+
+PREFIX = 'IEX'
+
+
+def seed(creator_id, po_count, line_count):
+    from app import db
+    from app.models import Supplier, PurchaseOrder, PurchaseOrderItem
+
+    db.session.add(Supplier(supplier_id=f'{PREFIX}SUP', supplier_name_zh=f'{PREFIX} supplier',
+                            supplier_region='domestic'))
+    db.session.flush()
+    po_numbers = [f'{PREFIX}{index:06d}' for index in range(po_count)]
+    db.session.execute(PurchaseOrder.__table__.insert(), [{
+        'purchase_order_no': po_no,
+        'supplier_id': f'{PREFIX}SUP',
+        'supplier_name': f'{PREFIX} supplier',
+        'creator_id': creator_id,
+        'purchase_status': 'purchased'
+    } for po_no in po_numbers])
+    for start in range(0, po_count, 500):
+        db.session.execute(PurchaseOrderItem.__table__.insert(), [{
+            'purchase_order_no': po_no,
+            'item_name': f'{PREFIX} part {line}',
+            'item_specification': 'spec ' * 8,
+            'item_quantity': line + 1,
+            'item_unit': 'pcs',
+            'unit_price': 12.5
+        } for po_no in po_numbers[start:start + 500] for line in range(line_count)])
+    db.session.commit()
+    return po_numbers
+
+
+def legacy_export(po_numbers):
+    """The previous export: PO list, then one items query per PO, all rows in memory"""
+    from app.models import PurchaseOrder
+
+    rows = []
+    for po in PurchaseOrder.query.filter(PurchaseOrder.purchase_order_no.in_(po_numbers)).all():
+        for item in po.items:
+            rows.append({
+                '採購單號': po.purchase_order_no,
+                '供應商': po.supplier.supplier_name_zh if po.supplier else '',
+                '項目名稱': item.item_name,
+                '規格': item.item_specification,
+                '數量': item.item_quantity,
+                '單位': item.item_unit,
+                '單價': item.unit_price,
+                '小計': item.get_line_subtotal(),
+                '狀態': po.purchase_status,
+                '建立日期': po.created_at.strftime('%Y-%m-%d') if po.created_at else '',
+                '確認日期': ''
+            })
+    return rows
+
+
+def measure(fn):
+    """Return (result, elapsed ms, peak heap MB); the peak comes from a second, traced run"""
+    started = time.perf_counter()
+    result = fn()
+    elapsed = (time.perf_counter() - started) * 1000
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return result, round(elapsed, 1), round(peak, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pos', type=int, default=2000)
+    parser.add_argument('--lines', type=int, default=25, help='Items per PO')
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('invoice_export'))
+
+    from app import db
+
+    with app.app_context():
+        user = ensure_bench_user()
+        headers = auth_headers(user)
+        po_numbers = seed(user.user_id, args.pos, args.lines)
+        engine = db.engine
+
+        with count_queries(engine) as statements:
+            legacy_export(po_numbers)
+        _, legacy_ms, legacy_peak = measure(lambda: len(legacy_export(po_numbers)))
+        rows = [{'variant': 'legacy (in memory)', 'ms': legacy_ms, 'peak_mb': legacy_peak,
+                 'statements': len(statements), 'bytes': '-'}]
+        db.session.remove()
+
+    client = app.test_client()
+    payload = {'supplier_id': f'{PREFIX}SUP', 'invoice_month': '2024-07', 'search_results': po_numbers}
+    csv_lines = 0
+    for export_format in ('csv', 'xlsx'):
+        def download():
+            """Consume the response chunk by chunk; returns (bytes, CSV records)"""
+            response = client.post(f'/api/v1/accounting/invoice-management/export?format={export_format}',
+                                   json=payload, headers=headers, buffered=False)
+            assert response.status_code == 200, response.status_code
+            size = records = 0
+            for chunk in response.response:
+                size += len(chunk)
+                if export_format == 'csv':
+                    records += sum(1 for _ in csv.reader(io.StringIO(chunk.decode('utf-8-sig'))))
+            response.close()
+            return size, records
+
+        # measure() downloads twice, hence the halved statement count
+        with count_queries(engine) as statements:
+            (size, records), elapsed, peak = measure(download)
+        rows.append({'variant': f'streamed {export_format}', 'ms': elapsed, 'peak_mb': peak,
+                     'statements': len(statements) // 2, 'bytes': size})
+        csv_lines = csv_lines or records - 1
+
+    print_table(f'Invoice export, {args.pos} POs x {args.lines} lines', rows,
+                ['variant', 'ms', 'peak_mb', 'statements', 'bytes'])
+
+    if csv_lines != args.pos * args.lines:
+        print(f'\nFAILED: CSV has {csv_lines} lines, expected {args.pos * args.lines}')
+        sys.exit(1)
+    print(f'\nOK: CSV has all {csv_lines} lines')
+
+
+if __name__ == '__main__':
+    main()
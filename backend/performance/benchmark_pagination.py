@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Compare OFFSET paging with ?cursor= keyset paging on deep pages.
+
+Seeds enough purchase orders and requisitions for --depth pages, then times
+the first and the deepest page of each list in both modes. Offset mode is the
+existing behaviour (COUNT plus LIMIT/OFFSET). Cursor mode seeks past the
+cursor of the previous page and skips the total (`total=none`), or reports
+it with `--total estimate|exact`. The cursor for the deep page is computed
+up front and is not part of the timing.
+
+Usage:
+    python performance/benchmark_pagination.py [--depth 500] [--page-size 20]
+        [--total none] [--database-url URL]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url, ensure_bench_user, print_table, time_call
+)
+
+PREFIX = 'PGN'
+
+
+def seed(creator_id, count):
+    """Bulk insert `count` purchased POs and requisitions with distinct created_at"""
+    from app import db
+    from app.models import Supplier, PurchaseOrder, RequestOrder
+
+    supplier_id = f'{PREFIX}SUP'
+    if not db.session.get(Supplier, supplier_id):
+        db.session.add(Supplier(supplier_id=supplier_id, supplier_name_zh=f'{PREFIX} supplier',
+                                supplier_region='domestic'))
+        db.session.flush()
+
+    start = datetime(2024, 1, 1)
+    db.session.execute(PurchaseOrder.__table__.insert(), [{
+        'purchase_order_no': f'{PREFIX}{index:07d}',
+        'supplier_id': supplier_id,
+        'supplier_name': f'{PREFIX} supplier',
+        'creator_id': creator_id,
+        'purchase_status': 'purchased',
+        'status_update_required': index % 7 == 0,
+        'created_at': start + timedelta(minutes=index)
+    } for index in range(count)])
+    db.session.execute(RequestOrder.__table__.insert(), [{
+        'request_order_no': f'{PREFIX}R{index:07d}',
+        'requester_id': creator_id,
+        'requester_name': 'Benchmark',
+        'usage_type': 'daily',
+        'order_status': 'submitted',
+        'created_at': start + timedelta(minutes=index)
+    } for index in range(count)])
+    db.session.commit()
+
+
+def deep_cursors(position):
+    """Cursor of the row just before `position` (0-based) for each list"""
+    from sqlalchemy import text
+
+    from app import db
+    from app.utils.pagination import encode_cursor, keyset_columns_sql, order_by_sql, row_cursor
+    from app.routes.purchase_orders import PO_LIST_KEYSET
+    from app.routes.delivery_management import MAINTENANCE_KEYSET
+    from app.routes.requisitions import REQUISITION_KEYSET
+
+    def raw_cursor(keys, joins=''):
+        row = db.session.execute(text(f"""
+            SELECT {keyset_columns_sql(keys)}
+            FROM purchase_orders po {joins}
+            ORDER BY {order_by_sql(keys)}
+            LIMIT 1 OFFSET :offset
+        """), {'offset': position - 1}).first()
+        return row_cursor(row, len(keys))
+
+    requisition_row = db.session.query(*[expression for expression, _ in REQUISITION_KEYSET]).order_by(
+        *[expression.desc() for expression, _ in REQUISITION_KEYSET]
+    ).offset(position - 1).first()
+
+    return {
+        'po_list': raw_cursor(PO_LIST_KEYSET),
+        'maintenance': raw_cursor(MAINTENANCE_KEYSET, 'JOIN suppliers s ON po.supplier_id = s.supplier_id'),
+        'requisitions': encode_cursor(list(requisition_row))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--depth', type=int, default=500, help='Deep page number to compare with page 1')
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--total', default='none', choices=('none', 'estimate', 'exact'),
+                        help='Total mode for cursor requests')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('pagination'))
+
+    from app import db
+
+    with app.app_context():
+        user = ensure_bench_user()
+        headers = auth_headers(user)
+        seed(user.user_id, args.depth * args.page_size + args.page_size)
+        cursors = deep_cursors((args.depth - 1) * args.page_size)
+        engine = db.engine
+        db.session.remove()
+
+    endpoints = (
+        ('po_list', '/api/v1/po'),
+        ('maintenance', '/api/v1/delivery/maintenance-list'),
+        ('requisitions', '/api/v1/requisitions'),
+    )
+    client = app.test_client()
+    size = args.page_size
+    rows = []
+    for label, url in endpoints:
+        requests = {
+            'offset': (f'{url}?page=1&page_size={size}', f'{url}?page={args.depth}&page_size={size}'),
+            'cursor': (f'{url}?cursor=&page_size={size}&total={args.total}',
+                       f'{url}?cursor={cursors[label]}&page_size={size}&total={args.total}'),
+        }
+        for mode, (first_url, deep_url) in requests.items():
+            first = time_call(lambda: client.get(first_url, headers=headers), repeat=args.repeat)
+            deep = time_call(lambda: client.get(deep_url, headers=headers), repeat=args.repeat)
+            with count_queries(engine) as statements:
+                response = client.get(deep_url, headers=headers)
+            assert response.status_code == 200, response.get_data(as_text=True)[:300]
+            rows.append({
+                'endpoint': label,
+                'mode': mode,
+                'page1_ms': first['median_ms'],
+                f'page{args.depth}_ms': deep['median_ms'],
+                'statements': len(statements)
+            })
+
+    print_table(f'Median latency, page 1 vs page {args.depth} ({size} rows/page)', rows,
+                ['endpoint', 'mode', 'page1_ms', f'page{args.depth}_ms', 'statements'])
+
+
+if __name__ == '__main__':
+    main()
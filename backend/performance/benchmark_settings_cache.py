@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-worker SystemSettings snapshot.
+
+Compares SETTINGS_CACHE_ENABLED on and off for:
+- --reads calls of SystemSettings.get_tax_rate()
+- --pos PO creations through POST /api/v1/po, which read the tax rate for
+  the totals
+It then checks that a change made by another worker (simulated with direct
+UPDATEs of the setting and the version row) is picked up once
+SETTINGS_CACHE_CHECK_SECONDS has passed, and that set_setting is visible
+to its own worker immediately.
+
+Usage:
+    python performance/benchmark_settings_cache.py [--reads 10000] [--pos 50] [--database-url URL]
+"""
+
+import argparse
+import sys
+import time
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url, ensure_bench_user, print_table
+)
+
+PREFIX = 'SET'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reads', type=int, default=10000)
+    parser.add_argument('--pos', type=int, default=50)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('settings_cache'))
+
+    from app import db
+    from app.models import Supplier, SystemSettings
+    from sqlalchemy import text
+
+    with app.app_context():
+        user = ensure_bench_user()
+        headers = auth_headers(user)
+        db.session.add(Supplier(supplier_id=f'{PREFIX}SUP', supplier_name_zh=f'{PREFIX} supplier',
+                                supplier_region='domestic'))
+        SystemSettings.set_setting('tax', 'default_tax_rate', '5.0')
+        SystemSettings.set_setting('system', 'company_name', f'{PREFIX} company')
+        db.session.commit()
+        engine = db.engine
+
+    client = app.test_client()
+    po_body = {
+        'supplier_id': f'{PREFIX}SUP',
+        'items': [{'item_name': f'{PREFIX} part {line}', 'item_quantity': 3, 'item_unit': 'pcs',
+                   'unit_price': 120} for line in range(10)]
+    }
+
+    rows = []
+    for enabled in (False, True):
+        app.config['SETTINGS_CACHE_ENABLED'] = enabled
+        label = 'cache on' if enabled else 'cache off'
+
+        with app.app_context():
+            SystemSettings.get_tax_rate()
+            with count_queries(engine) as statements:
+                started = time.perf_counter()
+                for _ in range(args.reads):
+                    SystemSettings.get_tax_rate()
+                elapsed = time.perf_counter() - started
+        rows.append({'variant': label, 'workload': f'{args.reads} reads', 'total_ms': round(elapsed * 1000, 1),
+                     'per_call_us': round(elapsed / args.reads * 1e6, 2), 'statements': len(statements)})
+
+        with count_queries(engine) as statements:
+            started = time.perf_counter()
+            for _ in range(args.pos):
+                response = client.post('/api/v1/po', json=po_body, headers=headers)
+                if response.status_code != 200:
+                    print(f"PO creation failed: {response.status_code} {response.get_data(as_text=True)[:200]}")
+                    sys.exit(1)
+            elapsed = time.perf_counter() - started
+        tax = response.get_json()['tax_decimal1']
+        rows.append({'variant': label, 'workload': f'{args.pos} PO creations', 'total_ms': round(elapsed * 1000, 1),
+                     'per_call_us': round(elapsed / args.pos * 1e6, 2),
+                     'statements': len(statements), 'tax': tax})
+
+    print_table("SystemSettings reads", rows, ['variant', 'workload', 'total_ms', 'per_call_us', 'statements', 'tax'])
+
+    # Another worker changes the rate: visible after the check interval
+    app.config['SETTINGS_CACHE_ENABLED'] = True
+    app.config['SETTINGS_CACHE_CHECK_SECONDS'] = 0.5
+    with app.app_context():
+        SystemSettings.get_tax_rate()
+        db.session.execute(text(
+            "UPDATE system_settings SET setting_value = '10.0' "
+            "WHERE setting_type = 'tax' AND setting_key = 'default_tax_rate'"
+        ))
+        db.session.execute(text(
+            "UPDATE system_settings SET setting_value = CAST(CAST(setting_value AS INTEGER) + 1 AS TEXT) "
+            "WHERE setting_type = '_meta' AND setting_key = 'settings_version'"
+        ))
+        db.session.commit()
+        before = SystemSettings.get_tax_rate()
+        time.sleep(0.6)
+        after = SystemSettings.get_tax_rate()
+        print(f"\nOther worker's change: {before} before the check interval, {after} after")
+        if (before, after) != (5.0, 10.0):
+            sys.exit(1)
+
+        SystemSettings.set_setting('tax', 'default_tax_rate', '8.0')
+        db.session.commit()
+        own = SystemSettings.get_tax_rate()
+        print(f"Own set_setting visible immediately: {own}")
+        if own != 8.0:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
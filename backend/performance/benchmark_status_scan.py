@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark the requisition status-consistency scan.
+
+Seeds submitted requisitions with items, a share of which have every item
+reviewed (the inconsistency being scanned for). It compares the previous
+per-order scan (get_summary() for each submitted order) with the aggregate
+RequestOrder.scan_status_problems(), checks that both find the same orders,
+then runs the set-based fix and checks that nothing is left to fix.
+
+Usage:
+    python performance/benchmark_status_scan.py [--orders 2000] [--items 5] [--database-url URL]
+"""
+
+import argparse
+import sys
+import time
+
+from benchmark_support import count_queries, create_bench_app, default_sqlite_url, ensure_bench_user, print_table
+
+PREFIX = 'SCN'
+
+
+def seed(creator_id, order_count, items_per_order):
+    """Every third order has all items reviewed; the rest keep one pending item"""
+    from app import db
+    from app.models import RequestOrder, RequestOrderItem
+
+    db.session.execute(RequestOrder.__table__.insert(), [{
+        'request_order_no': f'{PREFIX}{index:06d}',
+        'requester_id': creator_id,
+        'requester_name': 'Benchmark',
+        'usage_type': 'daily',
+        'order_status': 'submitted'
+    } for index in range(order_count)])
+    db.session.execute(RequestOrderItem.__table__.insert(), [{
+        'request_order_no': f'{PREFIX}{index:06d}',
+        'item_name': f'{PREFIX} part {line}',
+        'item_quantity': 1,
+        'item_unit': 'pcs',
+        'item_status': 'pending_review' if index % 3 and line == 0 else ('approved', 'rejected', 'questioned')[line % 3]
+    } for index in range(order_count) for line in range(items_per_order)])
+    db.session.commit()
+
+
+def legacy_scan():
+    """The previous scan: load every submitted order and summarize it item by item"""
+    from app.models import RequestOrder
+
+    problems = []
+    for order in RequestOrder.query.filter_by(order_status='submitted').all():
+        summary = order.get_summary()
+        if summary['total_items'] > 0 and summary['pending_items'] == 0:
+            problems.append(order.request_order_no)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=5, help='Items per requisition')
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('status_scan'))
+
+    from app import db
+    from app.models import RequestOrder
+    from app.services import status_consistency
+
+    rows = []
+    with app.app_context():
+        seed(ensure_bench_user().user_id, args.orders, args.items)
+        engine = db.engine
+
+        runs = (
+            ('per-order', legacy_scan),
+            ('aggregate', lambda: [problem['request_order_no'] for problem in RequestOrder.scan_status_problems()]),
+        )
+        found = {}
+        for label, scan in runs:
+            db.session.expunge_all()
+            with count_queries(engine) as statements:
+                start = time.perf_counter()
+                found[label] = scan()
+                elapsed = (time.perf_counter() - start) * 1000
+            rows.append({'scan': label, 'problems': len(found[label]), 'ms': round(elapsed, 1),
+                         'statements': len(statements)})
+
+        with count_queries(engine) as statements:
+            report = status_consistency.run_check(fix=True)
+        remaining = RequestOrder.scan_status_problems()
+
+    print_table(f'Status scan over {args.orders} submitted requisitions x {args.items} items', rows,
+                ['scan', 'problems', 'ms', 'statements'])
+    print(f"\nfix: {report['fixed']} orders updated in {report['fix_ms']} ms "
+          f"({len(statements)} statements including the scan), {len(remaining)} left")
+
+    failures = []
+    if sorted(found['per-order']) != sorted(found['aggregate']):
+        failures.append('aggregate scan found different orders than the per-order scan')
+    if report['fixed'] != len(found['per-order']) or remaining:
+        failures.append('bulk fix did not resolve every problem')
+    if failures:
+        print('\nFAILED')
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
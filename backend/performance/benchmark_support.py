@@ -0,0 +1,183 @@
+"""
+Shared helpers for the backend micro-benchmarks in this directory.
+
+Benchmarks create their own schema and fixtures, so always point them at a
+scratch database (the default is a throwaway SQLite file).
+"""
+
+import os
+import sys
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Allow `python performance/<script>.py` from the backend directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def default_sqlite_url(name):
+    """Return a throwaway SQLite URL for a benchmark run"""
+    path = os.path.join(tempfile.gettempdir(), f'erp_bench_{name}.db')
+    if os.path.exists(path):
+        os.remove(path)
+    return f'sqlite:///{path}'
+
+
+def create_bench_app(database_url):
+    """Create the Flask app bound to database_url with all tables created"""
+    # config.Config reads DATABASE_URL at import time
+    os.environ['USE_POSTGRESQL'] = 'false'
+    os.environ['DATABASE_URL'] = database_url
+
+    from app import create_app, db
+
+    app = create_app('production')
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def ensure_bench_user(username='bench_admin'):
+    """Return an active Admin user used to authenticate benchmark requests"""
+    from app import db
+    from app.models import User
+
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        user = User(
+            chinese_name='Benchmark',
+            username=username,
+            department='IT',
+            role='Admin'
+        )
+        user.set_password(username)
+        db.session.add(user)
+        db.session.commit()
+    return user
+
+
+def auth_headers(user):
+    """Build a bearer header for user (call inside an app context)"""
+    from flask_jwt_extended import create_access_token
+
+    token = create_access_token(identity=str(user.user_id))
+    return {'Authorization': f'Bearer {token}'}
+
+
+def time_call(fn, repeat=5, warmup=1):
+    """Run fn repeatedly and return latency statistics in milliseconds"""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'min_ms': round(min(samples), 2),
+        'median_ms': round(statistics.median(samples), 2),
+        'max_ms': round(max(samples), 2)
+    }
+
+
+@contextmanager
+def count_queries(engine):
+    """Count SQL statements executed on engine inside the block.
+
+    Yields a list that collects each statement; use len() on it afterwards.
+    """
+    from sqlalchemy import event
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def print_table(title, rows, columns):
+    """Print benchmark rows as a fixed-width table"""
+    print(f"\n{title}")
+    header = '  '.join(f"{col:>16}" for col in columns)
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        print('  '.join(f"{str(row.get(col, '')):>16}" for col in columns))
+
+
+def seed_purchase_chain(creator_id, prefix, po_count, lines_per_po,
+                        project_id=None, purchase_status='purchased'):
+    """Seed a project, supplier, requisitions and POs under a key prefix.
+
+    Each PO gets its own requisition with `lines_per_po` lines and a matching
+    PO line per requisition line. Returns the created PO numbers.
+    """
+    from app import db
+    from app.models import (
+        Project, Supplier, RequestOrder, RequestOrderItem, PurchaseOrder, PurchaseOrderItem
+    )
+
+    supplier_id = f'{prefix}SUP'
+    if not Supplier.query.get(supplier_id):
+        db.session.add(Supplier(
+            supplier_id=supplier_id,
+            supplier_name_zh=f'{prefix} supplier',
+            supplier_region='domestic'
+        ))
+    if project_id and not Project.query.get(project_id):
+        db.session.add(Project(project_id=project_id, project_name=f'{prefix} project'))
+
+    po_numbers = []
+    for po_index in range(po_count):
+        request_order_no = f'{prefix}R{po_index:05d}'
+        po_no = f'{prefix}P{po_index:05d}'
+        db.session.add(RequestOrder(
+            request_order_no=request_order_no,
+            requester_id=creator_id,
+            requester_name='Benchmark',
+            usage_type='project' if project_id else 'daily',
+            project_id=project_id,
+            order_status='submitted'
+        ))
+        db.session.add(PurchaseOrder(
+            purchase_order_no=po_no,
+            supplier_id=supplier_id,
+            supplier_name=f'{prefix} supplier',
+            creator_id=creator_id,
+            purchase_status=purchase_status
+        ))
+        db.session.flush()
+
+        for line in range(lines_per_po):
+            request_item = RequestOrderItem(
+                request_order_no=request_order_no,
+                item_name=f'{prefix} part {line}',
+                item_quantity=2,
+                item_unit='pcs',
+                item_status='purchased'
+            )
+            db.session.add(request_item)
+            db.session.flush()
+            db.session.add(PurchaseOrderItem(
+                purchase_order_no=po_no,
+                item_name=request_item.item_name,
+                item_quantity=2,
+                item_unit='pcs',
+                unit_price=10,
+                source_request_order_no=request_order_no,
+                source_detail_id=request_item.detail_id
+            ))
+        po_numbers.append(po_no)
+
+    db.session.commit()
+    return po_numbers
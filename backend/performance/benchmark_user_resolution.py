@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Measure SQL round trips spent resolving the current user per request.
+
+Calls a few authenticated endpoints (a plain decorated route, a route that
+resolves the user twice, and the profile route) once with the user caches
+cleared and then warm. It reports statements per request and the
+app.utils.user_cache counters; `db_loads` are the user lookups that still
+reached the database.
+
+Usage:
+    python performance/benchmark_user_resolution.py [--requests 50] [--database-url URL]
+"""
+
+import argparse
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url, ensure_bench_user, print_table
+)
+
+ENDPOINTS = (
+    ('profile', '/api/v1/profile'),
+    ('storage_tree', '/api/v1/storage/tree'),
+    ('invoice_search', '/api/v1/accounting/invoice-management/search?supplier_id=NONE&invoice_month=2024-01'),
+)
+
+
+def user_queries(statements):
+    return sum(1 for statement in statements if 'FROM users' in statement)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50, help='Warm requests per endpoint')
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('user_resolution'))
+
+    from app import db
+    from app.utils import user_cache
+
+    with app.app_context():
+        user = ensure_bench_user()
+        user_id = user.user_id
+        headers = auth_headers(user)
+        engine = db.engine
+        db.session.remove()
+
+    # Requests run without an outer app context so each gets its own flask.g
+    client = app.test_client()
+    rows = []
+    for label, url in ENDPOINTS:
+        with app.app_context():
+            user_cache.invalidate_user(user_id)
+        with count_queries(engine) as cold:
+            client.get(url, headers=headers)
+
+        with count_queries(engine) as warm:
+            for _ in range(args.requests):
+                client.get(url, headers=headers)
+
+        rows.append({
+            'endpoint': label,
+            'cold_total': len(cold),
+            'cold_user': user_queries(cold),
+            'warm_total': round(len(warm) / args.requests, 2),
+            'warm_user': round(user_queries(warm) / args.requests, 2)
+        })
+
+    print_table('Statements per request (user lookups vs total)', rows,
+                ['endpoint', 'cold_total', 'cold_user', 'warm_total', 'warm_user'])
+    print(f"\nuser_cache stats: {user_cache.get_stats()}")
+
+
+if __name__ == '__main__':
+    main()
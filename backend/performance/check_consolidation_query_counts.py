@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Query-count regression check for the consolidation and maintenance lists.
+
+Seeds consolidations holding several international POs with lines, plus one
+empty consolidation, and domestic POs for the maintenance list. It asserts
+the statement count of each endpoint at every page size:
+- GET /api/v1/delivery/consolidation-list: count plus one joined page query
+- GET /api/v1/delivery/consolidation/<id>: a single query
+- GET /api/v1/delivery/maintenance-list: count plus page, in offset and
+  cursor mode
+It also checks that PO counts, line counts and totals match the database.
+Exits non-zero otherwise.
+
+Usage:
+    python performance/check_consolidation_query_counts.py [--consolidations 60] [--database-url URL]
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url, ensure_bench_user
+)
+
+PREFIX = 'CNQ'
+MAX_LIST_QUERIES = 2
+MAX_DETAIL_QUERIES = 1
+PAGE_SIZES = (10, 50, 100)
+
+
+def seed(creator_id, consolidation_count):
+    from app import db
+    from app.models import Supplier, PurchaseOrder, PurchaseOrderItem, ShipmentConsolidation, ConsolidationPO
+
+    for region in ('international', 'domestic'):
+        db.session.add(Supplier(supplier_id=f'{PREFIX}{region[:3].upper()}', supplier_name_zh=f'{PREFIX} {region}',
+                                supplier_name_en=f'{PREFIX} {region} en', supplier_region=region))
+    db.session.flush()
+
+    start = datetime(2024, 1, 1)
+    po_index = 0
+
+    def add_po(supplier_id, consolidation_id=None):
+        nonlocal po_index
+        po_no = f'{PREFIX}{po_index:05d}'
+        db.session.add(PurchaseOrder(
+            purchase_order_no=po_no, supplier_id=supplier_id, supplier_name=supplier_id, creator_id=creator_id,
+            purchase_status='purchased', delivery_status='shipped', consolidation_id=consolidation_id,
+            subtotal_int=1000 + po_index, grand_total_int=1050 + po_index, created_at=start + timedelta(hours=po_index)
+        ))
+        for line in range(po_index % 4):
+            db.session.add(PurchaseOrderItem(purchase_order_no=po_no, item_name=f'{PREFIX} part {line}',
+                                             item_quantity=1, item_unit='pcs', unit_price=10))
+        po_index += 1
+        return po_no
+
+    for index in range(consolidation_count + 1):
+        consolidation_id = f'{PREFIX}C{index:04d}'
+        db.session.add(ShipmentConsolidation(consolidation_id=consolidation_id, consolidation_name=consolidation_id,
+                                             created_by=creator_id, created_at=start + timedelta(days=index)))
+        db.session.flush()
+        # The last consolidation stays empty
+        for _ in range(0 if index == consolidation_count else index % 5 + 1):
+            po_no = add_po(f'{PREFIX}INT', consolidation_id)
+            db.session.add(ConsolidationPO(consolidation_id=consolidation_id, purchase_order_no=po_no))
+    for _ in range(consolidation_count * 2):
+        add_po(f'{PREFIX}DOM')
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--consolidations', type=int, default=60)
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('consolidation_query_counts'))
+
+    from app import db
+    from app.models import PurchaseOrder, ConsolidationPO
+
+    with app.app_context():
+        headers = auth_headers(ensure_bench_user())
+        seed(ensure_bench_user().user_id, args.consolidations)
+        engine = db.engine
+        item_counts = {po.purchase_order_no: po.items.count() for po in PurchaseOrder.query.all()}
+        totals = {po.purchase_order_no: po.grand_total_int for po in PurchaseOrder.query.all()}
+        members = {}
+        for link in ConsolidationPO.query.all():
+            members.setdefault(link.consolidation_id, []).append(link.purchase_order_no)
+        db.session.remove()
+
+    client = app.test_client()
+    failures = []
+
+    def fetch(label, url, limit):
+        with count_queries(engine) as statements:
+            response = client.get(url, headers=headers)
+        body = response.get_json()
+        print(f"{label}: {len(statements)} statements (max {limit})")
+        if response.status_code != 200:
+            failures.append(f"{label}: {response.status_code} {body.get('error')}")
+            return None
+        if len(statements) > limit:
+            failures.append(f"{label} issued {len(statements)} statements")
+        return body['data']
+
+    def check_pos(label, consolidation_id, purchase_orders):
+        expected = sorted(members.get(consolidation_id, []))
+        if [po['purchase_order_no'] for po in purchase_orders] != expected:
+            failures.append(f"{label} {consolidation_id}: wrong POs")
+        elif any(po['item_count'] != item_counts[po['purchase_order_no']] for po in purchase_orders):
+            failures.append(f"{label} {consolidation_id}: wrong item counts")
+
+    for page_size in PAGE_SIZES:
+        data = fetch(f'consolidation-list page_size={page_size}',
+                     f'/api/v1/delivery/consolidation-list?page_size={page_size}', MAX_LIST_QUERIES) or []
+        for consolidation in data:
+            consolidation_id = consolidation['consolidation_id']
+            check_pos('consolidation-list', consolidation_id, consolidation['purchase_orders'])
+            expected = members.get(consolidation_id, [])
+            if (consolidation['po_count'] != len(expected)
+                    or consolidation['total_value'] != sum(totals[po_no] for po_no in expected)
+                    or consolidation['total_items'] != sum(item_counts[po_no] for po_no in expected)):
+                failures.append(f"consolidation-list {consolidation_id}: wrong totals")
+
+    for consolidation_id in (f'{PREFIX}C0003', f'{PREFIX}C{args.consolidations:04d}'):
+        detail = fetch(f'consolidation {consolidation_id}', f'/api/v1/delivery/consolidation/{consolidation_id}',
+                       MAX_DETAIL_QUERIES)
+        if detail:
+            check_pos('consolidation', consolidation_id, detail['purchase_orders'])
+            if detail['total_items'] != sum(item_counts[po_no] for po_no in members.get(consolidation_id, [])):
+                failures.append(f"consolidation {consolidation_id}: wrong total_items")
+
+    for page_size in PAGE_SIZES:
+        for mode, suffix in (('offset', ''), ('cursor', '&cursor=&total=none')):
+            data = fetch(f'maintenance-list {mode} page_size={page_size}',
+                         f'/api/v1/delivery/maintenance-list?page_size={page_size}{suffix}', MAX_LIST_QUERIES) or []
+            if any(po['item_count'] != item_counts[po['purchase_order_no']] for po in data):
+                failures.append(f"maintenance-list {mode}: wrong item counts")
+
+    if failures:
+        print('\nFAILED')
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print('OK: bounded query count and matching counts')
+
+
+if __name__ == '__main__':
+    main()
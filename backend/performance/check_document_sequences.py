@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Concurrency check for DocumentSequence (REQ/PO/CONS document numbers).
+
+Starts several processes that each create their own app and engine and
+allocate numbers from the same daily prefix, mixing single numbers with
+pre-allocated blocks. Each allocation commits on its own, the way a request
+does. The check asserts that no number was handed out twice and that the
+numbers form one gap-free run. Exits non-zero otherwise.
+
+Usage:
+    python performance/check_document_sequences.py [--processes 8] [--rounds 50]
+        [--database-url URL]
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+
+from benchmark_support import create_bench_app, default_sqlite_url
+
+CODE = 'BENCH'
+BLOCK_SIZE = 5
+
+
+def worker(database_url, rounds, worker_index):
+    """Allocate numbers in a fresh process; returns the numbers it received"""
+    app = create_bench_app(database_url)
+
+    from app import db
+    from app.models import DocumentSequence
+
+    numbers = []
+    with app.app_context():
+        for round_index in range(rounds):
+            # Every third round pre-allocates a block, as bulk imports do
+            if (round_index + worker_index) % 3 == 0:
+                numbers.extend(DocumentSequence.next_numbers(CODE, BLOCK_SIZE))
+            else:
+                numbers.append(DocumentSequence.next_number(CODE))
+            db.session.commit()
+    return numbers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=50, help='Allocations per process')
+    parser.add_argument('--database-url', default=None, help='Shared scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    database_url = args.database_url or default_sqlite_url('document_sequences')
+    # Create the schema once before the workers race on it
+    create_bench_app(database_url)
+
+    start = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(args.processes) as pool:
+        results = pool.starmap(
+            worker, [(database_url, args.rounds, index) for index in range(args.processes)]
+        )
+    elapsed = time.perf_counter() - start
+
+    numbers = [number for result in results for number in result]
+    # Strip the <CODE><YYYYMMDD> prefix to get the counter value
+    values = sorted(int(number[len(CODE) + 8:]) for number in numbers)
+
+    failures = []
+    duplicates = len(numbers) - len(set(numbers))
+    if duplicates:
+        failures.append(f"{duplicates} duplicate numbers handed out")
+    if values != list(range(1, len(values) + 1)):
+        failures.append(f"numbers are not one gap-free run 1..{len(values)}")
+
+    print(f"processes={args.processes} allocations={args.processes * args.rounds} "
+          f"numbers={len(numbers)} elapsed={elapsed:.2f}s")
+    if failures:
+        print('\nFAILED')
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print('OK: every number is unique and the sequence has no gaps')
+
+
+if __name__ == '__main__':
+    main()
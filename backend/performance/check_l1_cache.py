@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Check the bounded L1 cache of cache/redis_manager.py.
+
+Without Redis:
+- every namespace stays within its byte budget, and filling one namespace
+  never evicts another
+- entries larger than a quarter of their budget are not kept locally
+- expired entries are removed by the sweep, not only when read again
+With --redis-url (a scratch Redis; keys under 'l1check:' are written):
+- two managers on the same Redis stand in for two workers; a set, delete or
+  invalidate_pattern on one drops the other's L1 copy through pub/sub
+- a long write loop keeps the L1 within budget, with counters from get_stats
+
+Usage:
+    python performance/check_l1_cache.py [--redis-url redis://localhost:6379/15]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from cache.redis_manager import LocalCache, RedisCacheManager, _MISSING  # noqa: E402
+
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        sys.exit(1)
+
+
+def check_local_cache():
+    cache = LocalCache({'session': 10_000, 'dashboard': 20_000})
+    for index in range(20):
+        cache.set(f'session:{index}', index, 400, ttl=60)
+    for index in range(500):
+        cache.set(f'dashboard:{index}', 'x', 1_000, ttl=60)
+    namespaces = cache.namespace_stats()
+    check(namespaces['dashboard']['bytes'] <= 20_000, f"dashboard within budget: {namespaces['dashboard']}")
+    check(namespaces['session']['entries'] == 20, "filling dashboard evicted no session entry")
+    check(cache.get('dashboard:0') is _MISSING and cache.get('dashboard:499') == 'x',
+          "least recently used dashboard entries were evicted first")
+
+    check(not cache.set('dashboard:huge', 'x', 15_000, ttl=60) and 'dashboard:huge' not in cache,
+          "entry over a quarter of the budget is not kept")
+
+    cache.set('session:short', 1, 10, ttl=0.2)
+    time.sleep(0.3)
+    swept = cache.sweep()
+    check(swept == 1 and 'session:short' not in cache, "sweep removed the expired entry without a read")
+    print(f"     counters: {cache.stats}")
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def check_redis(redis_url):
+    worker_a = RedisCacheManager(redis_url, local_default_budget=256 * 1024, sweep_interval=1)
+    worker_b = RedisCacheManager(redis_url, local_default_budget=256 * 1024, sweep_interval=1)
+    try:
+        check(wait_for(lambda: worker_a.get_stats()['local_cache']['invalidation_listener']
+                       and worker_b.get_stats()['local_cache']['invalidation_listener']),
+              "both workers subscribed to invalidations")
+        worker_a.invalidate_pattern('l1check:*')
+
+        worker_a.set('l1check:po:1', {'status': 'pending'})
+        check(worker_b.get('l1check:po:1') == {'status': 'pending'} and 'l1check:po:1' in worker_b.local_cache,
+              "worker B filled its L1 from Redis")
+        worker_a.set('l1check:po:1', {'status': 'purchased'})
+        check(wait_for(lambda: 'l1check:po:1' not in worker_b.local_cache), "set on A dropped B's L1 copy")
+        check(worker_b.get('l1check:po:1') == {'status': 'purchased'}, "B reads the new value")
+
+        worker_a.delete('l1check:po:1')
+        check(wait_for(lambda: 'l1check:po:1' not in worker_b.local_cache), "delete on A dropped B's L1 copy")
+
+        for index in range(5):
+            worker_a.set(f'l1check:user:{index}', index)
+            worker_b.get(f'l1check:user:{index}')
+        worker_a.invalidate_pattern('l1check:user:*')
+        check(wait_for(lambda: not any(f'l1check:user:{index}' in worker_b.local_cache for index in range(5))),
+              "invalidate_pattern on A dropped B's matching L1 copies")
+
+        payload = {'rows': ['x' * 100] * 10}
+        started = time.perf_counter()
+        for index in range(5_000):
+            worker_a.set(f'l1check:report:{index}', payload, ttl=60)
+        elapsed = time.perf_counter() - started
+        stats = worker_a.get_stats()['local_cache']
+        check(stats['namespaces']['l1check']['bytes'] <= 256 * 1024,
+              f"5000 writes kept the L1 within budget in {elapsed:.2f} s: {stats['namespaces']['l1check']}")
+        print(f"     counters: { {key: value for key, value in stats.items() if key != 'namespaces'} }")
+        worker_a.invalidate_pattern('l1check:*')
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--redis-url', default=None)
+    args = parser.parse_args()
+
+    check_local_cache()
+    if args.redis_url:
+        check_redis(args.redis_url)
+    else:
+        print("Skipping the cross-worker checks (no --redis-url)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Query-count regression check for the logistics shipping and tracking lists.
+
+Seeds shipped POs with lines and several logistics events each. It asserts
+that GET /api/v1/logistics/shipping and /api/v1/logistics/delivery-tracking
+issue at most MAX_QUERIES statements at every page size: count, the page
+with each row's line count, and the events of the whole page. It also
+checks that each row's item count and events match the database. Exits non-zero otherwise.
+
+Usage:
+    python performance/check_logistics_query_counts.py [--pos 120] [--database-url URL]
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url, ensure_bench_user
+)
+
+PREFIX = 'LGQ'
+MAX_QUERIES = 3
+PAGE_SIZES = (10, 50, 100)
+EVENT_STATUSES = ('shipped', 'in_transit', 'customs_clearance', 'expected_arrival', 'arrived')
+
+
+def seed(creator_id, po_count):
+    from app import db
+    from app.models import Supplier, PurchaseOrder, PurchaseOrderItem, LogisticsEvent
+
+    db.session.add(Supplier(supplier_id=f'{PREFIX}SUP', supplier_name_zh=f'{PREFIX} supplier',
+                            supplier_region='domestic', supplier_contact_person='Contact'))
+    db.session.flush()
+    start = datetime(2024, 1, 1)
+    for index in range(po_count):
+        po_no = f'{PREFIX}{index:05d}'
+        events = index % 4 + 1
+        db.session.add(PurchaseOrder(
+            purchase_order_no=po_no, supplier_id=f'{PREFIX}SUP', supplier_name=f'{PREFIX} supplier',
+            creator_id=creator_id, purchase_status='shipped', shipping_status=EVENT_STATUSES[events - 1],
+            order_date=(start + timedelta(days=index)).date(), grand_total_int=1000 + index
+        ))
+        for line in range(index % 3):
+            db.session.add(PurchaseOrderItem(purchase_order_no=po_no, item_name=f'{PREFIX} part {line}',
+                                             item_quantity=1, item_unit='pcs', unit_price=10))
+        for step in range(events):
+            db.session.add(LogisticsEvent(
+                scope_type='PO', scope_id=po_no, purchase_order_no=po_no, status=EVENT_STATUSES[step],
+                happened_at=start + timedelta(days=index, hours=step), note=f'step {step}', created_by=creator_id
+            ))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pos', type=int, default=120)
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('logistics_query_counts'))
+
+    from app import db
+    from app.models import PurchaseOrder, LogisticsEvent
+
+    with app.app_context():
+        user = ensure_bench_user()
+        headers = auth_headers(user)
+        seed(user.user_id, args.pos)
+        engine = db.engine
+        expected = {
+            po.purchase_order_no: (po.items.count(), po.logistics_events.count())
+            for po in PurchaseOrder.query.filter(PurchaseOrder.purchase_order_no.like(f'{PREFIX}%'))
+        }
+        db.session.remove()
+
+    client = app.test_client()
+    failures = []
+    for label, url in (('shipping', '/api/v1/logistics/shipping'),
+                       ('delivery-tracking', '/api/v1/logistics/delivery-tracking')):
+        for page_size in PAGE_SIZES:
+            with count_queries(engine) as statements:
+                response = client.get(f'{url}?page_size={page_size}', headers=headers)
+            body = response.get_json()
+            print(f"{label} page_size={page_size}: {len(body.get('data', []))} rows, "
+                  f"{len(statements)} statements (max {MAX_QUERIES})")
+            if response.status_code != 200:
+                failures.append(f"{label}: {response.status_code} {body.get('error')}")
+                continue
+            if len(statements) > MAX_QUERIES:
+                failures.append(f"{label} page_size={page_size} issued {len(statements)} statements")
+            for row in body['data']:
+                items, events = expected[row['po_no']]
+                shown = len(row['logistics_events'] if label == 'shipping' else row['timeline'])
+                if row['items_count'] != items or shown != events:
+                    failures.append(f"{label} {row['po_no']}: items {row['items_count']}/{items}, "
+                                    f"events {shown}/{events}")
+                    break
+
+    if failures:
+        print('\nFAILED')
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print('OK: bounded query count and matching items/events')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Query-count regression check for requisition and requisition-item views.
+
+Seeds requisitions from several requesters with items in mixed statuses and
+asserts that GET /api/v1/requisitions issues a bounded number of SQL
+statements for a full page (no per-order summary or requester queries).
+It also seeds one large requisition whose items have reviewers, suppliers,
+categories, storage-in history and a PO. The requisition detail,
+build-candidates and PO detail views must serialize those items in a fixed
+number of statements. Every bulk serializer must return exactly what
+per-row to_dict() returns. Exits non-zero otherwise.
+
+Usage:
+    python performance/check_requisition_query_counts.py [--orders 100] [--database-url URL]
+"""
+
+import argparse
+import sys
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url, ensure_bench_user
+)
+
+PREFIX = 'RQC'
+ITEM_STATUSES = ('pending_review', 'approved', 'reviewed', 'rejected', 'questioned', 'submitted', 'purchased')
+# Auth lookup + count + page + grouped summaries + requesters, with headroom
+MAX_LIST_QUERIES = 6
+# Auth + order + summary + requester + items + suppliers/categories/reviewers/storage
+MAX_DETAIL_QUERIES = 10
+# Auth + candidates + suppliers/categories/reviewers/storage
+MAX_CANDIDATE_QUERIES = 8
+# Auth + PO + users + supplier + lines + source lines/orders/requesters
+MAX_PO_DETAIL_QUERIES = 12
+
+
+def seed_requisitions(db, order_count):
+    """Create order_count requisitions spread over five requesters"""
+    from app.models import User, RequestOrder, RequestOrderItem
+
+    requesters = []
+    for index in range(5):
+        username = f'{PREFIX.lower()}_requester_{index}'
+        user = User.query.filter_by(username=username).first()
+        if not user:
+            user = User(chinese_name=f'Requester {index}', username=username, department='IT', role='Everyone')
+            user.set_password(username)
+            db.session.add(user)
+        requesters.append(user)
+    db.session.flush()
+
+    for index in range(order_count):
+        requester = requesters[index % len(requesters)]
+        order_no = f'{PREFIX}{index:05d}'
+        db.session.add(RequestOrder(
+            request_order_no=order_no,
+            requester_id=requester.user_id,
+            requester_name='stored name',
+            usage_type='daily',
+            order_status='submitted'
+        ))
+        for line in range(index % 5):
+            db.session.add(RequestOrderItem(
+                request_order_no=order_no,
+                item_name=f'{PREFIX} part {line}',
+                item_quantity=1,
+                item_unit='pcs',
+                item_status=ITEM_STATUSES[(index + line) % len(ITEM_STATUSES)]
+            ))
+    db.session.commit()
+
+
+def seed_item_details(db, item_count):
+    """One requisition with fully related items, half of them already put away, and a PO"""
+    from app.models import (
+        User, Supplier, ItemCategory, Storage, StorageHistory, RequestOrder, RequestOrderItem,
+        PurchaseOrder, PurchaseOrderItem
+    )
+
+    reviewers = User.query.filter(User.username.like(f'{PREFIX.lower()}_requester_%')).all()
+    for index in range(3):
+        db.session.add(Supplier(supplier_id=f'{PREFIX}S{index}', supplier_name_zh=f'{PREFIX} supplier {index}',
+                                supplier_region='domestic'))
+        db.session.add(ItemCategory(category_code=f'{PREFIX}{index}', category_name=f'{PREFIX} category {index}'))
+    storage = Storage.create_storage_location('RQ', 'A', 1, 1, 1)
+    db.session.add(storage)
+
+    order_no = f'{PREFIX}DETAIL'
+    po_no = f'{PREFIX}PO'
+    db.session.add(RequestOrder(request_order_no=order_no, requester_id=reviewers[0].user_id,
+                                requester_name='stored name', usage_type='daily', order_status='reviewed'))
+    db.session.add(PurchaseOrder(purchase_order_no=po_no, supplier_id=f'{PREFIX}S0',
+                                 supplier_name=f'{PREFIX} supplier 0', creator_id=reviewers[0].user_id))
+    db.session.flush()
+
+    for line in range(item_count):
+        item = RequestOrderItem(
+            request_order_no=order_no,
+            item_name=f'{PREFIX} detail part {line}',
+            item_quantity=2,
+            item_unit='pcs',
+            item_category=f'{PREFIX}{line % 3}',
+            item_status='approved',
+            supplier_id=f'{PREFIX}S{line % 3}',
+            unit_price=10,
+            reviewer_id=reviewers[line % len(reviewers)].user_id
+        )
+        db.session.add(item)
+        db.session.flush()
+        db.session.add(PurchaseOrderItem(purchase_order_no=po_no, item_name=item.item_name, item_quantity=2,
+                                         item_unit='pcs', unit_price=10, source_request_order_no=order_no,
+                                         source_detail_id=item.detail_id))
+        if line % 2 == 0:
+            db.session.add(StorageHistory(storage_id=storage.storage_id, item_id=item.item_name,
+                                          operation_type='in', quantity=2, operator_id=reviewers[0].user_id,
+                                          request_item_id=item.detail_id))
+    db.session.commit()
+    return order_no, po_no
+
+
+def measure(client, engine, url, headers):
+    """Return (statements, JSON) of a GET issued after a warm-up request"""
+    client.get(url, headers=headers)
+    with count_queries(engine) as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)[:300]
+    return len(statements), response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=100)
+    parser.add_argument('--items', type=int, default=40, help='Items on the detail requisition')
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('requisition_query_counts'))
+
+    from app import db
+    from app.models import RequestOrder
+
+    with app.app_context():
+        headers = auth_headers(ensure_bench_user())
+        seed_requisitions(db, args.orders)
+        order_no, po_no = seed_item_details(db, args.items)
+        engine = db.engine
+        db.session.remove()
+
+    client = app.test_client()
+    url = f'/api/v1/requisitions?page=1&page_size={args.orders}'
+    client.get(url, headers=headers)  # warm the user cache
+    with count_queries(engine) as statements:
+        response = client.get(url, headers=headers)
+    items = response.get_json()['items']
+
+    with app.app_context():
+        expected = [db.session.get(RequestOrder, item['request_order_no']).to_dict() for item in items]
+
+    failures = []
+    print(f"list: {len(items)} orders, {len(statements)} statements (max {MAX_LIST_QUERIES})")
+    if len(statements) > MAX_LIST_QUERIES:
+        failures.append(f"list issued {len(statements)} statements")
+    if items != expected:
+        failures.append('bulk serializer output differs from to_dict()')
+
+    from app.models import PurchaseOrder
+
+    detail_count, detail = measure(client, engine, f'/api/v1/requisitions/{order_no}', headers)
+    candidate_count, candidates = measure(client, engine, '/api/v1/po/build-candidates', headers)
+    po_count, po_detail = measure(client, engine, f'/api/v1/po/{po_no}', headers)
+
+    with app.app_context():
+        order = db.session.get(RequestOrder, order_no)
+        expected_items = [item.to_dict() for item in order.items.all()]
+        expected_lines = [line.to_dict() for line in db.session.get(PurchaseOrder, po_no).items]
+
+    candidate_items = [
+        {key: value for key, value in item.items() if key != 'is_urgent'}
+        for group in candidates for item in group['items'] if item['request_order_no'] == order_no
+    ]
+    checks = (
+        ('requisition detail', detail_count, MAX_DETAIL_QUERIES, detail['items'], expected_items),
+        ('build candidates', candidate_count, MAX_CANDIDATE_QUERIES,
+         sorted(candidate_items, key=lambda item: item['detail_id']), expected_items),
+        ('PO detail', po_count, MAX_PO_DETAIL_QUERIES, po_detail['data']['items'], expected_lines),
+    )
+    for label, count, limit, actual_items, expected_for_view in checks:
+        print(f"{label}: {len(actual_items)} items, {count} statements (max {limit})")
+        if count > limit:
+            failures.append(f"{label} issued {count} statements")
+        if actual_items != expected_for_view:
+            failures.append(f"{label} bulk serializer output differs from to_dict()")
+
+    if failures:
+        print('\nFAILED')
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print('OK: bounded query count and identical JSON')
+
+
+if __name__ == '__main__':
+    main()
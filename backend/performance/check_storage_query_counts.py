@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Query-count regression check for /api/v1/storage/tree and /api/v1/inventory.
+
+Seeds a small and a large warehouse and asserts that both endpoints issue the
+same, bounded number of SQL statements regardless of how many bins exist.
+Also checks the cached storage tree: a warm read only authenticates, a
+matching If-None-Match gets 304, and an issue only rebuilds its own zone.
+Exits non-zero when a per-location (N+1) query creeps back in.
+
+Usage:
+    python performance/check_storage_query_counts.py [--database-url URL]
+"""
+
+import argparse
+import sys
+
+from benchmark_support import (
+    auth_headers, count_queries, create_bench_app, default_sqlite_url, ensure_bench_user
+)
+
+# Zone list + storages + grouped counts + auth lookup, with headroom for session housekeeping
+MAX_TREE_QUERIES = 6
+# Warm tree read: auth lookup only
+MAX_CACHED_TREE_QUERIES = 1
+# Auth lookup + balance search + batch storage load + grouped counts
+MAX_SEARCH_QUERIES = 6
+
+
+def seed_warehouse(db, operator_id, shelves):
+    """Create zone BQ with `shelves` shelves (36 bins each) and stock in every bin"""
+    from app.models import Storage, StorageBalance, StorageHistory
+    from app.utils.cache import ERPCache
+
+    ERPCache.invalidate_storage_cache()
+
+    StorageBalance.query.filter(StorageBalance.storage_id.like('BQ-%')).delete(synchronize_session=False)
+    StorageHistory.query.filter(StorageHistory.storage_id.like('BQ-%')).delete(synchronize_session=False)
+    Storage.query.filter(Storage.area_code == 'BQ').delete(synchronize_session=False)
+
+    shelf_codes = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'[:shelves]
+    for shelf_code in shelf_codes:
+        for floor in range(1, 7):
+            for front_back in (1, 2):
+                for left_middle_right in (1, 2, 3):
+                    storage = Storage.create_storage_location('BQ', shelf_code, floor, front_back, left_middle_right)
+                    db.session.add(storage)
+                    db.session.add(StorageHistory.create_in_record(
+                        storage_id=storage.storage_id,
+                        item_id=f'Bench part {shelf_code}{floor}',
+                        quantity=3,
+                        operator_id=operator_id,
+                        source_type='BENCH',
+                        source_no='BENCHPO',
+                        source_line=floor
+                    ))
+    db.session.commit()
+    return len(shelf_codes) * 36
+
+
+def check_tree_cache(client, headers, db):
+    """Warm hits, ETag revalidation and per-zone invalidation of /storage/tree"""
+    from app.models import Storage
+
+    failures = []
+    first = client.get('/api/v1/storage/tree', headers=headers)
+    etag = first.headers.get('ETag', '').strip('"')
+    db.session.remove()
+
+    with count_queries(db.engine) as statements:
+        warm = client.get('/api/v1/storage/tree', headers=headers)
+    print(f"{'storage_tree warm':>18} queries={len(statements)}")
+    if len(statements) > MAX_CACHED_TREE_QUERIES:
+        failures.append(f"storage_tree warm: {len(statements)} queries (limit {MAX_CACHED_TREE_QUERIES})")
+    if warm.get_json() != first.get_json():
+        failures.append('storage_tree warm: cached body differs from cold body')
+
+    revalidated = client.get('/api/v1/storage/tree', headers={**headers, 'If-None-Match': f'"{etag}"'})
+    print(f"{'storage_tree etag':>18} status={revalidated.status_code}")
+    if revalidated.status_code != 304:
+        failures.append(f"storage_tree etag: expected 304, got {revalidated.status_code}")
+
+    # Issue a whole bin so its in-stock line count changes
+    storage_id = Storage.query.filter_by(area_code='BQ', shelf_code='A', floor_level=1).first().storage_id
+    db.session.remove()
+    issued = client.post('/api/v1/inventory/issue', headers=headers, json={
+        'item_ref': {'item_id': 'Bench part A1', 'po_no': 'BENCHPO', 'detail_id': 1},
+        'storage_id': storage_id, 'qty': 3
+    })
+    if issued.status_code != 200:
+        failures.append(f"inventory issue failed: {issued.get_data(as_text=True)}")
+
+    changed = client.get('/api/v1/storage/tree', headers={**headers, 'If-None-Match': f'"{etag}"'})
+    print(f"{'storage_tree issue':>18} status={changed.status_code}")
+    if changed.status_code != 200:
+        failures.append('storage_tree: issue did not invalidate the zone subtree')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    app = create_bench_app(args.database_url or default_sqlite_url('storage_query_counts'))
+
+    from app import db
+
+    failures = []
+    with app.app_context():
+        user = ensure_bench_user()
+        operator_id = user.user_id
+        headers = auth_headers(user)
+        client = app.test_client()
+
+        # Fill the user cache first so the counts below exclude its one-time load
+        from app.utils.user_cache import get_user
+        with app.test_request_context():
+            get_user(operator_id)
+        db.session.remove()
+
+        observed = {}
+        for shelves in (1, 10):
+            bins = seed_warehouse(db, operator_id, shelves)
+            db.session.remove()
+
+            for label, url, limit in (
+                ('storage_tree', '/api/v1/storage/tree', MAX_TREE_QUERIES),
+                ('inventory_search', '/api/v1/inventory?zone=BQ', MAX_SEARCH_QUERIES),
+            ):
+                with count_queries(db.engine) as statements:
+                    response = client.get(url, headers=headers)
+                assert response.status_code == 200, response.get_data(as_text=True)
+
+                count = len(statements)
+                observed.setdefault(label, []).append(count)
+                print(f"{label:>18} bins={bins:<5} queries={count}")
+                if count > limit:
+                    failures.append(f"{label}: {count} queries for {bins} bins (limit {limit})")
+
+        for label, counts in observed.items():
+            if len(set(counts)) != 1:
+                failures.append(f"{label}: query count grows with bins {counts}")
+
+        failures.extend(check_tree_cache(client, headers, db))
+
+    if failures:
+        print('\nFAILED')
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print('\nOK: query counts are independent of warehouse size')
+
+
+if __name__ == '__main__':
+    main()
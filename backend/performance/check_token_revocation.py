@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Check that a logged-out token is rejected by every worker.
+
+Logs out a token through one app instance, then replays it against a fresh
+app started in a separate process (standing in for another gunicorn worker)
+after the revocation sync interval. With Redis reachable the second worker
+must answer 401 TOKEN_REVOKED; without Redis revocations are process-local
+and the cross-worker step is reported as skipped.
+
+It also times the not-revoked check on the request path, which should stay
+a local lookup once the mirror is in sync.
+
+Usage:
+    python performance/check_token_revocation.py [--lookups 100000] [--database-url URL]
+"""
+
+import argparse
+import multiprocessing
+import sys
+import time
+import uuid
+
+from benchmark_support import auth_headers, create_bench_app, default_sqlite_url, ensure_bench_user
+
+
+def replay_in_worker(database_url, headers):
+    """Call /auth/me from a separate process; returns (status, error code, redis available)"""
+    app = create_bench_app(database_url)
+
+    from app.utils.security import TokenRevocationList, security_manager
+
+    time.sleep(TokenRevocationList.SYNC_INTERVAL + 0.1)
+    with app.app_context():
+        redis_available = security_manager.get_redis_client() is not None
+
+    response = app.test_client().get('/api/v1/auth/me', headers=headers)
+    code = (response.get_json() or {}).get('error', {}).get('code')
+    return response.status_code, code, redis_available
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lookups', type=int, default=100000, help='Not-revoked checks to time')
+    parser.add_argument('--database-url', default=None, help='Scratch database URL (default: temp SQLite file)')
+    args = parser.parse_args()
+
+    database_url = args.database_url or default_sqlite_url('token_revocation')
+    app = create_bench_app(database_url)
+
+    from app.utils.security import security_manager
+
+    with app.app_context():
+        headers = auth_headers(ensure_bench_user())
+
+    client = app.test_client()
+    failures = []
+
+    before = client.get('/api/v1/auth/me', headers=headers).status_code
+    logout = client.post('/api/v1/auth/logout', headers=headers).status_code
+    after = client.get('/api/v1/auth/me', headers=headers)
+    after_code = (after.get_json() or {}).get('error', {}).get('code')
+    print(f"same worker: before={before} logout={logout} after={after.status_code} ({after_code})")
+    if before != 200 or after.status_code != 401 or after_code != 'TOKEN_REVOKED':
+        failures.append('logged-out token still accepted by the worker that revoked it')
+
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        status, code, redis_available = pool.apply(replay_in_worker, (database_url, headers))
+    if redis_available:
+        print(f"other worker: status={status} ({code})")
+        if status != 401 or code != 'TOKEN_REVOKED':
+            failures.append('logged-out token still accepted by another worker')
+    else:
+        print(f"other worker: status={status} (skipped, Redis not reachable; revocations are process-local)")
+
+    revoked = security_manager.revoked_tokens
+    jtis = [str(uuid.uuid4()) for _ in range(1000)]
+    with app.app_context():
+        start = time.perf_counter()
+        for index in range(args.lookups):
+            revoked.is_revoked(jtis[index % len(jtis)])
+        elapsed = time.perf_counter() - start
+    print(f"not-revoked check: {elapsed / args.lookups * 1e6:.2f} us/lookup "
+          f"({len(revoked)} revoked entries mirrored locally)")
+
+    if failures:
+        print('\nFAILED')
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Check WebSocket broadcasts of app/websocket.py.
+
+Without Redis (socket.io and subscriptions in the process):
+- a single status change reaches a subscribed client as its usual event
+- approving --items lines through POST .../lines/batch-approve reaches the
+  client as one batch_update event listing every line and the status change
+- --items item changes made in a row by one worker are coalesced the same way
+- a broadcast to a requisition nobody follows is not emitted
+- disconnecting drops the session's subscriptions
+With --redis-url (a scratch Redis; ws:* keys and the socket.io channel are used):
+- another worker's SubscriptionStore sees this worker's subscriptions and
+  can clean up its disconnected sessions
+- a batch approval is published to the message queue, which every worker
+  delivers from, as one batch_update message
+
+Usage:
+    python performance/check_websocket_fanout.py [--items 50] [--redis-url redis://localhost:6379/15]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from benchmark_support import auth_headers, create_bench_app, default_sqlite_url, ensure_bench_user
+
+REQUISITION = 'WSCHECK-001'
+BATCH_REQUISITION = 'WSCHECK-BATCH'
+
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'} {message}")
+    if not condition:
+        sys.exit(1)
+
+
+def received(client, wait=0.5):
+    time.sleep(wait)
+    return [packet for packet in client.get_received() if packet['name'] != 'subscription_status']
+
+
+def seed_requisition(order_no, requester, items):
+    """A submitted requisition with items lines pending review"""
+    from app import db
+    from app.models import RequestOrder, RequestOrderItem, Supplier
+
+    if not Supplier.query.get('WSCHECK-S'):
+        db.session.add(Supplier(supplier_id='WSCHECK-S', supplier_name_zh='WSCHECK supplier',
+                                supplier_region='domestic'))
+    db.session.add(RequestOrder(request_order_no=order_no, requester_id=requester.user_id,
+                                requester_name=requester.chinese_name, usage_type='daily',
+                                order_status='submitted'))
+    lines = []
+    for line in range(items):
+        item = RequestOrderItem(request_order_no=order_no, item_name=f'WSCHECK part {line}',
+                                item_quantity=1, item_unit='pcs', item_status='pending_review')
+        db.session.add(item)
+        lines.append(item)
+    db.session.commit()
+    return [{'detail_id': item.detail_id, 'supplier_id': 'WSCHECK-S', 'unit_price': 10} for item in lines]
+
+
+def batch_approve(app, headers, order_no, lines):
+    response = app.test_client().post(f'/api/v1/requisitions/{order_no}/lines/batch-approve',
+                                      json={'lines': lines}, headers=headers)
+    check(response.status_code == 200, f"batch-approve {len(lines)} lines: HTTP {response.status_code}")
+    return response.get_json()
+
+
+def check_redis(app, redis_url, headers, items):
+    """Shared subscriptions, and a batch approval published to the queue once"""
+    import pickle
+    import redis
+    from app import websocket
+    from app.websocket import SubscriptionStore, init_socketio
+
+    app.config['SOCKETIO_MESSAGE_QUEUE'] = redis_url
+    init_socketio(app)
+    worker_a = websocket.subscriptions
+    worker_b = SubscriptionStore()
+    worker_b.configure(redis_url)
+
+    worker_a.add('requisition', REQUISITION, 'sid-a')
+    check(worker_b.has_members('requisition', REQUISITION), "worker B sees worker A's subscription")
+    worker_b.remove_session('sid-a')
+    check(not worker_a.has_members('requisition', REQUISITION), "worker B cleaned up worker A's session")
+
+    # Every worker listens on this channel and delivers to its own clients
+    listener = redis.Redis.from_url(redis_url).pubsub(ignore_subscribe_messages=True)
+    listener.subscribe(app.config['SOCKETIO_CHANNEL'])
+    order_no = f'{BATCH_REQUISITION}-REDIS'
+    with app.app_context():
+        lines = seed_requisition(order_no, ensure_bench_user(), items)
+    worker_a.add('requisition', order_no, 'sid-a')
+    batch_approve(app, headers, order_no, lines)
+    published = []
+    deadline = time.time() + 1
+    while time.time() < deadline:
+        message = listener.get_message(timeout=0.1)
+        if message is not None:
+            # JSON in current python-socketio, pickle in older releases
+            try:
+                published.append(json.loads(message['data']))
+            except ValueError:
+                published.append(pickle.loads(message['data']))
+    check([(message['event'], message['room']) for message in published]
+          == [('batch_update', f'requisition_{order_no}')],
+          f"batch approval of {items} lines published to the message queue as {len(published)} message(s)")
+    worker_a.remove_session('sid-a')
+    listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=50)
+    parser.add_argument('--redis-url', default=None)
+    args = parser.parse_args()
+
+    # The socket.io test client needs socket.io without a message queue;
+    # config.Config reads the queue URL at import time
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = ''
+    app = create_bench_app(default_sqlite_url('websocket_fanout'))
+
+    from app import websocket
+    from app.websocket import (
+        broadcast_requisition_item_change, broadcast_requisition_status_change, socketio, subscriptions
+    )
+
+    with app.app_context():
+        user = ensure_bench_user()
+        headers = auth_headers(user)
+        lines = seed_requisition(BATCH_REQUISITION, user, args.items)
+
+    client = socketio.test_client(app, headers=headers)
+    check(client.is_connected(), f"client connected (async mode {socketio.async_mode})")
+    client.get_received()
+    client.emit('subscribe_requisition', {'requisition_id': REQUISITION})
+    client.emit('subscribe_requisition', {'requisition_id': BATCH_REQUISITION})
+    check(subscriptions.has_members('requisition', REQUISITION), "subscription recorded")
+    client.get_received()
+
+    broadcast_requisition_status_change(REQUISITION, 'submitted', 'reviewed')
+    packets = received(client)
+    check([packet['name'] for packet in packets] == ['requisition_status_changed'],
+          f"single change arrives as requisition_status_changed: {[packet['name'] for packet in packets]}")
+
+    result = batch_approve(app, headers, BATCH_REQUISITION, lines)
+    packets = received(client)
+    events = packets[0]['args'][0]['events'] if packets and packets[0]['name'] == 'batch_update' else []
+    check(len(packets) == 1
+          and [event.get('item_id') for event in events[:-1]] == [line['detail_id'] for line in lines]
+          and events[-1]['event'] == 'requisition_status_changed'
+          and result['order_status'] == 'reviewed',
+          f"batch approval of {args.items} lines arrives as {len(packets)} event(s) "
+          f"({len(events)} changes, order {result['order_status']})")
+
+    started = time.perf_counter()
+    for item_id in range(args.items):
+        broadcast_requisition_item_change(REQUISITION, item_id, 'pending_review', 'approved')
+    queued_ms = (time.perf_counter() - started) * 1000
+    packets = received(client)
+    events = packets[0]['args'][0]['events'] if packets and packets[0]['name'] == 'batch_update' else []
+    check(len(packets) == 1 and [event['item_id'] for event in events] == list(range(args.items)),
+          f"{args.items} item changes arrive as {len(packets)} event(s), queued in {queued_ms:.1f} ms")
+
+    broadcast_requisition_status_change('WSCHECK-NOBODY', 'submitted', 'reviewed')
+    check(websocket.broadcaster.pending == {} and not received(client),
+          "change to a requisition nobody follows is not emitted")
+
+    client.disconnect()
+    check(not subscriptions.has_members('requisition', REQUISITION), "disconnect dropped the subscription")
+    print(f"     broadcaster counters: {websocket.broadcaster.stats}")
+
+    if args.redis_url:
+        check_redis(app, args.redis_url, headers, args.items)
+    else:
+        print("Skipping the cross-worker checks (no --redis-url)")
+
+
+if __name__ == '__main__':
+    main()
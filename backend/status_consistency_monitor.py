@@ -2,6 +2,10 @@
 """
 Requisition Status Consistency Monitor & Auto-Fix
 This script provides defensive mechanisms to prevent and fix status update bugs
+
+Usage:
+    python status_consistency_monitor.py                      # one cycle
+    python status_consistency_monitor.py --scheduled [SECONDS] # repeat every SECONDS (default 3600)
 """
 import sys
 import os
@@ -9,10 +13,9 @@ sys.path.append(os.path.dirname(__file__))
 
 from app import create_app, db
 from app.models.request_order import RequestOrder, RequestOrderItem
-from sqlalchemy import text
+from app.services import status_consistency
 from datetime import datetime, timedelta
-# import schedule
-# import time
+import time
 
 # Create app context
 app = create_app('development')
@@ -29,47 +32,25 @@ class StatusConsistencyMonitor:
             print(f"[MONITOR] Starting status consistency scan at {datetime.now().isoformat()}")
             
             try:
-                # Find all submitted requisitions
-                submitted_orders = RequestOrder.query.filter_by(order_status='submitted').all()
-                problems_found = []
+                # One aggregate scan and one set-based UPDATE, however many orders exist
+                report = status_consistency.run_check(fix=True)
                 
-                for order in submitted_orders:
-                    summary = order.get_summary()
-                    
-                    # Check if all items are reviewed but status is still submitted
-                    if (summary['total_items'] > 0 and 
-                        summary['pending_items'] == 0):
-                        
-                        problems_found.append({
-                            'order': order,
-                            'summary': summary,
-                            'issue': 'All items reviewed but status still submitted'
-                        })
+                print(f"[MONITOR] Found {report['problem_count']} status inconsistencies "
+                      f"(scan {report['scan_ms']} ms)")
+                self.problems_detected += report['problem_count']
                 
-                print(f"[MONITOR] Found {len(problems_found)} status inconsistencies")
-                self.problems_detected += len(problems_found)
+                for problem in report['problems']:
+                    print(f"[FIX] {problem['request_order_no']}: submitted -> reviewed "
+                          f"({problem['summary']['total_items']} items, none pending)")
                 
-                # Fix each problem
-                for problem in problems_found:
-                    order = problem['order']
-                    old_status = order.order_status
-                    
-                    print(f"[FIX] Fixing {order.request_order_no}: {old_status} -> reviewed")
-                    
-                    # Apply the fix
-                    order.update_status_after_review()
-                    
-                    if order.order_status == 'reviewed':
-                        print(f"[FIX] ✅ Successfully fixed {order.request_order_no}")
-                        self.fixes_applied += 1
-                    else:
-                        print(f"[FIX] ❌ Failed to fix {order.request_order_no}")
+                self.fixes_applied += report['fixed']
                 
                 # Log summary
-                if problems_found:
-                    print(f"[MONITOR] Applied {len(problems_found)} fixes")
+                if report['problem_count']:
+                    print(f"[MONITOR] Applied {report['fixed']} fixes in {report['fix_ms']} ms")
                 else:
                     print(f"[MONITOR] No status inconsistencies found")
+                return report
                 
             except Exception as e:
                 print(f"[MONITOR] Error during scan: {e}")
@@ -79,28 +60,24 @@ class StatusConsistencyMonitor:
         with self.app.app_context():
             print(f"[VALIDATION] Checking API endpoint status update calls...")
             
-            # This would check the actual API routes to ensure they call update_status_after_review
-            # For now, we'll add enhanced logging to detect when updates are missed
-            
-            # Find recently updated items that might have missed status updates
+            # Find recently updated items that might have missed status updates:
+            # inconsistent orders that had an item approved within the last hour
             recent_threshold = datetime.utcnow() - timedelta(hours=1)
-            
-            recent_approvals = RequestOrderItem.query.filter(
-                RequestOrderItem.item_status == 'approved',
-                RequestOrderItem.updated_at >= recent_threshold
-            ).all()
+            problem_orders = [problem['request_order_no'] for problem in RequestOrder.scan_status_problems()]
             
             suspicious_orders = set()
-            for item in recent_approvals:
-                order = item.request_order
-                if order.order_status == 'submitted':
-                    summary = order.get_summary()
-                    if summary['pending_items'] == 0:
-                        suspicious_orders.add(order.request_order_no)
+            if problem_orders:
+                suspicious_orders = {
+                    order_no for (order_no,) in db.session.query(RequestOrderItem.request_order_no).filter(
+                        RequestOrderItem.request_order_no.in_(problem_orders),
+                        RequestOrderItem.item_status == 'approved',
+                        RequestOrderItem.updated_at >= recent_threshold
+                    ).distinct()
+                }
             
             if suspicious_orders:
                 print(f"[VALIDATION] ⚠️  Found {len(suspicious_orders)} orders with recent approvals but wrong status:")
-                for order_no in suspicious_orders:
+                for order_no in sorted(suspicious_orders):
                     print(f"[VALIDATION]    {order_no}")
             else:
                 print(f"[VALIDATION] ✅ No suspicious recent status updates found")
@@ -112,25 +89,18 @@ class StatusConsistencyMonitor:
             print(f"Generated at: {datetime.now().isoformat()}")
             
             # Overall statistics
-            total_orders = RequestOrder.query.count()
-            submitted_orders = RequestOrder.query.filter_by(order_status='submitted').count()
-            reviewed_orders = RequestOrder.query.filter_by(order_status='reviewed').count()
-            draft_orders = RequestOrder.query.filter_by(order_status='draft').count()
+            status_counts = dict(db.session.query(
+                RequestOrder.order_status, db.func.count(RequestOrder.request_order_no)
+            ).group_by(RequestOrder.order_status).all())
             
             print(f"\nOverall Statistics:")
-            print(f"  Total Orders: {total_orders}")
-            print(f"  Draft Orders: {draft_orders}")
-            print(f"  Submitted Orders: {submitted_orders}")
-            print(f"  Reviewed Orders: {reviewed_orders}")
+            print(f"  Total Orders: {sum(status_counts.values())}")
+            print(f"  Draft Orders: {status_counts.get('draft', 0)}")
+            print(f"  Submitted Orders: {status_counts.get('submitted', 0)}")
+            print(f"  Reviewed Orders: {status_counts.get('reviewed', 0)}")
             
             # Check for problems
-            submitted_list = RequestOrder.query.filter_by(order_status='submitted').all()
-            problems = []
-            
-            for order in submitted_list:
-                summary = order.get_summary()
-                if summary['total_items'] > 0 and summary['pending_items'] == 0:
-                    problems.append(order.request_order_no)
+            problems = [problem['request_order_no'] for problem in RequestOrder.scan_status_problems()]
             
             print(f"\nStatus Consistency Issues:")
             print(f"  Problems Detected: {len(problems)}")
@@ -148,17 +118,26 @@ class StatusConsistencyMonitor:
         print(f"REQUISITION STATUS MAINTENANCE CYCLE")
         print(f"{'='*50}")
         
-        self.scan_and_fix_inconsistent_statuses()
+        started = time.perf_counter()
+        report = self.scan_and_fix_inconsistent_statuses()
         self.validate_api_endpoints_call_status_update()
         self.generate_status_consistency_report()
         
-        print(f"\nMaintenance cycle completed at {datetime.now().isoformat()}")
+        print(f"\nMaintenance cycle completed at {datetime.now().isoformat()} "
+              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return report
 
-def create_scheduled_monitor():
-    """Create a scheduled monitor that runs periodically"""
-    print("Scheduled monitoring disabled - install 'schedule' package to enable")
-    print("Run immediate fix instead...")
-    run_immediate_fix()
+def create_scheduled_monitor(interval_seconds=3600):
+    """Run the maintenance cycle every interval_seconds, reporting duration and affected counts"""
+    print(f"Scheduled monitoring every {interval_seconds}s (Ctrl+C to stop)")
+    monitor = StatusConsistencyMonitor()
+    while True:
+        report = monitor.run_maintenance_cycle()
+        if report:
+            print(f"[SCHEDULE] run at {report['checked_at']}: {report['problem_count']} found, "
+                  f"{report['fixed']} fixed, {report['duration_ms']} ms; session total "
+                  f"{monitor.fixes_applied} fixed")
+        time.sleep(interval_seconds)
 
 def run_immediate_fix():
     """Run an immediate fix cycle"""
@@ -167,6 +146,7 @@ def run_immediate_fix():
 
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "--scheduled":
-        create_scheduled_monitor()
+        interval = int(sys.argv[2]) if len(sys.argv) > 2 else 3600
+        create_scheduled_monitor(interval)
     else:
-        run_immediate_fix()
\ No newline at end of file
+        run_immediate_fix()
@@ -27,6 +27,15 @@ export interface ApproveItemRequest {
   unit_price: number
 }
 
+export interface BatchApproveItemsRequest {
+  lines: (ApproveItemRequest & { detail_id: number })[]
+}
+
+export interface BatchApproveItemsResponse {
+  items: RequestOrderItem[]
+  order_status: string
+}
+
 export interface RejectItemRequest {
   reason: string
 }
@@ -86,6 +95,12 @@ export const requisitionApi = {
     return response.data
   },
 
+  // Approve several requisition items in one request
+  batchApproveItems: async (requisitionId: string, data: BatchApproveItemsRequest): Promise<BatchApproveItemsResponse> => {
+    const response = await api.post(`/requisitions/${requisitionId}/lines/batch-approve`, data)
+    return response.data
+  },
+
   // Question requisition item
   questionItem: async (requisitionId: string, detailId: number, data: QuestionItemRequest): Promise<RequestOrderItem> => {
     const response = await api.post(`/requisitions/${requisitionId}/lines/${detailId}/question`, data)
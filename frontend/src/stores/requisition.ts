@@ -7,6 +7,7 @@ import type {
   RequisitionFilters, 
   CreateRequisitionRequest, 
   ApproveItemRequest,
+  BatchApproveItemsRequest,
   RejectItemRequest,
   QuestionItemRequest,
   RejectRequisitionRequest,
@@ -170,6 +171,23 @@ export const useRequisitionStore = defineStore('requisition', () => {
     }
   }
 
+  const batchApproveItems = async (requisitionId: string, data: BatchApproveItemsRequest) => {
+    try {
+      loading.value = true
+      const result = await requisitionApi.batchApproveItems(requisitionId, data)
+
+      await refreshRequisitionWithRetry(requisitionId, 3)
+
+      ElMessage.success(`批量核准 ${data.lines.length} 個項目`)
+      return result
+    } catch (error) {
+      handleApiError(error, '批量審核項目失敗')
+      throw error
+    } finally {
+      loading.value = false
+    }
+  }
+
   const questionItem = async (requisitionId: string, detailId: number, data: QuestionItemRequest) => {
     try {
       loading.value = true
@@ -359,6 +377,7 @@ export const useRequisitionStore = defineStore('requisition', () => {
     updateRequisition,
     submitRequisition,
     approveItem,
+    batchApproveItems,
     questionItem,
     rejectItem,
     rejectRequisition,
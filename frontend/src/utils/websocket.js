@@ -37,7 +37,9 @@ class WebSocketManager {
           auth: {
             token: token
           },
-          transports: ['websocket', 'polling'],
+          // WebSocket only: polling requests from one client can reach
+          // different gunicorn workers, which reject the unknown session
+          transports: ['websocket'],
           autoConnect: false
         })
 
@@ -79,6 +81,15 @@ class WebSocketManager {
           reject(new Error(data.message || 'Authentication failed'))
         })
 
+        // Broadcasts coalesced by the server: pass each one to its listeners
+        this.socket.on('batch_update', (batch) => {
+          for (const message of batch.events || []) {
+            for (const callback of this.eventListeners.get(message.event) || []) {
+              callback(message)
+            }
+          }
+        })
+
         // Start connection
         this.socket.connect()
       } catch (error) {